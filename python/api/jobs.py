@@ -0,0 +1,241 @@
+"""
+Pipeline jobs: a persistent FIFO queue drained by a pool of workers.
+
+Each ``/api/run-pipeline`` request becomes a job with an id, its own status
+dict and log buffer. Jobs are stored in ``results/pipeline_runs.db``
+(``jobs`` table), so queued jobs survive a server restart. A job that was
+running when the server stopped is queued again; get_values resumes from
+its journal. The API token is never stored: a recovered job uses the one
+already written to ``scripts/config.py``.
+
+``RAX_WORKERS`` jobs run at once. Within them, stages take per-resource
+locks (``stages.resources``): one stage per scraped host, and one stage per
+file it reads or writes. A long ufcstats scrape therefore holds up other
+ufcstats stages, while an ``aggregate``-only job runs alongside it as long
+as its files aren't in use.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from api.log_store import LogStore
+from api.manifest import StageManifest
+from api.pipeline_runner import PipelineRunner, ResourceLocks, new_status, request_cancel
+from api.run_history import DB_FILE
+
+WORKERS = int(os.environ.get("RAX_WORKERS", "2"))
+# Finished jobs whose status and logs stay in memory for the job endpoints
+KEEP_FINISHED = 20
+
+FINISHED_STATES = ("ok", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    state TEXT NOT NULL,
+    source TEXT,
+    stages TEXT NOT NULL,
+    full_refresh INTEGER,
+    mode TEXT,
+    trace INTEGER,
+    profile INTEGER,
+    started_at TEXT,
+    finished_at TEXT,
+    run_id INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, id);
+"""
+
+JOB_COLUMNS = ("id", "created_at", "state", "source", "stages", "full_refresh", "mode", "trace", "profile",
+               "started_at", "finished_at", "run_id", "error")
+
+
+class Job:
+    def __init__(self, stages: list[str], full_refresh: bool = False, mode: str = "inprocess",
+                 trace: bool = False, profile: bool = False, source: str = "manual",
+                 token: Optional[str] = None):
+        self.id: Optional[int] = None
+        self.created_at = datetime.now().isoformat()
+        self.state = "queued"
+        self.source = source
+        self.stages = list(stages)
+        self.full_refresh = full_refresh
+        self.mode = mode
+        self.trace = trace
+        self.profile = profile
+        self.token = token
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.run_id: Optional[int] = None
+        self.error: Optional[str] = None
+        # Live state of the run, in the shape /api/status has always returned
+        self.status = new_status()
+        self.logs = LogStore()
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        job = cls(json.loads(row["stages"]), bool(row["full_refresh"]), row["mode"], bool(row["trace"]),
+                  bool(row["profile"]), row["source"])
+        for column in ("id", "created_at", "state", "started_at", "finished_at", "run_id", "error"):
+            setattr(job, column, row[column])
+        return job
+
+    def row(self) -> dict:
+        data = {column: getattr(self, column) for column in JOB_COLUMNS}
+        data["stages"] = json.dumps(self.stages)
+        return data
+
+    def to_dict(self) -> dict:
+        data = {column: getattr(self, column) for column in JOB_COLUMNS}
+        data.update(progress=self.status["progress"], current_stage=self.status["current_stage"],
+                    cancel_latency=self.status["cancel_latency"])
+        return data
+
+
+class JobStore:
+    """SQLite persistence for the queue; lives next to the run history."""
+
+    def __init__(self, path: Path = DB_FILE):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection that commits (or rolls back) and closes when the block exits."""
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def insert(self, job: Job) -> int:
+        row = job.row()
+        del row["id"]
+        with self._connect() as conn:
+            cursor = conn.execute(f"INSERT INTO jobs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                                  tuple(row.values()))
+            return cursor.lastrowid
+
+    def update(self, job: Job):
+        row = job.row()
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {', '.join(f'{c} = :{c}' for c in row if c != 'id')} WHERE id = :id", row)
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def recent(self, limit: int = 20) -> list[Job]:
+        with self._connect() as conn:
+            return [Job.from_row(r) for r in conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))]
+
+    def unfinished(self) -> list[Job]:
+        """Queued jobs, plus running ones a stopped server never finished, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs WHERE state IN ('queued', 'running') ORDER BY id").fetchall()
+        return [Job.from_row(r) for r in rows]
+
+
+class JobQueue:
+    def __init__(self, workers: int = WORKERS, store: Optional[JobStore] = None):
+        self.workers = workers
+        self.store = store or JobStore()
+        self.jobs: dict[int, Job] = {}
+        self.queue: asyncio.Queue[int] = asyncio.Queue()
+        self.locks = ResourceLocks()
+        # One manifest for all workers, so concurrent runs don't overwrite each other's records
+        self.manifest = StageManifest()
+        self.runners: dict[int, PipelineRunner] = {}
+        self.tasks: list[asyncio.Task] = []
+
+    def start(self):
+        """Requeue unfinished jobs and start the workers (needs a running loop)."""
+        for job in self.store.unfinished():
+            if job.state == "running":
+                job.state = "queued"
+                job.logs.append("Requeued after a server restart")
+                self.store.update(job)
+            self.jobs[job.id] = job
+            self.queue.put_nowait(job.id)
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def submit(self, job: Job) -> Job:
+        job.id = self.store.insert(job)
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job.id)
+        return job
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self.jobs.get(job_id) or self.store.get(job_id)
+
+    def queued(self) -> list[Job]:
+        return sorted((job for job in self.jobs.values() if job.state == "queued"), key=lambda job: job.id)
+
+    def running(self) -> list[Job]:
+        return [job for job in self.jobs.values() if job.state == "running"]
+
+    def latest(self) -> Optional[Job]:
+        """The job the single-run endpoints report on: the newest running one, else the newest."""
+        running = self.running()
+        if running:
+            return max(running, key=lambda job: job.id)
+        return max(self.jobs.values(), key=lambda job: job.id, default=None)
+
+    def cancel(self, job_id: int) -> Optional[str]:
+        """Drop a queued job or signal a running one; returns the resulting state."""
+        job = self.jobs.get(job_id)
+        if job is None or job.state in FINISHED_STATES:
+            return None
+        if job.state == "queued":
+            job.state = "cancelled"
+            job.finished_at = datetime.now().isoformat()
+            self.store.update(job)
+            return "cancelled"
+        request_cancel(job.status)
+        return "cancelling"
+
+    async def _worker(self):
+        while True:
+            job = self.jobs.get(await self.queue.get())
+            if job is not None and job.state == "queued":
+                await self._run(job)
+            self._forget_old()
+
+    async def _run(self, job: Job):
+        job.state = "running"
+        job.started_at = datetime.now().isoformat()
+        self.store.update(job)
+        runner = PipelineRunner(job.token, job.mode, job.trace, job.profile, status=job.status, logs=job.logs,
+                                locks=self.locks, manifest=self.manifest, label=f"job {job.id}")
+        self.runners[job.id] = runner
+        try:
+            await runner.run(job.stages, job.full_refresh)
+        finally:
+            del self.runners[job.id]
+            job.run_id = runner.run_id
+            job.error = job.status["error"]
+            job.state = "cancelled" if job.status["cancelled"] else ("failed" if job.error else "ok")
+            job.finished_at = datetime.now().isoformat()
+            self.store.update(job)
+
+    def _forget_old(self):
+        finished = sorted((job.id for job in self.jobs.values() if job.state in FINISHED_STATES))
+        for job_id in finished[:-KEEP_FINISHED]:
+            del self.jobs[job_id]
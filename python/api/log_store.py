@@ -0,0 +1,127 @@
+import json
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Optional
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+DEFAULT_CAPACITY = 5000
+DEFAULT_LOG_FILE = Path(__file__).parent.parent / "logs" / "pipeline.log"
+MAX_FILE_BYTES = 5 * 1024 * 1024
+FILE_BACKUPS = 3
+
+
+def infer_level(message: str) -> str:
+    """Guess a level for raw script output that carries no level of its own."""
+    if message.startswith("Debug:") or message.startswith("---"):
+        return "debug"
+    lowered = message.lower()
+    if lowered.startswith("error") or "error:" in lowered or "traceback" in lowered:
+        return "error"
+    if lowered.startswith("warning"):
+        return "warning"
+    return "info"
+
+
+class LogStore:
+    """Fixed-capacity ring buffer of structured log entries.
+
+    Every entry gets a monotonically increasing ``seq`` so readers can resume
+    from a cursor even after older entries have been evicted. All entries,
+    including the ones that fall out of the buffer, are also written to a
+    rotating file on disk.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, log_file: Optional[Path] = DEFAULT_LOG_FILE):
+        self.entries = deque(maxlen=capacity)
+        self.next_seq = 0
+        # (stage, level) -> count since the last clear(), including evicted entries
+        self.counts = Counter()
+        # Stage output printed from worker threads appends concurrently with readers
+        self.lock = threading.Lock()
+        self.file_logger = self._create_file_logger(log_file) if log_file else None
+
+    @staticmethod
+    def _create_file_logger(log_file: Path) -> logging.Logger:
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        logger = logging.getLogger(f"pipeline.{log_file}")
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        if not logger.handlers:
+            handler = RotatingFileHandler(log_file, maxBytes=MAX_FILE_BYTES, backupCount=FILE_BACKUPS)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        return logger
+
+    def append(self, message: str, stage: Optional[str] = None, level: str = "info") -> dict:
+        with self.lock:
+            entry = {
+                "seq": self.next_seq,
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "stage": stage,
+                "level": level,
+                "message": message,
+            }
+            self.entries.append(entry)
+            self.next_seq += 1
+            self.counts[(stage, level)] += 1
+
+        if self.file_logger:
+            self.file_logger.log(
+                LEVELS.get(level, logging.INFO),
+                f"{entry['timestamp']} {level.upper():<7} [{stage or '-'}] {message}",
+            )
+        return entry
+
+    def clear(self):
+        """Drop buffered entries. Sequence numbers keep increasing across runs."""
+        with self.lock:
+            self.entries.clear()
+            self.counts.clear()
+
+    @property
+    def first_seq(self) -> int:
+        return self.entries[0]["seq"] if self.entries else self.next_seq
+
+    def since(self, cursor: int, min_level: str = "debug", max_bytes: Optional[int] = None) -> tuple[list[dict], int, int]:
+        """Return ``(entries, next_cursor, skipped)`` for entries at or after ``cursor``.
+
+        ``skipped`` counts entries the reader missed because they were evicted
+        from the buffer. When ``max_bytes`` is set, entries are returned until
+        their encoded size would exceed the budget; the rest are picked up on
+        the next call. At least one entry is always returned so a reader can
+        never stall on a single oversized line.
+        """
+        threshold = LEVELS.get(min_level, LEVELS["debug"])
+        with self.lock:
+            entries = list(self.entries)
+            first_seq = self.first_seq
+        skipped = max(0, first_seq - cursor)
+        cursor = max(cursor, first_seq)
+
+        selected = []
+        used = 0
+        next_cursor = cursor
+        for entry in entries:
+            if entry["seq"] < cursor:
+                continue
+            if LEVELS.get(entry["level"], LEVELS["info"]) >= threshold:
+                if max_bytes is not None:
+                    size = len(json.dumps(entry))
+                    if selected and used + size > max_bytes:
+                        break
+                    used += size
+                selected.append(entry)
+            next_cursor = entry["seq"] + 1
+        return selected, next_cursor, skipped
+
+    def tail(self, count: int = 100, min_level: str = "debug") -> list[dict]:
+        threshold = LEVELS.get(min_level, LEVELS["debug"])
+        with self.lock:
+            entries = list(self.entries)
+        matching = [e for e in entries if LEVELS.get(e["level"], LEVELS["info"]) >= threshold]
+        return matching[-count:]
@@ -1,27 +1,69 @@
 import asyncio
 import json
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 
-from fastapi import FastAPI, Request, BackgroundTasks
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from api.pipeline_runner import PipelineRunner, pipeline_status
+from api.jobs import Job, JobQueue
+from api.log_store import LEVELS
+from api.pipeline_runner import STAGE_MODES, TRACES_DIR, new_status
+from api.run_history import RunHistory
+from api.scheduler import Scheduler
+from api.stages import DEFAULT_STAGES
+from metrics import JOBS_QUEUED, REGISTRY
+import scoring
+import simulation
 
-app = FastAPI(title="UFC Rax Pipeline")
+jobs = JobQueue()
+scheduler = Scheduler(jobs)
+JOBS_QUEUED.set_function(lambda: len(jobs.queued()))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    jobs.start()
+    scheduler.start()
+    yield
+    await scheduler.stop()
+    await jobs.stop()
+
+
+app = FastAPI(title="UFC Rax Pipeline", lifespan=lifespan)
 templates = Jinja2Templates(directory=Path(__file__).parent / "templates")
 
 class PipelineRequest(BaseModel):
     token: str
-    stages: list[str] = ["add_fights", "remove_duplicates", "process_matches", "aggregate", "get_values"]
-    full_refresh: bool = True
+    stages: list[str] = list(DEFAULT_STAGES)
+    full_refresh: bool = False
+    mode: str = "inprocess"
+    # Record per-request spans / sample the event loop for this run only
+    trace: bool = False
+    profile: bool = False
+
+
+class PortfolioRequest(BaseModel):
+    # fighter name -> tier name or multiplier
+    cards: dict[str, str | float]
+
+
+class SimulationRequest(PortfolioRequest):
+    scenarios: int = simulation.SCENARIOS
+    seed: Optional[int] = 0
+
+
+# Upper bound on scenarios per simulation request, to keep one call from
+# occupying the server for minutes
+MAX_SCENARIOS = 200_000
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -31,41 +73,51 @@ async def update_page(request: Request):
 
 
 @app.post("/api/run-pipeline")
-async def run_pipeline(req: PipelineRequest, background_tasks: BackgroundTasks):
-    if pipeline_status["running"]:
-        return {"error": "Pipeline already running", "status": "busy"}
+async def run_pipeline(req: PipelineRequest):
+    if req.mode not in STAGE_MODES:
+        return {"error": f"Unknown mode: {req.mode}", "status": "invalid"}
     
-    runner = PipelineRunner(token=req.token)
-    background_tasks.add_task(runner.run, req.stages, req.full_refresh)
-    
-    return {"status": "started", "stages": req.stages}
+    job = jobs.submit(Job(req.stages, req.full_refresh, req.mode, req.trace, req.profile, token=req.token))
+    position = len(jobs.queued())
+    return {"status": "queued", "job_id": job.id, "position": position, "stages": req.stages}
 
 
-@app.get("/api/status")
-async def get_status():
-    return pipeline_status
+def job_status(job: Optional[Job], level: str, tail: int) -> dict:
+    if job is None:
+        return {**new_status(), "logs": []}
+    return {**job.status, "job": job.to_dict(), "logs": job.logs.tail(tail, min_level=level)}
 
 
-@app.get("/api/stream")
-async def stream_logs() -> StreamingResponse:
+def stream_job(job: Job, level: str, max_bytes: Optional[int]) -> StreamingResponse:
+    """Stream a job's status and log entries at or above ``level``.
+
+    ``max_bytes`` caps the log payload of each event; entries over budget are
+    sent with the following events instead of being dropped.
+    """
+    if level not in LEVELS:
+        level = "info"
+
     async def event_generator() -> AsyncGenerator[str, None]:
-        last_log_index = 0
+        cursor = job.logs.first_seq
         
         while True:
             # Send current status
+            logs, cursor, skipped = job.logs.since(cursor, min_level=level, max_bytes=max_bytes)
             data = {
-                "running": pipeline_status["running"],
-                "current_stage": pipeline_status["current_stage"],
-                "progress": pipeline_status["progress"],
-                "error": pipeline_status["error"],
-                "logs": pipeline_status["logs"][last_log_index:],
+                "job_id": job.id,
+                "state": job.state,
+                "running": job.status["running"],
+                "current_stage": job.status["current_stage"] or ("Queued" if job.state == "queued" else None),
+                "progress": job.status["progress"],
+                "error": job.status["error"],
+                "logs": logs,
+                "skipped": skipped,
             }
-            last_log_index = len(pipeline_status["logs"])
             
             yield f"data: {json.dumps(data)}\n\n"
             
-            if not pipeline_status["running"] and last_log_index == len(pipeline_status["logs"]):
-                # Pipeline finished and all logs sent
+            if job.state not in ("queued", "running") and cursor >= job.logs.next_seq:
+                # Job finished and all logs sent
                 await asyncio.sleep(0.5)
                 yield f"data: {json.dumps({'done': True})}\n\n"
                 break
@@ -82,12 +134,179 @@ async def stream_logs() -> StreamingResponse:
     )
 
 
+@app.get("/api/jobs")
+async def list_jobs(limit: int = 20):
+    """Queued and running jobs first, then the most recent ones from the store."""
+    live = {job.id: job for job in jobs.queued() + jobs.running()}
+    recent = [jobs.jobs.get(job.id, job) for job in jobs.store.recent(limit) if job.id not in live]
+    return {"workers": jobs.workers, "jobs": [job.to_dict() for job in list(live.values()) + recent]}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: int, level: str = "info", tail: int = 100):
+    job = jobs.get(job_id)
+    if job is None:
+        return {"error": f"Unknown job: {job_id}"}
+    return job_status(job, level, tail)
+
+
+@app.get("/api/jobs/{job_id}/stream")
+async def stream_job_logs(job_id: int, level: str = "info", max_bytes: Optional[int] = None):
+    job = jobs.get(job_id)
+    if job is None:
+        return {"error": f"Unknown job: {job_id}"}
+    return stream_job(job, level, max_bytes)
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: int):
+    state = jobs.cancel(job_id)
+    return {"status": state or "not_running", "job_id": job_id}
+
+
+@app.get("/api/schedule")
+async def get_schedule():
+    """Cron expression, next (jittered) trigger and last queued job of each schedule."""
+    return scheduler.to_dict()
+
+
+@app.post("/api/schedule/{name}/trigger")
+async def trigger_schedule(name: str):
+    """Fire a schedule now, with the usual coalescing."""
+    if name not in scheduler.schedules:
+        return {"error": f"Unknown schedule: {name}"}
+    return {"job": scheduler.trigger(name).to_dict()}
+
+
+@app.get("/api/status")
+async def get_status(level: str = "info", tail: int = 100):
+    """Status of the newest running (else newest) job."""
+    return job_status(jobs.latest(), level, tail)
+
+
+@app.get("/api/stream")
+async def stream_logs(level: str = "info", max_bytes: Optional[int] = None):
+    """Stream of the newest running (else newest) job."""
+    job = jobs.latest()
+    if job is None:
+        return {"error": "No jobs yet"}
+    return stream_job(job, level, max_bytes)
+
+
+@app.get("/api/runs")
+async def get_runs(limit: int = 20):
+    """Recent runs with per-stage telemetry, plus wall-time trends per stage."""
+    history = RunHistory()
+    return {"runs": history.runs(limit), "trends": history.trends()}
+
+
+@app.get("/api/runs/{run_id}/trace")
+async def get_run_trace(run_id: int):
+    """Chrome trace (chrome://tracing, Perfetto) of a run started with ``trace``."""
+    path = TRACES_DIR / f"run-{run_id}.trace.json"
+    if not path.exists():
+        return {"error": f"No trace recorded for run {run_id}"}
+    return FileResponse(path, media_type="application/json", filename=path.name)
+
+
+@app.get("/api/runs/{run_id}/profile/{stage}")
+async def get_run_profile(run_id: int, stage: str):
+    """Folded stacks (speedscope, flamegraph.pl) of a stage in a run started with ``profile``."""
+    path = TRACES_DIR / f"run-{run_id}-{stage}.folded"
+    if not path.exists():
+        return {"error": f"No profile recorded for {stage} in run {run_id}"}
+    return PlainTextResponse(path.read_text())
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of HTTP, parsing, stage and process metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/projections")
+async def get_projections(tiers: Optional[list[str]] = Query(None), fighters: Optional[list[str]] = Query(None),
+                          limit: int = 100):
+    """Projected yearly Rax per fighter under each tier (default: all), best first by the first tier."""
+    try:
+        engine = await asyncio.to_thread(scoring.engine)
+        tiers = tiers or list(scoring.TIERS)
+        table = engine.project(tiers)
+        if fighters:
+            table = table.iloc[engine.index(fighters)]
+    except FileNotFoundError:
+        return {"error": "No fight history yet; run the pipeline first"}
+    except KeyError as e:
+        return {"error": e.args[0]}
+    table = table.sort_values(table.columns[0], ascending=False, kind="stable").head(limit)
+    return {
+        "tiers": {t: scoring.multiplier(t) for t in tiers},
+        "fighters": [{"name": name, "projected": dict(zip(tiers, values))}
+                     for name, values in zip(table.index, table.values.round(1).tolist())],
+    }
+
+
+@app.post("/api/projections/portfolio")
+async def project_portfolio(req: PortfolioRequest):
+    """Projected yearly Rax of a set of cards held together, with lost claims."""
+    try:
+        engine = await asyncio.to_thread(scoring.engine)
+        return engine.portfolio(req.cards)
+    except FileNotFoundError:
+        return {"error": "No fight history yet; run the pipeline first"}
+    except KeyError as e:
+        return {"error": e.args[0]}
+
+
+@app.get("/api/simulation")
+async def get_simulation(tier: str = scoring.DEFAULT_TIER, scenarios: int = simulation.SCENARIOS,
+                         seed: Optional[int] = 0, fighters: Optional[list[str]] = Query(None), limit: int = 100):
+    """Simulated next-season Rax per fighter (mean, percentiles, chance of fighting), best mean first."""
+    if not 1 <= scenarios <= MAX_SCENARIOS:
+        return {"error": f"scenarios must be between 1 and {MAX_SCENARIOS}"}
+    try:
+        model = await asyncio.to_thread(simulation.model)
+        engine = await asyncio.to_thread(scoring.engine)
+        table = await asyncio.to_thread(simulation.simulate_fighters, model, scenarios, tier, seed)
+        table.insert(0, "projected", engine.project([tier]).iloc[:, 0].reindex(table.index))
+        if fighters:
+            table = table.iloc[model.index(fighters)]
+    except FileNotFoundError:
+        return {"error": "No fight history yet; run the pipeline first"}
+    except KeyError as e:
+        return {"error": e.args[0]}
+    table = table.sort_values("mean", ascending=False, kind="stable").head(limit).round(3)
+    return {
+        "scenarios": scenarios,
+        "reference_date": model.reference_date,
+        "seasons": model.seasons,
+        "tier": tier,
+        "fighters": [{"name": name, **row} for name, row in zip(table.index, table.to_dict("records"))],
+    }
+
+
+@app.post("/api/simulation/portfolio")
+async def simulate_portfolio(req: SimulationRequest):
+    """Simulated next-season Rax of a set of cards held together, next to its deterministic projection."""
+    if not 1 <= req.scenarios <= MAX_SCENARIOS:
+        return {"error": f"scenarios must be between 1 and {MAX_SCENARIOS}"}
+    try:
+        model = await asyncio.to_thread(simulation.model)
+        engine = await asyncio.to_thread(scoring.engine)
+        result = await asyncio.to_thread(simulation.simulate_portfolio, model, req.cards, req.scenarios, req.seed)
+        projected = engine.portfolio(req.cards)["value"]
+    except FileNotFoundError:
+        return {"error": "No fight history yet; run the pipeline first"}
+    except KeyError as e:
+        return {"error": e.args[0]}
+    return {"reference_date": model.reference_date, "seasons": model.seasons, "projected": projected, **result}
+
+
 @app.post("/api/cancel")
 async def cancel_pipeline():
-    if pipeline_status["running"]:
-        pipeline_status["cancelled"] = True
-        return {"status": "cancelling"}
-    return {"status": "not_running"}
+    """Cancel every running job."""
+    cancelled = [job.id for job in jobs.running() if jobs.cancel(job.id)]
+    return {"status": "cancelling" if cancelled else "not_running", "job_ids": cancelled}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from api.stages import PYTHON_DIR, Stage, resolve
+
+if str(PYTHON_DIR / "scripts") not in sys.path:
+    sys.path.insert(0, str(PYTHON_DIR / "scripts"))
+
+from data_store import DataStore
+
+MANIFEST_FILE = PYTHON_DIR / "results" / "stage_manifest.json"
+CHUNK_SIZE = 1024 * 1024
+
+
+class StageManifest:
+    """Input/output fingerprints of the last successful run of each stage.
+
+    A stage can be skipped when every file it reads and writes still has the
+    digest recorded right after it last succeeded. Digests are cached by
+    ``(size, mtime_ns)`` so unchanged files are not re-hashed on every check.
+    """
+
+    def __init__(self, path: Path = MANIFEST_FILE):
+        self.path = path
+        self.data = {"files": {}, "stages": {}}
+        if path.exists():
+            try:
+                with open(path, 'r') as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def save(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def fingerprint(self, rel_path: str) -> Optional[str]:
+        """sha256 of the file, or None if it doesn't exist.
+
+        ``<database>#<view>`` fingerprints one of the data store's ``VIEWS``.
+        """
+        if "#" in rel_path:
+            db, view = rel_path.split("#", 1)
+            return DataStore(resolve(db)).digest(view) if resolve(db).exists() else None
+        path = resolve(rel_path)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+
+        cached = self.data["files"].get(rel_path)
+        if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        self.data["files"][rel_path] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest.hexdigest(),
+        }
+        return digest.hexdigest()
+
+    def check(self, stage: Stage) -> tuple[bool, str]:
+        """Return ``(should_run, reason)`` for a stage."""
+        if stage.volatile:
+            return True, f"always runs ({stage.volatile})"
+
+        record = self.data["stages"].get(stage.key)
+        if not record:
+            return True, "no previous run recorded"
+
+        for rel_path in stage.inputs:
+            if self.fingerprint(rel_path) != record["inputs"].get(rel_path):
+                return True, f"input changed: {rel_path}"
+        for rel_path in stage.outputs:
+            current = self.fingerprint(rel_path)
+            if current is None:
+                return True, f"output missing: {rel_path}"
+            if current != record["outputs"].get(rel_path):
+                return True, f"output modified since last run: {rel_path}"
+
+        return False, f"inputs unchanged since {record['ran_at']}"
+
+    def record(self, stage: Stage):
+        self.data["stages"][stage.key] = {
+            "inputs": {p: self.fingerprint(p) for p in stage.inputs},
+            "outputs": {p: self.fingerprint(p) for p in stage.outputs},
+            "ran_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self.save()
+
+    def forget(self, stage: Stage):
+        if self.data["stages"].pop(stage.key, None) is not None:
+            self.save()
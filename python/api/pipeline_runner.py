@@ -1,231 +1,686 @@
 import asyncio
+import importlib
+import io
+import os
 import sys
 import json
 import re
+import signal
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
 from pathlib import Path
 from datetime import datetime
 from typing import Callable, Optional
 
-# Global status object for SSE streaming
-pipeline_status = {
-    "running": False,
-    "current_stage": None,
-    "progress": 0,
-    "error": None,
-    "logs": [],
-    "cancelled": False,
-    "started_at": None,
-    "finished_at": None,
-}
-
-# Global reference to current process for cancellation
-current_process: Optional[asyncio.subprocess.Process] = None
-
-
-def reset_status():
-    pipeline_status["running"] = False
-    pipeline_status["current_stage"] = None
-    pipeline_status["progress"] = 0
-    pipeline_status["error"] = None
-    pipeline_status["logs"] = []
-    pipeline_status["cancelled"] = False
-    pipeline_status["started_at"] = None
-    pipeline_status["finished_at"] = None
-
-
-def log(message: str):
+from api.log_store import LogStore, infer_level
+from api.manifest import StageManifest
+from api.run_history import RunHistory
+from api.stages import FINAL_STAGES, STAGES, Stage, build_graph, critical_path, resources
+
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import cancellation
+import data_store
+import fast_json
+import metrics
+import request_stats
+import tracing
+
+def new_status() -> dict:
+    return {
+        "running": False,
+        "current_stage": None,
+        "progress": 0,
+        "error": None,
+        "cancelled": False,
+        "cancel_requested_at": None,
+        # Seconds from the cancel request until every stage had stopped
+        "cancel_latency": None,
+        "started_at": None,
+        "finished_at": None,
+    }
+
+
+# Status and logs of a runner not given its own (the CLI); jobs each get a pair
+pipeline_status = new_status()
+
+# Bounded log buffer; full logs spill to logs/pipeline.log
+log_store = LogStore()
+
+# Log buffer of the run whose code is executing; tasks and to_thread inherit it
+current_log_store: ContextVar[Optional[LogStore]] = ContextVar("current_log_store", default=None)
+
+# Status of every run in progress, keyed by runner, for the pipeline gauges
+active_runs: dict[int, dict] = {}
+
+metrics.PIPELINE_RUNNING.set_function(lambda: len(active_runs))
+metrics.PIPELINE_PROGRESS.set_function(
+    lambda: min((status["progress"] for status in active_runs.values()), default=0))
+
+# Running child processes, for cancellation (branches may run concurrently)
+current_processes: set[asyncio.subprocess.Process] = set()
+
+# Stage whose in-process code is printing; asyncio tasks and to_thread inherit it
+current_stage_key: ContextVar[Optional[str]] = ContextVar("current_stage_key", default=None)
+
+# Chrome traces and folded profile stacks of runs started with trace/profile on
+TRACES_DIR = Path(__file__).parent.parent / "results" / "traces"
+# Spans listed in the per-stage trace summary log line
+TRACE_SUMMARY_SPANS = 6
+
+# Stage execution modes: run each script's ``run()`` in this process (imports
+# stay warm between runs) or launch a fresh interpreter per stage for isolation
+STAGE_MODES = ("inprocess", "subprocess")
+
+
+# A stage asked to stop gets this long to drain, checkpoint and exit before it is killed
+STOP_TIMEOUT = cancellation.DRAIN_SECONDS + 10
+
+
+def request_cancel(status: dict):
+    if not status["cancelled"]:
+        status["cancel_requested_at"] = datetime.now().isoformat()
+        status["cancelled"] = True
+
+
+def reset_status(status: dict = pipeline_status, logs: LogStore = log_store):
+    status.update(new_status())
+    logs.clear()
+
+
+def log(message: str, stage: Optional[str] = None, level: str = "info"):
     timestamp = datetime.now().strftime("%H:%M:%S")
-    entry = f"[{timestamp}] {message}"
-    pipeline_status["logs"].append(entry)
-    print(entry)
+    (current_log_store.get() or log_store).append(message, stage=stage, level=level)
+    if level != "debug":
+        # sys.__stdout__ so in-process stage output capture doesn't loop back here
+        print(f"[{timestamp}] {message}", file=sys.__stdout__)
+
+
+class StageOutput(io.TextIOBase):
+    """File-like sink that turns printed stage output into log entries.
+
+    Installed once per run, it attributes each line to the stage whose context
+    printed it, so concurrently running in-process stages don't interleave
+    partial lines.
+    """
+
+    def __init__(self):
+        self.buffers: dict[Optional[str], str] = {}
+        self.lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        stage_key = current_stage_key.get()
+        with self.lock:
+            *lines, self.buffers[stage_key] = (self.buffers.get(stage_key, "") + text).split("\n")
+        for line in lines:
+            line = line.strip()
+            if line:
+                log(line, stage=stage_key, level=infer_level(line))
+        return len(text)
+
+    def flush(self):
+        with self.lock:
+            pending, self.buffers = self.buffers, {}
+        for stage_key, line in pending.items():
+            line = line.strip()
+            if line:
+                log(line, stage=stage_key, level=infer_level(line))
+
+
+_output = StageOutput()
+_output_users = 0
+
+
+@contextmanager
+def capture_stage_output():
+    """Route printed stage output to the log while any run is active.
+
+    Concurrent runs share one ``StageOutput``: a per-run ``redirect_stdout``
+    would put back the original stdout when the first run finished, under
+    the runs still going.
+    """
+    global _output_users
+    if _output_users == 0:
+        _output.saved_stdout = sys.stdout
+        sys.stdout = _output
+    _output_users += 1
+    try:
+        yield _output
+    finally:
+        _output.flush()
+        _output_users -= 1
+        if _output_users == 0:
+            sys.stdout = _output.saved_stdout
+
+
+class ResourceLocks:
+    """Named locks shared by concurrent runs (see ``stages.resources``)."""
+
+    def __init__(self):
+        self.locks: dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.holders: dict[str, str] = {}
+
+    def busy(self, names: list[str]) -> dict[str, str]:
+        """Which of ``names`` are held right now, and by whom."""
+        return {name: self.holders[name] for name in names if name in self.holders}
+
+    @asynccontextmanager
+    async def hold(self, names: list[str], owner: str):
+        acquired = []
+        try:
+            # Always in sorted order, so two runs can never wait on each other
+            for name in sorted(names):
+                await self.locks[name].acquire()
+                acquired.append(name)
+                self.holders[name] = owner
+            yield
+        finally:
+            for name in reversed(acquired):
+                self.holders.pop(name, None)
+                self.locks[name].release()
 
 
 class PipelineRunner:
-    def __init__(self, token: str):
+    def __init__(self, token: Optional[str], mode: str = "inprocess", trace: bool = False,
+                 profile: bool = False, status: Optional[dict] = None, logs: Optional[LogStore] = None,
+                 locks: Optional[ResourceLocks] = None, manifest: Optional[StageManifest] = None,
+                 label: str = "pipeline"):
+        if mode not in STAGE_MODES:
+            raise ValueError(f"Unknown stage mode: {mode}")
         self.token = token
+        self.mode = mode
+        # Job runs pass their own status/logs and the queue's shared locks and manifest
+        self.status = status if status is not None else pipeline_status
+        self.logs = logs if logs is not None else log_store
+        self.locks = locks
+        self.shared_manifest = manifest
+        self.label = label
+        # Per-request spans (Chrome trace) and sampled stacks, written under TRACES_DIR
+        self.trace = trace
+        self.profile = profile
         self.scripts_dir = Path(__file__).parent.parent / "scripts"
         self.results_dir = Path(__file__).parent.parent / "results"
+        # DataFrames/records handed from one in-process stage to the next
+        self.artifacts: dict = {}
+        # Per-stage completion fraction (0-1) and the dependency graph of this run
+        self.stage_progress: dict[str, float] = {}
+        self.deps: dict[str, set[str]] = {}
+        self.running_stages: dict[str, str] = {}
+        self.manifest: Optional[StageManifest] = None
+        self.full_refresh = False
+        self.history: Optional[RunHistory] = None
+        self.run_id: Optional[int] = None
+        # Counters reported by subprocess stages on their STAGE_STATS line
+        self.child_stats: dict[str, dict] = {}
         
-    async def run(self, stages: list[str], full_refresh: bool = True):
-        global current_process
-        reset_status()
-        pipeline_status["running"] = True
-        pipeline_status["started_at"] = datetime.now().isoformat()
+    async def run(self, stages: list[str], full_refresh: bool = False):
+        reset_status(self.status, self.logs)
+        current_log_store.set(self.logs)
+        self.artifacts = {}
+        self.status["running"] = True
+        active_runs[id(self)] = self.status
+        self.status["started_at"] = datetime.now().isoformat()
         
-        stage_map = {
-            "add_fights": ("add_new_fights.py", "Adding new fights", 10),
-            "remove_duplicates": ("remove_duplicates.py", "Removing duplicates", 2),
-            "process_matches": ("process_matches_fast.py", "Processing matches (optimized)", 50),
-            "aggregate": ("aggregate_values.py", "Aggregating values", 3),
-            "get_values": ("get_fighter_values.py", "Fetching fighter values from API", 30),
-        }
+        selected = []
+        for stage_key in stages:
+            if stage_key not in STAGES or stage_key in FINAL_STAGES:
+                log(f"Unknown stage: {stage_key}, skipping", level="warning")
+            elif stage_key not in selected:
+                selected.append(stage_key)
+        # Identity resolution and frontend processing always run last, once
+        # their inputs are ready
+        selected.extend(FINAL_STAGES)
         
-        # Calculate progress weights
-        total_weight = sum(stage_map[s][2] for s in stages if s in stage_map)
+        self.deps = build_graph(selected)
+        self.stage_progress = {key: 0.0 for key in selected}
+        self.running_stages = {}
+        self.manifest = self.shared_manifest or StageManifest()
+        self.full_refresh = full_refresh
+        self.artifacts["full_refresh"] = full_refresh
+        self.child_stats = {}
+        self.history = RunHistory()
+        self.run_id = self.history.start_run(selected, self.mode, full_refresh)
+        _, path = critical_path(self.deps, {key: STAGES[key].weight for key in selected})
+        log(f"Critical path: {' -> '.join(path)}")
         
         try:
-            cumulative_progress = 0
-            for i, stage_key in enumerate(stages):
-                if pipeline_status["cancelled"]:
-                    log("Pipeline cancelled by user")
-                    pipeline_status["current_stage"] = "Cancelled"
-                    break
-                
-                if stage_key not in stage_map:
-                    log(f"Unknown stage: {stage_key}, skipping")
-                    continue
-                
-                script_name, description, weight = stage_map[stage_key]
-                pipeline_status["current_stage"] = description
-                
-                # Calculate base progress for this stage
-                base_progress = int((cumulative_progress / total_weight) * 95)
-                stage_weight = (weight / total_weight) * 95
-                pipeline_status["progress"] = base_progress
-                
-                log(f"Starting: {description}")
-                
-                # Special handling for get_values - needs token
-                if stage_key == "get_values":
-                    success = await self._run_get_values(base_progress, stage_weight)
-                else:
-                    success = await self._run_script(script_name, base_progress, stage_weight)
-                
-                if pipeline_status["cancelled"]:
-                    log("Pipeline cancelled by user")
-                    pipeline_status["current_stage"] = "Cancelled"
-                    break
-                
-                if not success:
-                    pipeline_status["error"] = f"Failed at stage: {description}"
-                    log(f"ERROR: {description} failed")
-                    break
-                
-                cumulative_progress += weight
-                log(f"Completed: {description}")
+            with capture_stage_output():
+                await self._run_graph(selected)
             
-            # Run frontend processing
-            if not pipeline_status["cancelled"] and not pipeline_status["error"]:
-                pipeline_status["current_stage"] = "Running frontend data processing"
-                pipeline_status["progress"] = 95
-                log("Running npm run process...")
-                success = await self._run_npm_process()
-                if success:
-                    log("Frontend data processing complete")
-                else:
-                    log("Warning: Frontend processing failed (non-critical)")
+            if self.status["cancelled"]:
+                requested_at = datetime.fromisoformat(self.status["cancel_requested_at"] or datetime.now().isoformat())
+                latency = (datetime.now() - requested_at).total_seconds()
+                self.status["cancel_latency"] = round(latency, 3)
+                metrics.CANCEL_LATENCY.observe(latency)
+                log(f"Pipeline cancelled by user: idle {latency:.2f}s after the request")
             
-            pipeline_status["progress"] = 100
+            self.status["progress"] = 100
             log("Pipeline finished!")
             
         except Exception as e:
-            pipeline_status["error"] = str(e)
-            log(f"ERROR: {str(e)}")
+            self.status["error"] = str(e)
+            log(f"ERROR: {str(e)}", level="error")
+        finally:
+            self.status["running"] = False
+            active_runs.pop(id(self), None)
+            self.status["finished_at"] = datetime.now().isoformat()
+            if self.status["cancelled"]:
+                self.status["current_stage"] = "Cancelled"
+            else:
+                self.status["current_stage"] = "Complete" if not self.status["error"] else "Failed"
+            status = "cancelled" if self.status["cancelled"] else ("failed" if self.status["error"] else "ok")
+            self.history.finish_run(self.run_id, status, self.status["error"])
+            if self.trace:
+                self._merge_traces(selected)
+    
+    async def _run_graph(self, selected: list[str]):
+        """Start every stage as soon as the stages it depends on have succeeded."""
+        finished = {key: asyncio.Event() for key in selected}
+        succeeded: dict[str, bool] = {}
+        
+        async def run_when_ready(stage_key: str):
+            try:
+                for dep in self.deps[stage_key]:
+                    await finished[dep].wait()
+                
+                stage = STAGES[stage_key]
+                blocked = [dep for dep in self.deps[stage_key] if not succeeded.get(dep)]
+                if self.status["cancelled"] or self.status["error"] or blocked:
+                    succeeded[stage_key] = False
+                    return
+                
+                async with self._hold_resources(stage):
+                    if self.status["cancelled"]:
+                        succeeded[stage_key] = False
+                        return
+                    succeeded[stage_key] = await self._execute(stage)
+            finally:
+                finished[stage_key].set()
+        
+        await asyncio.gather(*(run_when_ready(key) for key in selected))
+    
+    @asynccontextmanager
+    async def _hold_resources(self, stage: Stage):
+        """Wait until no other run scrapes the same host or touches the same files."""
+        if self.locks is None:
+            yield
+            return
+        names = resources(stage)
+        busy = self.locks.busy(names)
+        if busy:
+            owners = ", ".join(sorted(set(busy.values())))
+            log(f"Waiting for {owners} to release {', '.join(sorted(busy))}", stage=stage.key)
+        async with self.locks.hold(names, self.label):
+            yield
+    
+    async def _execute(self, stage: Stage) -> bool:
+        current_stage_key.set(stage.key)
+        
+        if self.full_refresh:
+            log(f"Running {stage.key}: full refresh requested", stage=stage.key)
+        else:
+            should_run, reason = self.manifest.check(stage)
+            metrics.STAGE_CACHE.inc(stage=stage.key, result="miss" if should_run else "hit")
+            if not should_run:
+                self._set_progress(stage.key, 100)
+                log(f"Skipping {stage.key}: {reason}", stage=stage.key)
+                now = datetime.now()
+                self.history.record_stage(self.run_id, stage.key, "skipped", now, now)
+                return True
+            log(f"Running {stage.key}: {reason}", stage=stage.key)
+        
+        self.running_stages[stage.key] = stage.description
+        self._publish_stages()
+        log(f"Starting: {stage.description}", stage=stage.key)
+        started_at = datetime.now()
+        # In-process HTTP counters for this stage; tasks it spawns inherit them
+        stats = request_stats.RequestStats(stage.key)
+        request_stats.use(stats)
+        tracer, sampler = self._start_tracing(stage)
+        metrics.STAGE_RUNNING.set(1, stage=stage.key)
+        
+        # Only record fingerprints for work that actually produced its outputs
+        completed = True
+        success = False
+        try:
+            if stage.key == "frontend":
+                # Frontend processing failures are non-critical
+                completed = await self._run_npm_process()
+                if completed:
+                    log("Frontend data processing complete", stage=stage.key)
+                else:
+                    log("Warning: Frontend processing failed (non-critical)", stage=stage.key, level="warning")
+                success = True
+            elif stage.key == "get_values":
+                # Special handling for get_values - needs token
+                success = await self._run_get_values()
+            else:
+                success = await self._run_stage(stage)
         finally:
-            pipeline_status["running"] = False
-            pipeline_status["finished_at"] = datetime.now().isoformat()
-            pipeline_status["current_stage"] = "Complete" if not pipeline_status["error"] else "Failed"
+            del self.running_stages[stage.key]
+            self._publish_stages()
+            metrics.STAGE_RUNNING.set(0, stage=stage.key)
+            self._record_stage(stage, started_at, stats, success)
+            self._finish_tracing(stage, tracer, sampler)
+        
+        if self.status["cancelled"] or not success or not completed:
+            self.manifest.forget(stage)
+        if self.status["cancelled"]:
+            return False
+        if not success:
+            if not self.status["error"]:
+                self.status["error"] = f"Failed at stage: {stage.description}"
+            log(f"ERROR: {stage.description} failed", stage=stage.key, level="error")
+            return False
+        
+        if completed:
+            self.manifest.record(stage)
+        self._set_progress(stage.key, 100)
+        log(f"Completed: {stage.description}", stage=stage.key)
+        return True
     
-    async def _run_script(self, script_name: str, base_progress: int = 0, stage_weight: float = 100) -> bool:
-        global current_process
-        script_path = self.scripts_dir / script_name
+    def _record_stage(self, stage: Stage, started_at: datetime, stats: request_stats.RequestStats, success: bool):
+        child = self.child_stats.pop(stage.key, None)
+        if child:
+            stats.merge(child)
+            metrics.REGISTRY.merge(child.get("metrics", {}))
+            peak_rss_kb = child.get("peak_rss_kb")
+        elif stage.key == "frontend":
+            peak_rss_kb = None
+        else:
+            # Process-wide high-water mark; includes earlier in-process stages
+            peak_rss_kb = request_stats.peak_rss_kb()
+        
+        data = stats.snapshot()
+        data["errors"] += self.logs.counts[(stage.key, "error")]
+        data["peak_rss_kb"] = peak_rss_kb
+        status = "cancelled" if self.status["cancelled"] else ("ok" if success else "failed")
+        finished_at = datetime.now()
+        metrics.STAGE_DURATION.observe((finished_at - started_at).total_seconds(), stage=stage.key, status=status)
+        self.history.record_stage(self.run_id, stage.key, status, started_at, finished_at, data)
+    
+    def trace_path(self, stage_key: str, suffix: str = ".trace.json") -> Path:
+        return TRACES_DIR / f"run-{self.run_id}-{stage_key}{suffix}"
+
+    def _start_tracing(self, stage: Stage) -> tuple[Optional[tracing.Tracer], Optional[tracing.Sampler]]:
+        """In-process stages trace into their own context; subprocesses get env vars instead."""
+        if stage.key == "frontend" or not (self.trace or self.profile):
+            return None, None
+        TRACES_DIR.mkdir(parents=True, exist_ok=True)
+        if self.mode != "inprocess":
+            return None, None
+        tracer = tracing.Tracer(stage.key) if self.trace else None
+        tracing.use(tracer)
+        # Samples the whole event loop thread, so stages running alongside show up too
+        sampler = tracing.Sampler().start() if self.profile else None
+        return tracer, sampler
+
+    def _finish_tracing(self, stage: Stage, tracer: Optional[tracing.Tracer],
+                        sampler: Optional[tracing.Sampler]):
+        if tracer is not None:
+            tracer.write(self.trace_path(stage.key))
+        if sampler is not None:
+            sampler.stop()
+            sampler.write(self.trace_path(stage.key, ".folded"))
+
+        trace_file = self.trace_path(stage.key)
+        if self.trace and trace_file.exists():
+            summary = tracing.summarize(fast_json.load(trace_file)["traceEvents"])
+            spans = list(summary.items())[:TRACE_SUMMARY_SPANS]
+            if spans:
+                log("Trace: " + ", ".join(f"{name} {s['count']}x p50 {s['p50_ms']}ms p99 {s['p99_ms']}ms "
+                                          f"total {s['total_s']}s" for name, s in spans), stage=stage.key)
+        profile_file = self.trace_path(stage.key, ".folded")
+        if self.profile and profile_file.exists():
+            stacks = tracing.Sampler.load(profile_file)
+            top = ", ".join(f"{name} {share:.0%}" for name, share in stacks.top(5))
+            log(f"Profile ({stacks.samples} samples): {top}", stage=stage.key)
+
+    def _merge_traces(self, selected: list[str]):
+        """Fold the per-stage traces into one ``run-<id>.trace.json`` timeline."""
+        parts = [self.trace_path(key) for key in selected if self.trace_path(key).exists()]
+        if not parts:
+            return
+        merged = tracing.merge_traces(fast_json.load(part) for part in parts)
+        fast_json.dump(merged, TRACES_DIR / f"run-{self.run_id}.trace.json")
+        for part in parts:
+            part.unlink()
+
+    def _publish_stages(self):
+        if self.running_stages:
+            self.status["current_stage"] = " | ".join(self.running_stages.values())
+    
+    def _set_progress(self, stage_key: str, percent: float):
+        """Record stage progress and derive overall progress from the critical path.
+
+        Overall progress is 1 - (longest remaining weighted chain / longest
+        chain), so a finished side branch doesn't make the bar jump ahead of the
+        stages that actually bound wall time.
+        """
+        self.stage_progress[stage_key] = min(max(percent / 100, 0.0), 1.0)
+        total, _ = critical_path(self.deps, {key: STAGES[key].weight for key in self.deps})
+        remaining, _ = critical_path(
+            self.deps,
+            {key: STAGES[key].weight * (1 - self.stage_progress[key]) for key in self.deps},
+        )
+        if total:
+            self.status["progress"] = min(99, max(self.status["progress"], int((1 - remaining / total) * 100)))
+    
+    async def _run_stage(self, stage: Stage) -> bool:
+        if self.mode == "inprocess":
+            return await self._run_inprocess(stage)
+        return await self._run_script(stage)
+
+    async def _run_inprocess(self, stage: Stage) -> bool:
+        """Import the stage module and await its ``run()`` in this event loop.
+
+        This loop also serves the API and its log streams, so stages run their
+        blocking work (pandas, scraping with requests, file and store writes)
+        through ``asyncio.to_thread`` and only await on the loop.
+        """
+        loop = asyncio.get_running_loop()
+
+        def report(percent: float, message: Optional[str]):
+            self._set_progress(stage.key, percent)
+            if message:
+                log(message, stage=stage.key)
+
+        def on_progress(percent: float, message: Optional[str] = None):
+            # Stages report from worker threads too; run status is only updated on the loop
+            try:
+                on_loop = asyncio.get_running_loop() is loop
+            except RuntimeError:
+                on_loop = False
+            if on_loop:
+                report(percent, message)
+            else:
+                loop.call_soon_threadsafe(report, percent, message)
+
+        try:
+            if str(self.scripts_dir) not in sys.path:
+                sys.path.insert(0, str(self.scripts_dir))
+            module = importlib.import_module(Path(stage.script).stem)
+
+            # The stage task inherits this stop request and checks it between batches
+            stop = cancellation.StopRequest()
+            cancellation.use(stop)
+            task = asyncio.create_task(module.run(progress=on_progress, artifacts=self.artifacts))
+            while not task.done():
+                if self.status["cancelled"] and not stop.is_set():
+                    stop.set()
+                    log(f"Stopping {stage.key}: draining in-flight requests", stage=stage.key)
+                elif stop.is_set() and stop.elapsed() > STOP_TIMEOUT:
+                    log(f"{stage.key} did not stop within {STOP_TIMEOUT:.0f}s; cancelling it",
+                        stage=stage.key, level="warning")
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    return False
+                await asyncio.wait({task}, timeout=0.1 if stop.is_set() else 0.5)
+            self.artifacts.update(task.result() or {})
+            return not stop.is_set()
+
+        except cancellation.Cancelled as e:
+            log(f"Stopped {stage.key}: {e}", stage=stage.key)
+            return False
+        except Exception as e:
+            log(f"Error running {stage.script}: {str(e)}", stage=stage.key, level="error")
+            return False
+
+    async def _stream_process(self, process: asyncio.subprocess.Process, stage_key: str,
+                              on_line: Callable[[str], None], group: bool = False) -> bool:
+        """Feed the process's output lines to ``on_line`` until it exits.
+
+        On cancel the process gets SIGTERM (its whole process group with
+        ``group``) so it can drain and checkpoint, and SIGKILL if it is still
+        running ``STOP_TIMEOUT`` seconds later. Returns whether it exited 0
+        without being stopped.
+        """
+        def send(signum: int):
+            try:
+                if group:
+                    os.killpg(process.pid, signum)
+                else:
+                    process.send_signal(signum)
+            except ProcessLookupError:
+                pass
+
+        stop_at = None
+        killed = False
+        while True:
+            if self.status["cancelled"] and stop_at is None:
+                stop_at = time.monotonic()
+                log(f"Stopping {stage_key}: draining in-flight requests", stage=stage_key)
+                send(signal.SIGTERM)
+            elif stop_at is not None and not killed and time.monotonic() - stop_at > STOP_TIMEOUT:
+                log(f"{stage_key} did not stop within {STOP_TIMEOUT:.0f}s; killing it", stage=stage_key, level="warning")
+                send(signal.SIGKILL)
+                killed = True
+            
+            try:
+                line = await asyncio.wait_for(process.stdout.readline(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            
+            if not line:
+                break
+            decoded = line.decode().strip()
+            if decoded:
+                on_line(decoded)
+        
+        await process.wait()
+        if stop_at is not None:
+            log(f"Stopped {stage_key} {time.monotonic() - stop_at:.2f}s after the cancel request", stage=stage_key)
+            return False
+        return process.returncode == 0
+
+    async def _run_script(self, stage: Stage) -> bool:
+        script_path = self.scripts_dir / stage.script
         
         if not script_path.exists():
-            log(f"Script not found: {script_path}")
+            log(f"Script not found: {script_path}", stage=stage.key, level="error")
             return False
         
+        command = [sys.executable, str(script_path)]
+        # The child labels its metrics with the stage key, not the script name
+        env = {**os.environ, request_stats.STAGE_ENV: stage.key}
+        if self.full_refresh:
+            env[data_store.FULL_REFRESH_ENV] = "1"
+        if self.trace or self.profile:
+            # tracing.py runs the script after installing a tracer/sampler from these
+            command.insert(1, str(self.scripts_dir / "tracing.py"))
+            if self.trace:
+                env[tracing.TRACE_ENV] = str(self.trace_path(stage.key))
+            if self.profile:
+                env[tracing.PROFILE_ENV] = str(self.trace_path(stage.key, ".folded"))
+        
+        def on_line(decoded: str):
+            if decoded.startswith(request_stats.STATS_PREFIX):
+                self.child_stats[stage.key] = json.loads(decoded[len(request_stats.STATS_PREFIX):])
+                return
+            # Parse progress from script output like "Progress: 500/11000 (4.5%)"
+            progress_match = re.search(r'\((\d+\.?\d*)%\)', decoded)
+            if progress_match:
+                self._set_progress(stage.key, float(progress_match.group(1)))
+            
+            # Verbose debug output goes to the log file, not the console
+            log(decoded, stage=stage.key, level=infer_level(decoded))
+        
+        process = None
         try:
             process = await asyncio.create_subprocess_exec(
-                sys.executable, str(script_path),
+                *command,
                 cwd=str(self.scripts_dir),
+                env=env,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.STDOUT,
             )
-            current_process = process
-            
-            while True:
-                if pipeline_status["cancelled"]:
-                    process.terminate()
-                    await process.wait()
-                    current_process = None
-                    return False
-                
-                try:
-                    line = await asyncio.wait_for(process.stdout.readline(), timeout=0.5)
-                except asyncio.TimeoutError:
-                    continue
-                    
-                if not line:
-                    break
-                decoded = line.decode().strip()
-                if decoded:
-                    # Parse progress from script output like "Progress: 500/11000 (4.5%)"
-                    progress_match = re.search(r'\((\d+\.?\d*)%\)', decoded)
-                    if progress_match:
-                        script_progress = float(progress_match.group(1))
-                        pipeline_status["progress"] = base_progress + int(script_progress * stage_weight / 100)
-                    
-                    # Filter verbose debug output
-                    if not decoded.startswith("Debug:") and not decoded.startswith("---"):
-                        log(decoded)
-            
-            await process.wait()
-            current_process = None
-            return process.returncode == 0
+            current_processes.add(process)
+            return await self._stream_process(process, stage.key, on_line)
             
         except Exception as e:
-            current_process = None
-            log(f"Error running {script_name}: {str(e)}")
+            log(f"Error running {stage.script}: {str(e)}", stage=stage.key, level="error")
             return False
+        finally:
+            current_processes.discard(process)
     
-    async def _run_get_values(self, base_progress: int = 0, stage_weight: float = 100) -> bool:
+    async def _run_get_values(self) -> bool:
         """Run get_fighter_values.py with the provided token."""
         config_path = self.scripts_dir / "config.py"
         
         try:
-            with open(config_path, 'r') as f:
-                config_content = f.read()
-            
-            new_content = re.sub(
-                r"'real-request-token': '[^']*'",
-                f"'real-request-token': '{self.token}'",
-                config_content
-            )
-            
-            with open(config_path, 'w') as f:
-                f.write(new_content)
-            
-            log("Updated API token in config")
+            if self.token:
+                with open(config_path, 'r') as f:
+                    config_content = f.read()
+                
+                new_content = re.sub(
+                    r"'real-request-token': '[^']*'",
+                    f"'real-request-token': '{self.token}'",
+                    config_content
+                )
+                
+                with open(config_path, 'w') as f:
+                    f.write(new_content)
+                
+                log("Updated API token in config", stage="get_values")
+                
+                if self.mode == "inprocess":
+                    # An already-imported config keeps the old token; patch it in place
+                    if str(self.scripts_dir) not in sys.path:
+                        sys.path.insert(0, str(self.scripts_dir))
+                    config = importlib.import_module("config")
+                    config.HEADERS["real-request-token"] = self.token
             
-            return await self._run_script("get_fighter_values.py", base_progress, stage_weight)
+            return await self._run_stage(STAGES["get_values"])
             
         except Exception as e:
-            log(f"Error updating config: {str(e)}")
+            log(f"Error updating config: {str(e)}", stage="get_values", level="error")
             return False
     
     async def _run_npm_process(self) -> bool:
         """Run npx ts-node src/index.ts in the frontend directory."""
         frontend_dir = Path(__file__).parent.parent.parent
         
+        process = None
         try:
+            # Own process group: npx forks node, and a cancel has to stop both
             process = await asyncio.create_subprocess_exec(
                 "npx", "ts-node", "src/index.ts",
                 cwd=str(frontend_dir),
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True,
             )
-            
-            while True:
-                line = await process.stdout.readline()
-                if not line:
-                    break
-                decoded = line.decode().strip()
-                if decoded:
-                    log(decoded)
-            
-            await process.wait()
-            return process.returncode == 0
+            current_processes.add(process)
+            return await self._stream_process(
+                process, "frontend", lambda line: log(line, stage="frontend", level=infer_level(line)), group=True)
             
         except Exception as e:
-            log(f"Error running npm process: {str(e)}")
+            log(f"Error running npm process: {str(e)}", stage="frontend", level="error")
             return False
+        finally:
+            current_processes.discard(process)
@@ -0,0 +1,142 @@
+import json
+import sqlite3
+import statistics
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+DB_FILE = Path(__file__).parent.parent / "results" / "pipeline_runs.db"
+
+# A stage is flagged when its latest wall time exceeds the median of its
+# previous runs by this factor
+REGRESSION_FACTOR = 2.0
+TREND_WINDOW = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL,
+    mode TEXT,
+    stages TEXT,
+    full_refresh INTEGER,
+    wall_seconds REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS stage_runs (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    wall_seconds REAL,
+    requests INTEGER DEFAULT 0,
+    bytes INTEGER DEFAULT 0,
+    statuses TEXT,
+    errors INTEGER DEFAULT 0,
+    peak_rss_kb INTEGER,
+    PRIMARY KEY (run_id, stage)
+);
+CREATE INDEX IF NOT EXISTS idx_stage_runs_stage ON stage_runs(stage, run_id);
+"""
+
+
+class RunHistory:
+    """SQLite record of every pipeline run and per-stage telemetry."""
+
+    def __init__(self, path: Path = DB_FILE):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection that commits (or rolls back) and closes when the block exits."""
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def start_run(self, stages: list[str], mode: str, full_refresh: bool) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (started_at, status, mode, stages, full_refresh) VALUES (?, 'running', ?, ?, ?)",
+                (datetime.now().isoformat(), mode, json.dumps(stages), int(full_refresh)),
+            )
+            return cursor.lastrowid
+
+    def record_stage(self, run_id: int, stage: str, status: str, started_at: datetime,
+                     finished_at: datetime, stats: Optional[dict] = None):
+        stats = stats or {}
+        with self._connect() as conn:
+            conn.execute(
+                """INSERT OR REPLACE INTO stage_runs
+                   (run_id, stage, status, started_at, finished_at, wall_seconds,
+                    requests, bytes, statuses, errors, peak_rss_kb)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    run_id, stage, status,
+                    started_at.isoformat(), finished_at.isoformat(),
+                    (finished_at - started_at).total_seconds(),
+                    stats.get("requests", 0), stats.get("bytes", 0),
+                    json.dumps(stats.get("statuses", {})), stats.get("errors", 0),
+                    stats.get("peak_rss_kb"),
+                ),
+            )
+
+    def finish_run(self, run_id: int, status: str, error: Optional[str] = None):
+        finished_at = datetime.now()
+        with self._connect() as conn:
+            row = conn.execute("SELECT started_at FROM runs WHERE id = ?", (run_id,)).fetchone()
+            wall = (finished_at - datetime.fromisoformat(row["started_at"])).total_seconds() if row else None
+            conn.execute(
+                "UPDATE runs SET finished_at = ?, status = ?, wall_seconds = ?, error = ? WHERE id = ?",
+                (finished_at.isoformat(), status, wall, error, run_id),
+            )
+
+    def runs(self, limit: int = 20) -> list[dict]:
+        """Most recent runs, newest first, each with its stage rows."""
+        with self._connect() as conn:
+            runs = [dict(r) for r in conn.execute("SELECT * FROM runs ORDER BY id DESC LIMIT ?", (limit,))]
+            for run in runs:
+                run["stages"] = json.loads(run["stages"] or "[]")
+                run["stage_runs"] = [
+                    {**dict(r), "statuses": json.loads(r["statuses"] or "{}")}
+                    for r in conn.execute("SELECT * FROM stage_runs WHERE run_id = ? ORDER BY started_at", (run["id"],))
+                ]
+        return runs
+
+    def trends(self, window: int = TREND_WINDOW) -> dict:
+        """Latest vs. median wall time of each stage's recent successful runs."""
+        with self._connect() as conn:
+            stages = [r["stage"] for r in conn.execute("SELECT DISTINCT stage FROM stage_runs")]
+            result = {}
+            for stage in stages:
+                rows = conn.execute(
+                    """SELECT run_id, wall_seconds, requests, bytes, peak_rss_kb FROM stage_runs
+                       WHERE stage = ? AND status = 'ok' ORDER BY run_id DESC LIMIT ?""",
+                    (stage, window + 1),
+                ).fetchall()
+                if not rows:
+                    continue
+                latest, previous = rows[0], rows[1:]
+                baseline = statistics.median(r["wall_seconds"] for r in previous) if previous else None
+                ratio = latest["wall_seconds"] / baseline if baseline else None
+                result[stage] = {
+                    "latest_run_id": latest["run_id"],
+                    "latest_seconds": latest["wall_seconds"],
+                    "median_seconds": baseline,
+                    "ratio": ratio,
+                    "regression": ratio is not None and ratio >= REGRESSION_FACTOR,
+                    "history": [
+                        {"run_id": r["run_id"], "wall_seconds": r["wall_seconds"], "requests": r["requests"],
+                         "bytes": r["bytes"], "peak_rss_kb": r["peak_rss_kb"]}
+                        for r in reversed(rows)
+                    ],
+                }
+        return result
@@ -0,0 +1,165 @@
+"""
+Periodic pipeline refreshes, queued as jobs from inside the API server.
+
+Off unless ``RAX_SCHEDULE=on``: an enabled server scrapes ufcstats and Real
+Sports unattended. When enabled, two schedules run, each a five-field cron
+expression plus random jitter:
+
+- ``incremental`` (``RAX_INCREMENTAL_CRON``, default hourly): the default stage
+  list without ``full_refresh``. ``add_fights`` and ``get_values`` always
+  fetch, which picks up new events and ownership changes. The stage
+  manifest skips every local stage whose inputs are unchanged, so an hour
+  with no new fights costs the two fetches and nothing else.
+- ``full`` (``RAX_FULL_CRON``, default Monday 04:30): the same stages with
+  ``full_refresh``, so every stage runs once a week.
+
+Set either variable to ``off`` to disable that schedule. ``RAX_SCHEDULE_JITTER``
+(seconds, default 300) delays each trigger by a random amount, so restarts
+and several servers don't all hit ufcstats on the minute.
+
+Triggers coalesce: a scheduled job still waiting in the queue absorbs the
+next trigger (a full trigger upgrades it to a full refresh), and a trigger
+is dropped while a scheduled job of at least the same strength is running.
+Scheduled jobs have no token; ``get_values`` uses the one in ``scripts/config.py``.
+"""
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Optional
+
+from api.jobs import Job, JobQueue
+from api.pipeline_runner import log
+from api.stages import DEFAULT_STAGES
+
+ENABLED = os.environ.get("RAX_SCHEDULE", "off").strip().lower() in ("on", "1", "true", "yes")
+INCREMENTAL_CRON = os.environ.get("RAX_INCREMENTAL_CRON", "0 * * * *")
+FULL_CRON = os.environ.get("RAX_FULL_CRON", "30 4 * * 1")
+JITTER = float(os.environ.get("RAX_SCHEDULE_JITTER", "300"))
+
+# minute, hour, day of month, month, day of week (0 = Sunday, 7 also Sunday)
+FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def parse_field(field: str, low: int, high: int) -> frozenset[int]:
+    values = set()
+    for part in field.split(","):
+        part, _, step = part.partition("/")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = map(int, part.split("-"))
+        else:
+            start = end = int(part)
+            if step:
+                end = high
+        if not low <= start <= end <= high:
+            raise ValueError(f"Cron field out of range {low}-{high}: {field}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """Five-field cron expression (``*``, ``a-b``, ``*/n``, ``a,b``) in local time."""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expected 5 cron fields, got {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_field(field, low, high) for field, (low, high) in zip(fields, FIELD_RANGES))
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        # As in cron: when both day fields are restricted, either one matching is enough
+        self.any_day = fields[2] == "*" or fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        in_month = moment.day in self.days
+        in_week = (moment.weekday() + 1) % 7 in self.weekdays
+        return in_month and in_week if self.any_day else in_month or in_week
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after ``moment``."""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never fires: {self.expression}")
+
+
+class Scheduler:
+    def __init__(self, queue: JobQueue, incremental: str = INCREMENTAL_CRON, full: str = FULL_CRON,
+                 jitter: float = JITTER, enabled: bool = ENABLED):
+        self.queue = queue
+        self.enabled = enabled
+        self.jitter = jitter
+        self.schedules = {name: CronSchedule(expression)
+                          for name, expression in (("incremental", incremental), ("full", full))
+                          if expression.strip().lower() != "off"}
+        self.next_run: dict[str, datetime] = {}
+        self.last_job: dict[str, int] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def _plan(self, name: str, after: datetime):
+        delay = timedelta(seconds=random.uniform(0, self.jitter))
+        self.next_run[name] = self.schedules[name].next_after(after) + delay
+
+    def start(self):
+        if not self.enabled:
+            log("Scheduled refreshes are off (set RAX_SCHEDULE=on to enable them)")
+            return
+        now = datetime.now()
+        for name in self.schedules:
+            self._plan(name, now)
+        if self.schedules:
+            self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _loop(self):
+        while True:
+            name = min(self.next_run, key=self.next_run.get)
+            await asyncio.sleep(max(0.0, (self.next_run[name] - datetime.now()).total_seconds()))
+            self.trigger(name)
+            self._plan(name, datetime.now())
+
+    def trigger(self, name: str) -> Job:
+        """Queue a scheduled refresh, or fold it into one already queued or running."""
+        full_refresh = name == "full"
+        scheduled = [job for job in self.queue.queued() + self.queue.running() if job.source.startswith("schedule")]
+        for job in scheduled:
+            if job.state == "queued":
+                if full_refresh and not job.full_refresh:
+                    job.full_refresh = True
+                    job.source = "schedule:full"
+                    self.queue.store.update(job)
+                log(f"Scheduled {name} refresh coalesced into queued job {job.id}")
+                return job
+        for job in scheduled:
+            if job.full_refresh or not full_refresh:
+                log(f"Scheduled {name} refresh skipped: job {job.id} is already running")
+                return job
+        job = self.queue.submit(Job(list(DEFAULT_STAGES), full_refresh=full_refresh, source=f"schedule:{name}"))
+        self.last_job[name] = job.id
+        log(f"Scheduled {name} refresh queued as job {job.id}")
+        return job
+
+    def to_dict(self) -> dict:
+        return {name: {"cron": schedule.expression,
+                       "enabled": self.enabled,
+                       "next_run": self.next_run[name].isoformat(timespec="seconds") if name in self.next_run else None,
+                       "last_job": self.last_job.get(name)}
+                for name, schedule in self.schedules.items()}
@@ -0,0 +1,120 @@
+import os
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+PYTHON_DIR = Path(__file__).parent.parent
+
+
+class Stage(NamedTuple):
+    key: str
+    script: Optional[str]          # None for the frontend (npx) step
+    description: str
+    weight: int                    # rough relative duration, used for progress
+    inputs: tuple[str, ...]        # paths relative to python/
+    outputs: tuple[str, ...]
+    volatile: Optional[str] = None # why it is never skipped (remote data, the date), if it isn't
+    hosts: tuple[str, ...] = ()    # remote services it scrapes; one stage per host at a time
+
+
+# What a run does when no stages are given (the /update page's default selection)
+DEFAULT_STAGES = ("add_fights", "remove_duplicates", "process_matches", "aggregate", "get_values")
+
+# Run after whatever the user selects, once their inputs are ready
+FINAL_STAGES = ("identities", "bundle", "frontend")
+
+STAGES = {
+    "add_fights": Stage(
+        "add_fights", "add_new_fights.py", "Adding new fights", 10,
+        inputs=("data/fights.csv", "data/all_fighters.csv"),
+        outputs=("results/all_fights.csv", "data/fights.csv"),
+        volatile="fetches remote data",
+        hosts=("ufcstats",),
+    ),
+    "remove_duplicates": Stage(
+        "remove_duplicates", "remove_duplicates.py", "Removing duplicates", 2,
+        inputs=("results/all_fights.csv", "data/fights.csv"),
+        outputs=("results/all_fights.csv", "data/fights.csv"),
+    ),
+    "process_matches": Stage(
+        "process_matches", "process_matches_fast.py", "Processing matches (optimized)", 50,
+        # Fights parsed by earlier runs are read back from the data store
+        inputs=("results/all_fights.csv", "data/fighters.csv", "results/rax.db#fight_facts"),
+        outputs=("results/new_final.csv", "results/fight_history.csv"),
+        hosts=("ufcstats",),
+    ),
+    "aggregate": Stage(
+        "aggregate", "aggregate_values.py", "Aggregating values", 3,
+        inputs=("results/new_final.csv", "results/fight_history.csv", "data/active_overrides.csv"),
+        outputs=("results/final_values.csv",),
+        # When no flag changes, the unchanged output still lets the stages after it skip
+        volatile="active status depends on the date",
+    ),
+    "get_values": Stage(
+        "get_values", "get_fighter_values.py", "Fetching fighter values from API", 30,
+        inputs=(),
+        outputs=("../public/data/fighters_values.json",),
+        volatile="fetches remote data",
+        hosts=("realsports",),
+    ),
+    "identities": Stage(
+        "identities", "fighter_identity.py", "Resolving fighter identities", 1,
+        inputs=("data/all_fighters.csv", "results/final_values.csv", "../public/data/fighters_values.json"),
+        outputs=("results/fighter_identities.json",),
+    ),
+    "bundle": Stage(
+        "bundle", "fighter_bundle.py", "Writing binary fighter bundle", 1,
+        inputs=("results/final_values.csv", "results/fight_history.csv", "../public/data/fighters_values.json",
+                "results/fighter_identities.json"),
+        outputs=("results/fighters.bundle",),
+    ),
+    "frontend": Stage(
+        "frontend", None, "Running frontend data processing", 5,
+        inputs=("results/final_values.csv", "results/fight_history.csv", "../public/data/fighters_values.json",
+                "results/fighter_identities.json"),
+        outputs=("../data/final_values.csv", "../data/fights.csv", "../public/data/processed_fighters.json"),
+    ),
+}
+
+
+def resolve(path: str) -> Path:
+    return (PYTHON_DIR / path).resolve()
+
+
+def resources(stage: Stage) -> list[str]:
+    """Locks a stage holds while it runs: the hosts it scrapes and every file it touches.
+
+    Sorted, so stages acquiring several locks always take them in the same order.
+    """
+    files = {f"file:{os.path.relpath(resolve(path), PYTHON_DIR)}" for path in stage.inputs + stage.outputs}
+    return sorted({f"host:{host}" for host in stage.hosts} | files)
+
+
+def build_graph(keys: list[str]) -> dict[str, set[str]]:
+    """Map each selected stage to the earlier selected stages it must wait for.
+
+    Stage B waits for an earlier stage A when A writes a file B reads or writes,
+    or when B overwrites a file A reads. Everything else may run concurrently.
+    """
+    deps = {key: set() for key in keys}
+    for i, key in enumerate(keys):
+        stage = STAGES[key]
+        touched = set(stage.inputs) | set(stage.outputs)
+        for earlier in keys[:i]:
+            prev = STAGES[earlier]
+            if set(prev.outputs) & touched or set(prev.inputs) & set(stage.outputs):
+                deps[key].add(earlier)
+    return deps
+
+
+def critical_path(deps: dict[str, set[str]], weights: dict[str, float]) -> tuple[float, list[str]]:
+    """Return the heaviest dependency chain as ``(total_weight, [keys])``."""
+    best: dict[str, tuple[float, list[str]]] = {}
+
+    def visit(key: str) -> tuple[float, list[str]]:
+        if key not in best:
+            chains = [visit(dep) for dep in deps[key]]
+            length, chain = max(chains, default=(0.0, []))
+            best[key] = (length + weights[key], chain + [key])
+        return best[key]
+
+    return max((visit(key) for key in deps), default=(0.0, []))
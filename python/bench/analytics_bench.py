@@ -0,0 +1,141 @@
+"""
+Benchmark of the vectorized fight_history analytics.
+
+    cd python
+    python -m bench.analytics_bench                         # results/fight_history.csv + synthetic 1M rows
+    python -m bench.analytics_bench --synthetic-rows 5000000 --baseline-rows 0
+
+For the real history and a synthetic one of ``--synthetic-rows`` rows
+(written to a temp CSV, so loading is measured too) it reports:
+
+- load time for ``load_history``;
+- time for ``fighter_features`` and ``points_per_year``;
+- rows/s.
+
+On histories up to ``--baseline-rows`` it also times the same features
+computed the usual way, a pandas ``groupby().apply`` with a Python function
+per fighter. It checks that both give the same table.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from fight_analytics import FINISHES, FORM_WINDOW, fighter_features, load_history, points_per_year
+from process_matches_fast import FIVE_ROUND_BONUS, LOSS_POINTS, SCORING
+
+HISTORY_CSV = Path(__file__).parent.parent / "results" / "fight_history.csv"
+
+
+def synthetic_history(rows: int, seed: int = 0) -> pd.DataFrame:
+    """``rows`` fight_history rows: both sides of rows/2 fights among rows/25 fighters."""
+    rng = np.random.default_rng(seed)
+    fights = rows // 2
+    fighters = np.array([f"Fighter {i}" for i in range(max(2, rows // 25))], dtype=object)
+    winner = rng.integers(len(fighters), size=fights)
+    loser = (winner + rng.integers(1, len(fighters), size=fights)) % len(fighters)
+    methods = np.array(list(SCORING) + ["Overturned"], dtype=object)
+    method = rng.integers(len(methods), size=fights)
+    day = rng.integers(np.datetime64("1994-01-01", "D").astype(int), np.datetime64("2025-12-31", "D").astype(int),
+                       size=fights).astype("datetime64[D]").astype(str)
+    round_bonus = np.where(rng.random(fights) < 0.15, FIVE_ROUND_BONUS, 0)
+    strike_diff = rng.integers(0, 60, size=fights)
+    win_points = np.array([SCORING.get(m, 0) for m in methods])[method]
+    winner_struck = rng.random(fights) < 0.7
+
+    def side(fighter, opponent, points, struck):
+        bonus = np.where(struck, strike_diff, 0)
+        return pd.DataFrame({
+            "fighter_name": fighters[fighter], "date": day, "opponent": fighters[opponent],
+            "method": methods[method], "method_points": points, "strike_bonus": bonus,
+            "round_bonus": round_bonus, "total_points": points + bonus + round_bonus,
+        })
+
+    return pd.concat([side(winner, loser, win_points, winner_struck),
+                      side(loser, winner, np.full(fights, LOSS_POINTS), ~winner_struck)], ignore_index=True)
+
+
+def baseline_features(path: Path) -> pd.DataFrame:
+    """The same table via read_csv + groupby().apply, one Python call per fighter."""
+    df = pd.read_csv(path)
+    df = df[df["fighter_name"].notna()]
+    df["date"] = pd.to_datetime(df["date"])
+
+    def features(group: pd.DataFrame) -> pd.Series:
+        group = group.sort_values("date", kind="mergesort")
+        won = (group["method_points"] != LOSS_POINTS).tolist()
+        finishes = sum(w and m in FINISHES for w, m in zip(won, group["method"]))
+        streak, longest, run = 0, 0, 0
+        for w in won:
+            run = run + 1 if w else 0
+            longest = max(longest, run)
+        for w in reversed(won):
+            if w != won[-1]:
+                break
+            streak += 1
+        recent = group.tail(FORM_WINDOW)
+        return pd.Series({
+            "fights": len(group), "wins": sum(won), "finishes": finishes,
+            "total_points": group["total_points"].sum(), "best_fight": group["total_points"].max(),
+            "form_points": recent["total_points"].mean(),
+            "form_wins": int((recent["method_points"] != LOSS_POINTS).sum()),
+            "current_streak": streak if won[-1] else -streak, "longest_win_streak": longest,
+            "last_fight": group["date"].iloc[-1],
+        })
+
+    return df.groupby("fighter_name").apply(features).reset_index().rename(columns={"fighter_name": "name"})
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def report(label: str, path: Path, baseline_rows: int):
+    history, load_s = timed(load_history, path)
+    features, features_s = timed(fighter_features, history)
+    yearly, yearly_s = timed(points_per_year, history)
+    rows = len(history)
+    total = load_s + features_s + yearly_s
+    print(f"{label}: {rows:,} rows, {len(features):,} fighters, {yearly.shape[1]} years")
+    print(f"  load {load_s * 1000:8.1f} ms | features {features_s * 1000:8.1f} ms | "
+          f"per-year {yearly_s * 1000:8.1f} ms | {rows / total:,.0f} rows/s end to end")
+
+    if rows > baseline_rows:
+        return
+    expected, baseline_s = timed(baseline_features, path)
+    columns = [c for c in expected.columns if c != "name"]
+    actual, expected = (frame.set_index("name")[columns].sort_index() for frame in (features, expected))
+    for frame in (actual, expected):
+        frame["last_fight"] = frame["last_fight"].astype("datetime64[s]").astype(np.int64)
+    pd.testing.assert_frame_equal(actual.astype(float), expected.astype(float))
+    print(f"  groupby.apply baseline {baseline_s * 1000:8.1f} ms (same features) -> "
+          f"{baseline_s / (load_s + features_s):.0f}x slower")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=Path, default=HISTORY_CSV)
+    parser.add_argument("--synthetic-rows", type=int, default=1_000_000)
+    parser.add_argument("--baseline-rows", type=int, default=100_000,
+                        help="also run the groupby.apply baseline on histories up to this size")
+    args = parser.parse_args()
+
+    if args.history.exists():
+        report(args.history.name, args.history, args.baseline_rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "fight_history.csv"
+        synthetic_history(args.synthetic_rows).to_csv(path, index=False)
+        report(f"synthetic {args.synthetic_rows:,}", path, args.baseline_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Cold-load benchmark: the binary fighter bundle against the CSV + JSON files.
+
+    cd python
+    python -m bench.bundle_bench                          # results/ + synthetic 1M rows
+    python -m bench.bundle_bench --synthetic-rows 0 --repeat 10
+
+Each load runs in a fresh interpreter (imports excluded from the timing), so
+nothing parsed by an earlier run is reused; the OS page cache stays warm.
+Both sides end with names, owned passes and fight points per fighter.
+
+The CSV + JSON side reads ``fight_history.csv``, ``final_values.csv``,
+``fighters_values.json`` and ``fighter_identities.json``, and joins them by
+name as ``processFighters.ts`` does, with a pandas groupby for the points. The
+bundle side maps ``fighters.bundle``, then sums each fighter's points over
+the fight table.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import fast_json
+import fighter_bundle
+from bench.analytics_bench import synthetic_history
+
+PYTHON_DIR = Path(__file__).parent.parent
+SOURCES = {
+    "history": PYTHON_DIR / "results" / "fight_history.csv",
+    "values": PYTHON_DIR / "results" / "final_values.csv",
+    "fighters_values": fighter_bundle.PUBLIC_DATA_DIR / "fighters_values.json",
+    "identities": PYTHON_DIR / "results" / "fighter_identities.json",
+}
+
+
+def load_csv_json(files: dict) -> tuple:
+    history = pd.read_csv(files["history"])
+    values = pd.read_csv(files["values"])
+    fighters_values = fast_json.load(files["fighters_values"])
+    identities = fast_json.load(files["identities"]) if Path(files["identities"]).exists() else {}
+
+    def owned(name):
+        key = identities.get(name, {}).get("realsports_name", name)
+        return int(fighters_values.get(key, {}).get("value", 0))
+
+    names = values["name"].tolist()
+    owned_passes = np.array([owned(name) for name in names])
+    totals = history.groupby("fighter_name")["total_points"].sum().reindex(names, fill_value=0).values
+    return names, owned_passes, totals
+
+
+def load_bundle(path: Path) -> tuple:
+    bundle = fighter_bundle.load(path)
+    fights = bundle.fights
+    totals = np.bincount(fights["fighter"], weights=fights["total_points"], minlength=len(bundle))
+    return bundle.names[:len(bundle)], np.asarray(bundle.fighters["owned_passes"]), totals.astype(np.int64)
+
+
+def child(kind: str, files: dict):
+    """Time one load in this (fresh) interpreter and print the seconds."""
+    start = time.perf_counter()
+    names, owned, totals = load_bundle(Path(files["bundle"])) if kind == "bundle" else load_csv_json(files)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "fighters": len(names), "points": int(totals.sum())}))
+
+
+def cold(kind: str, files: dict, repeat: int) -> tuple[float, dict]:
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-m", "bench.bundle_bench", "--child", kind, "--files",
+                              json.dumps({k: str(v) for k, v in files.items()})],
+                             cwd=PYTHON_DIR, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(r["seconds"] for r in runs), runs[-1]
+
+
+def report(label: str, files: dict, repeat: int):
+    sections = fighter_bundle.build(files["history"], pd.read_csv(files["values"]),
+                                    fast_json.load(files["fighters_values"]),
+                                    fast_json.load(files["identities"]) if Path(files["identities"]).exists() else {})
+    fighter_bundle.write(sections, Path(files["bundle"]))
+
+    text_bytes = sum(Path(files[k]).stat().st_size for k in SOURCES if Path(files[k]).exists())
+    bundle_bytes = Path(files["bundle"]).stat().st_size
+    text_s, text = cold("csv", files, repeat)
+    bundle_s, bundle = cold("bundle", files, repeat)
+    # Fighters in the history but not in final_values only exist on the bundle side
+    assert bundle["points"] >= text["points"], "bundle lost fight points"
+    print(f"{label}: {len(sections['fighters']):,} fighters, {len(sections['fights']):,} fights")
+    print(f"  CSV + JSON {text_bytes / 1e6:6.1f} MB  {text_s * 1000:8.1f} ms")
+    print(f"  bundle     {bundle_bytes / 1e6:6.1f} MB  {bundle_s * 1000:8.1f} ms  "
+          f"({text_s / bundle_s:.0f}x faster, median of {repeat} fresh processes)")
+
+
+def synthetic_files(rows: int, directory: Path) -> dict:
+    history = synthetic_history(rows)
+    totals = history.groupby("fighter_name")["total_points"].sum()
+    values = pd.DataFrame({"name": totals.index, "Value": totals.values})
+    rng = np.random.default_rng(1)
+    fighters_values = {
+        name: {"id": i, "value": str(rng.integers(0, 3000)),
+               "pass_distribution": {str(level): int(rng.integers(0, 50)) for level in fighter_bundle.PASS_LEVELS}}
+        for i, name in enumerate(values["name"])
+    }
+    files = {"history": directory / "fight_history.csv", "values": directory / "final_values.csv",
+             "fighters_values": directory / "fighters_values.json", "identities": directory / "identities.json"}
+    history.to_csv(files["history"], index=False)
+    values.to_csv(files["values"], index=False)
+    fast_json.dump(fighters_values, files["fighters_values"], pretty=True)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic-rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", choices=("csv", "bundle"), help=argparse.SUPPRESS)
+    parser.add_argument("--files", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, json.loads(args.files))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        if all(SOURCES[k].exists() for k in ("history", "values", "fighters_values")):
+            report("results/", {**SOURCES, "bundle": tmp / "real.bundle"}, args.repeat)
+        if args.synthetic_rows:
+            files = synthetic_files(args.synthetic_rows, tmp)
+            report(f"synthetic {args.synthetic_rows:,}", {**files, "bundle": tmp / "synthetic.bundle"}, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Saved ufcstats pages and Real Sports feeds for offline runs.
+
+A corpus directory mirrors the URL paths it replays:
+
+    ufcstats/fight-details/<id>.html
+    ufcstats/event-details/<id>.html
+    ufcstats/fighter-details/<id>.html
+    realsports/hotseason/<before>.json
+    realsports/leaderboard/<fighter id>/<before>.json
+    realsports/teams/<fighter id>.json
+    fights.csv, fighters.csv        # inputs in the same shape as data/
+
+Pages keep their original ``http://ufcstats.com`` links; the mock server
+rewrites them to its own address when serving. ``generate()`` builds a
+deterministic synthetic corpus with the same markup the parsers read, and
+``record()`` saves real pages for the fight URLs given.
+"""
+import json
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+import requests
+
+UFCSTATS_BASE = "http://ufcstats.com"
+PAGE_SIZE = 20  # Real Sports pages are offset by 20 via ?before=
+
+FIRST_NAMES = ["Alex", "Bruno", "Carlos", "Dan", "Erik", "Felipe", "Gabe", "Hector", "Ivan", "Jon",
+               "Kamaru", "Luis", "Max", "Nate", "Omar", "Paulo", "Quinn", "Rafael", "Sean", "Tai"]
+LAST_NAMES = ["Silva", "Johnson", "Nurmagomedov", "Ferreira", "Holloway", "Santos", "Usman",
+              "Volkov", "Walker", "Young", "Adesanya", "Blanchfield", "Costa", "Diaz", "Evloev"]
+METHODS = ["KO/TKO", "Submission", "Decision - Unanimous", "Decision - Majority", "Decision - Split"]
+
+FIGHT_PAGE = """<html><body>
+<section class="b-statistics__section_details">
+<h2 class="b-content__title"><a class="b-link" href="{event_url}">{event_name}</a></h2>
+<div class="b-fight-details__persons clearfix">
+{persons}
+</div>
+<div class="b-fight-details__fight">
+<p class="b-fight-details__text">
+<i class="b-fight-details__text-item_first"><i class="b-fight-details__label">Method:</i>
+<i style="font-style: normal">{method}</i></i>
+<i class="b-fight-details__text-item"><i class="b-fight-details__label">Round:</i> {round}</i>
+<i class="b-fight-details__text-item"><i class="b-fight-details__label">Time format:</i> {time_format}</i>
+</p>
+</div>
+<table class="b-fight-details__table">
+<tbody class="b-fight-details__table-body">
+<tr class="b-fight-details__table-row">
+<td class="b-fight-details__table-col l-page_align_left">
+<p class="b-fight-details__table-text"><a class="b-link b-link_style_black" href="{top_url}">{top}</a></p>
+<p class="b-fight-details__table-text"><a class="b-link b-link_style_black" href="{bottom_url}">{bottom}</a></p>
+</td>
+<td class="b-fight-details__table-col"><p class="b-fight-details__table-text">{top_kd}</p><p class="b-fight-details__table-text">{bottom_kd}</p></td>
+<td class="b-fight-details__table-col"><p class="b-fight-details__table-text">{top_sig} of {top_att}</p><p class="b-fight-details__table-text">{bottom_sig} of {bottom_att}</p></td>
+</tr>
+</tbody>
+</table>
+</section>
+</body></html>
+"""
+
+PERSON = """<div class="b-fight-details__person">
+<i class="b-fight-details__person-status">{status}</i>
+<div class="b-fight-details__person-text"><h3 class="b-fight-details__person-name">
+<a class="b-link b-fight-details__person-link" href="{url}">{name}</a></h3></div>
+</div>"""
+
+EVENT_PAGE = """<html><body>
+<h2 class="b-content__title"><span class="b-content__title-highlight">{name}</span></h2>
+<ul class="b-list__box-list">
+<li class="b-list__box-list-item"><i class="b-list__box-item-title">Date:</i> {date}</li>
+<li class="b-list__box-list-item"><i class="b-list__box-item-title">Location:</i> Las Vegas, Nevada, USA</li>
+</ul>
+</body></html>
+"""
+
+FIGHTER_PAGE = """<html><body>
+<span class="b-content__title-highlight">{name}</span>
+<table class="b-fight-details__table"><tbody>
+{rows}
+</tbody></table>
+</body></html>
+"""
+
+FIGHTER_ROW = """<tr class="b-fight-details__table-row b-fight-details__table-row__hover js-fight-details-click" data-link="{url}"><td></td></tr>"""
+
+
+def _hex_id(rng: random.Random) -> str:
+    return "%016x" % rng.getrandbits(64)
+
+
+def generate(out_dir: Path, n_fights: int = 500, n_fighters: int = 120, seed: int = 7) -> Path:
+    """Write a deterministic synthetic corpus; the same seed gives byte-identical files."""
+    rng = random.Random(seed)
+    out_dir = Path(out_dir)
+    for sub in ("ufcstats/fight-details", "ufcstats/event-details", "ufcstats/fighter-details",
+                "realsports/hotseason", "realsports/leaderboard", "realsports/teams"):
+        (out_dir / sub).mkdir(parents=True, exist_ok=True)
+
+    fighters = []
+    names = set()
+    while len(fighters) < n_fighters:
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        if name in names:
+            name = f"{name} {len(fighters)}"
+        names.add(name)
+        fighters.append({
+            "name": name,
+            "ufcstats_id": _hex_id(rng),
+            "realsports_id": 1000 + len(fighters),
+            "fights": [],
+        })
+
+    # Events every other week, 6-12 fights each
+    event_date = date(2015, 1, 10)
+    events = []
+    remaining = n_fights
+    while remaining > 0:
+        size = min(remaining, rng.randint(6, 12))
+        events.append({"id": _hex_id(rng), "date": event_date, "name": f"UFC Fight Night {len(events) + 1}", "size": size})
+        event_date += timedelta(days=14)
+        remaining -= size
+
+    fight_rows = []
+    for event in events:
+        for _ in range(event["size"]):
+            fight_id = _hex_id(rng)
+            top, bottom = rng.sample(fighters, 2)
+            fight_url = f"{UFCSTATS_BASE}/fight-details/{fight_id}"
+            top["fights"].append(fight_url)
+            bottom["fights"].append(fight_url)
+            fight_rows.append(fight_url)
+
+            draw = rng.random() < 0.02
+            top_wins = rng.random() < 0.5
+            five_rounds = rng.random() < 0.15
+            top_sig, bottom_sig = rng.randint(5, 180), rng.randint(5, 180)
+            persons = "\n".join(
+                PERSON.format(status="D" if draw else ("W" if wins else "L"),
+                              url=f"{UFCSTATS_BASE}/fighter-details/{f['ufcstats_id']}", name=f["name"])
+                for f, wins in ((top, top_wins), (bottom, not top_wins))
+            )
+            page = FIGHT_PAGE.format(
+                event_url=f"{UFCSTATS_BASE}/event-details/{event['id']}",
+                event_name=event["name"],
+                persons=persons,
+                method=rng.choice(METHODS),
+                round=rng.randint(1, 5 if five_rounds else 3),
+                time_format="5 Rnd (5-5-5-5-5)" if five_rounds else "3 Rnd (5-5-5)",
+                top_url=f"{UFCSTATS_BASE}/fighter-details/{top['ufcstats_id']}", top=top["name"],
+                bottom_url=f"{UFCSTATS_BASE}/fighter-details/{bottom['ufcstats_id']}", bottom=bottom["name"],
+                top_kd=rng.randint(0, 2), bottom_kd=rng.randint(0, 2),
+                top_sig=top_sig, top_att=top_sig + rng.randint(0, 120),
+                bottom_sig=bottom_sig, bottom_att=bottom_sig + rng.randint(0, 120),
+            )
+            (out_dir / "ufcstats/fight-details" / f"{fight_id}.html").write_text(page)
+
+        (out_dir / "ufcstats/event-details" / f"{event['id']}.html").write_text(
+            EVENT_PAGE.format(name=event["name"], date=event["date"].strftime("%B %d, %Y")))
+
+    for f in fighters:
+        rows = "\n".join(FIGHTER_ROW.format(url=url) for url in f["fights"])
+        (out_dir / "ufcstats/fighter-details" / f"{f['ufcstats_id']}.html").write_text(
+            FIGHTER_PAGE.format(name=f["name"], rows=rows))
+
+    # Real Sports: hot-season shop pages, pass leaderboards and team pages
+    for start in range(0, len(fighters), PAGE_SIZE):
+        items = [
+            {"id": f["realsports_id"], "value": str(rng.randint(0, 5000)), "entityType": "team",
+             "entity": {"id": f["realsports_id"], "name": f["name"]}}
+            for f in fighters[start:start + PAGE_SIZE]
+        ]
+        (out_dir / "realsports/hotseason" / f"{start}.json").write_text(json.dumps({"items": items}))
+
+    for f in fighters:
+        leaderboard_dir = out_dir / "realsports/leaderboard" / str(f["realsports_id"])
+        leaderboard_dir.mkdir(exist_ok=True)
+        levels = sorted((rng.choice([7, 6, 5, 5, 4, 4, 4, 3, 3, 3]) for _ in range(rng.randint(0, 70))), reverse=True)
+        levels.append(2)  # the scan stops at the first level <= 2
+        for start in range(0, len(levels), PAGE_SIZE):
+            feed = [{"boostInfo": {"level": level}} for level in levels[start:start + PAGE_SIZE]]
+            (leaderboard_dir / f"{start}.json").write_text(json.dumps({"feedItems": feed}))
+
+        dob = date(1985, 1, 1) + timedelta(days=rng.randint(0, 5000))
+        team = {"team": {"id": f["realsports_id"], "additionalInfo": {"details": [f"DOB: {dob.isoformat()}"]}}}
+        (out_dir / "realsports/teams" / f"{f['realsports_id']}.json").write_text(json.dumps(team))
+
+    with open(out_dir / "fights.csv", "w") as fh:
+        fh.write("fight_url\n" + "".join(f"{url}\n" for url in sorted(fight_rows, reverse=True)))
+    with open(out_dir / "fighters.csv", "w") as fh:
+        fh.write("fighter_f_name,fighter_l_name,fighter_url\n")
+        for f in fighters:
+            first, _, last = f["name"].partition(" ")
+            fh.write(f"{first},{last},{UFCSTATS_BASE}/fighter-details/{f['ufcstats_id']}\n")
+    return out_dir
+
+
+def record(out_dir: Path, fight_urls: list[str]) -> Path:
+    """Save live ufcstats fight pages (and their event pages) into a corpus."""
+    out_dir = Path(out_dir)
+    for sub in ("fight-details", "event-details"):
+        (out_dir / "ufcstats" / sub).mkdir(parents=True, exist_ok=True)
+
+    for url in fight_urls:
+        page = requests.get(url, timeout=15)
+        (out_dir / "ufcstats/fight-details" / f"{url.rstrip('/').rsplit('/', 1)[-1]}.html").write_text(page.text)
+        for event_url in set(_event_links(page.text)):
+            event_path = out_dir / "ufcstats/event-details" / f"{event_url.rstrip('/').rsplit('/', 1)[-1]}.html"
+            if not event_path.exists():
+                event_path.write_text(requests.get(event_url, timeout=15).text)
+
+    with open(out_dir / "fights.csv", "w") as fh:
+        fh.write("fight_url\n" + "".join(f"{url}\n" for url in fight_urls))
+    return out_dir
+
+
+def _event_links(html: str) -> list[str]:
+    marker = f"{UFCSTATS_BASE}/event-details/"
+    links = []
+    start = html.find(marker)
+    while start != -1:
+        end = html.find('"', start)
+        links.append(html[start:end])
+        start = html.find(marker, end)
+    return links
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build an offline corpus")
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--fights", type=int, default=500)
+    parser.add_argument("--fighters", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--record", type=Path, help="CSV of live fight URLs to record instead of generating")
+    args = parser.parse_args()
+
+    if args.record:
+        import pandas as pd
+        record(args.out_dir, list(pd.read_csv(args.record)["fight_url"]))
+    else:
+        generate(args.out_dir, args.fights, args.fighters, args.seed)
+    print(f"Corpus written to {args.out_dir}")
@@ -0,0 +1,119 @@
+"""
+JSON decode/encode benchmark for the Real Sports responses.
+
+    cd python
+    python -m bench.decode_bench                  # synthetic corpus
+    python -m bench.decode_bench --corpus bench/corpus_recorded --repeat 50
+
+Compares the original parsing (stdlib ``json.loads`` plus a dict walk) with
+``fast_json``'s typed decoders on every available backend, over the
+hotseason and leaderboard pages in the corpus. Also times the
+``save_progress`` checkpoint write: the old ``indent=4, sort_keys=True`` dump
+against the compact one.
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import fast_json
+from bench.corpus import generate
+
+
+def stdlib_hotseason(data: bytes) -> dict:
+    fighters = {}
+    json_data = json.loads(data)
+    if 'items' in json_data and json_data['items']:
+        for item in json_data['items']:
+            fighters[item['entity']['name']] = {'value': item['value'], 'id': item['id']}
+    return fighters
+
+
+def stdlib_pass_levels(data: bytes) -> list[int]:
+    levels = []
+    json_data = json.loads(data)
+    if 'feedItems' in json_data and json_data['feedItems']:
+        for item in json_data['feedItems']:
+            if 'boostInfo' in item and 'level' in item['boostInfo']:
+                levels.append(item['boostInfo']['level'])
+    return levels
+
+
+def fast_hotseason(data: bytes) -> dict:
+    return {name: {'value': value, 'id': id_} for name, value, id_ in fast_json.decode_hotseason(data)}
+
+
+def time_per_call(fn, payloads: list[bytes], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for payload in payloads:
+            fn(payload)
+    return (time.perf_counter() - start) / (repeat * len(payloads))
+
+
+def run(corpus_dir: Path, repeat: int = 20) -> list[dict]:
+    hotseason = [p.read_bytes() for p in sorted((corpus_dir / "realsports/hotseason").glob("*.json"))]
+    leaderboard = [p.read_bytes() for p in sorted((corpus_dir / "realsports/leaderboard").glob("*/*.json"))]
+
+    # Every decoder must agree with the original parsing before it is timed
+    expected_values = [stdlib_hotseason(p) for p in hotseason]
+    expected_levels = [stdlib_pass_levels(p) for p in leaderboard]
+
+    results = []
+    active = fast_json.BACKEND
+    try:
+        cases = [("stdlib (original)", stdlib_hotseason, stdlib_pass_levels, None)]
+        cases += [(f"fast_json[{name}]", fast_hotseason, fast_json.decode_pass_levels, name)
+                  for name in fast_json.BACKENDS]
+        for label, decode_values, decode_levels, backend in cases:
+            if backend:
+                fast_json.BACKEND = backend
+            assert [decode_values(p) for p in hotseason] == expected_values, label
+            assert [decode_levels(p) for p in leaderboard] == expected_levels, label
+            results.append({
+                "decoder": label,
+                "hotseason_us": round(time_per_call(decode_values, hotseason, repeat) * 1e6, 2),
+                "leaderboard_us": round(time_per_call(decode_levels, leaderboard, repeat) * 1e6, 2),
+            })
+
+        # Checkpoint write: fighters_values-shaped document, one entry per fighter
+        fighters = {}
+        for page in expected_values:
+            fighters.update(page)
+        for data in fighters.values():
+            data["pass_distribution"] = {7: 1, 6: 2, 5: 3, 4: 4, 3: 5}
+            data["age"] = 30
+        original = time_per_call(lambda d: json.dumps(d, indent=4, sort_keys=True), [fighters], repeat)
+        results.append({"decoder": "checkpoint json.dumps(indent=4)", "encode_us": round(original * 1e6, 2)})
+        for name in fast_json.BACKENDS:
+            fast_json.BACKEND = name
+            compact = time_per_call(fast_json.dumps, [fighters], repeat)
+            results.append({"decoder": f"checkpoint fast_json[{name}]", "encode_us": round(compact * 1e6, 2)})
+    finally:
+        fast_json.BACKEND = active
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, help="corpus directory (default: generate a synthetic one)")
+    parser.add_argument("--fighters", type=int, default=600, help="fighters in the synthetic corpus")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir = args.corpus or generate(Path(tmp), n_fights=50, n_fighters=args.fighters)
+        results = run(corpus_dir, args.repeat)
+
+    for r in results:
+        timings = "  ".join(f"{k}={v}" for k, v in r.items() if k != "decoder")
+        print(f"{r['decoder']:<36} {timings}")
+
+
+if __name__ == "__main__":
+    main()
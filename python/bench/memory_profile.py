@@ -0,0 +1,122 @@
+"""
+Memory profile of the fight processor's per-fighter records.
+
+    cd python
+    python -m bench.memory_profile                          # results/fight_history.csv
+    python -m bench.memory_profile --history path/to/fight_history.csv --scale 4
+
+Replays every fight_history row into the original model (one dict per
+fighter holding running totals and a list of per-fight dicts) and into
+``FightHistory``'s interned, array-backed columns, then reports the
+tracemalloc current/peak size of each and the time to build the
+``new_final`` / ``fight_history`` frames from it. Both models must produce
+the same frames before anything is reported.
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from process_matches_fast import SCORING, FightHistory
+
+HISTORY_CSV = Path(__file__).parent.parent / "results" / "fight_history.csv"
+TOTALS = list(SCORING) + ["StrikeBonus", "5roundBonus"]
+
+
+def load_rows(path: Path, scale: int) -> list[tuple]:
+    df = pd.read_csv(path, keep_default_na=False, na_values={"method": [""]})
+    df["method"] = df["method"].astype(object).where(df["method"].notna(), None)
+    rows = []
+    for copy in range(scale):
+        suffix = f" #{copy}" if copy else ""
+        rows += [(f"{url}{suffix}", fighter + suffix, date, opponent + suffix, method, mp, sb, rb)
+                 for url, (fighter, date, opponent, method, mp, sb, rb) in enumerate(
+                     df[["fighter_name", "date", "opponent", "method", "method_points",
+                         "strike_bonus", "round_bonus"]].itertuples(index=False, name=None))]
+    return rows
+
+
+def build_dicts(rows: list[tuple]) -> dict:
+    """The original model: ``{name: {totals..., "fight_history": [dict, ...]}}``."""
+    result = {}
+    for url, fighter, date, opponent, method, method_points, strike_bonus, round_bonus in rows:
+        # The processor creates both records before appending either side
+        for name in (fighter, opponent):
+            if name not in result:
+                result[name] = {"name": name, **{k: 0 for k in TOTALS}, "fight_history": []}
+        record = result[fighter]
+        if method_points > 0 and method in record:
+            record[method] += method_points
+        record["StrikeBonus"] += strike_bonus
+        record["5roundBonus"] += round_bonus
+        record["fight_history"].append({
+            "fight_url": str(url), "date": date, "opponent": opponent, "method": method,
+            "method_points": method_points, "strike_bonus": strike_bonus, "round_bonus": round_bonus,
+            "total_points": method_points + strike_bonus + round_bonus,
+        })
+    return result
+
+
+def dict_frames(result: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
+    stats = pd.DataFrame([{k: v for k, v in r.items() if k != "fight_history"} for r in result.values()])
+    history = pd.DataFrame([{"fighter_name": r["name"], **fight}
+                            for r in result.values() for fight in r["fight_history"]])
+    return stats, history
+
+
+def build_columnar(rows: list[tuple]) -> FightHistory:
+    history = FightHistory()
+    for url, *row in rows:
+        history.append(str(url), *row)
+    return history
+
+
+def columnar_frames(history: FightHistory) -> tuple[pd.DataFrame, pd.DataFrame]:
+    return history.totals_frame(), history.history_frame()
+
+
+def measure(build, frames, rows: list[tuple]) -> tuple[dict, tuple]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = build(rows)
+    built = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    out = frames(model)
+    framed = time.perf_counter() - start
+    return {"current_mb": round(current / 2**20, 2), "peak_mb": round(peak / 2**20, 2),
+            "build_ms": round(built * 1e3, 1), "frames_ms": round(framed * 1e3, 1)}, out
+
+
+def run(path: Path = HISTORY_CSV, scale: int = 1) -> list[dict]:
+    rows = load_rows(path, scale)
+    original, (stats, history) = measure(build_dicts, dict_frames, rows)
+    columnar, (col_stats, col_history) = measure(build_columnar, columnar_frames, rows)
+
+    pd.testing.assert_frame_equal(col_stats, stats, check_dtype=False)
+    pd.testing.assert_frame_equal(col_history, history[col_history.columns], check_dtype=False)
+    return [{"model": "dict records (original)", "rows": len(rows), **original},
+            {"model": "FightHistory (columnar)", "rows": len(rows), **columnar}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=Path, default=HISTORY_CSV)
+    parser.add_argument("--scale", type=int, default=1, help="replay the history this many times")
+    args = parser.parse_args()
+
+    for r in run(args.history, args.scale):
+        timings = "  ".join(f"{k}={v}" for k, v in r.items() if k != "model")
+        print(f"{r['model']:<26} {timings}")
+
+
+if __name__ == "__main__":
+    main()
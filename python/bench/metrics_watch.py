@@ -0,0 +1,123 @@
+"""
+Local stand-in for a Prometheus scraper: poll /metrics and alert on slowdowns.
+
+    cd python
+    python -m bench.metrics_watch --url http://localhost:8000/metrics --interval 5 --min-pages 20
+
+Every interval it scrapes the pipeline server and prints rates computed from
+the counter deltas: pages parsed/s, requests/s, error share, mean request
+latency, in-flight requests, connection queue depth, DNS-cache and
+connection-reuse hit rates, and server RSS. While a run is in progress it
+alerts when pages/s stays under ``--min-pages`` or mean latency over
+``--max-latency`` for ``--for`` consecutive scrapes.
+"""
+import argparse
+import re
+import time
+import urllib.request
+from typing import Optional
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+Samples = dict[tuple[str, tuple], float]
+
+
+def parse(text: str) -> Samples:
+    """Prometheus text format -> ``{(name, sorted label pairs): value}``."""
+    samples = {}
+    for line in text.splitlines():
+        match = SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        pairs = tuple(sorted((k, v.replace(r'\"', '"').replace(r"\n", "\n").replace(r"\\", "\\"))
+                             for k, v in LABEL.findall(labels or "")))
+        samples[(name, pairs)] = float(value.replace("+Inf", "inf"))
+    return samples
+
+
+def total(samples: Samples, name: str, **match) -> float:
+    """Sum of ``name`` over every series whose labels include ``match``."""
+    wanted = set(match.items())
+    return sum(value for (n, labels), value in samples.items() if n == name and wanted <= set(labels))
+
+
+def ratio(numerator: float, denominator: float) -> Optional[float]:
+    return numerator / denominator if denominator else None
+
+
+def summarize(previous: Samples, current: Samples, seconds: float) -> dict:
+    def delta(name, **match):
+        return total(current, name, **match) - total(previous, name, **match)
+
+    requests = delta("rax_http_requests_total")
+    latency_count = delta("rax_http_request_duration_seconds_count")
+    return {
+        "running": bool(total(current, "rax_pipeline_running")),
+        "progress": total(current, "rax_pipeline_progress_percent"),
+        "pages_per_s": delta("rax_pages_parsed_total") / seconds,
+        "requests_per_s": requests / seconds,
+        "error_share": ratio(delta("rax_http_request_errors_total"), requests + delta("rax_http_request_errors_total")),
+        "mean_latency_s": ratio(delta("rax_http_request_duration_seconds_sum"), latency_count),
+        "in_flight": total(current, "rax_http_requests_in_flight"),
+        "queued": total(current, "rax_http_connection_queue_depth"),
+        "dns_hit_rate": ratio(delta("rax_dns_cache_total", result="hit"), delta("rax_dns_cache_total")),
+        "reuse_rate": ratio(delta("rax_http_connections_total", kind="reused"), delta("rax_http_connections_total")),
+        "rss_mb": total(current, "rax_process_resident_memory_bytes") / 2**20,
+    }
+
+
+def alerts(summary: dict, min_pages: float, max_latency: float) -> list[str]:
+    if not summary["running"]:
+        return []
+    found = []
+    if summary["pages_per_s"] < min_pages:
+        found.append(f"pages/s {summary['pages_per_s']:.1f} < {min_pages}")
+    if summary["mean_latency_s"] is not None and summary["mean_latency_s"] > max_latency:
+        found.append(f"mean latency {summary['mean_latency_s']:.2f}s > {max_latency}s")
+    return found
+
+
+def scrape(url: str) -> Samples:
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return parse(response.read().decode())
+
+
+def fmt(value, pattern: str) -> str:
+    return "-" if value is None else format(value, pattern)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/metrics")
+    parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument("--min-pages", type=float, default=10.0, help="alert below this many pages/s")
+    parser.add_argument("--max-latency", type=float, default=2.0, help="alert above this mean latency (s)")
+    parser.add_argument("--for", dest="consecutive", type=int, default=3,
+                        help="scrapes a condition must hold before alerting")
+    args = parser.parse_args()
+
+    previous, previous_at = scrape(args.url), time.monotonic()
+    strikes: dict[str, int] = {}
+    while True:
+        time.sleep(args.interval)
+        current, now = scrape(args.url), time.monotonic()
+        s = summarize(previous, current, now - previous_at)
+        previous, previous_at = current, now
+
+        print(f"{time.strftime('%H:%M:%S')} run={'on' if s['running'] else 'off'} {s['progress']:.0f}%  "
+              f"pages/s={s['pages_per_s']:.1f} req/s={s['requests_per_s']:.1f} "
+              f"err={fmt(s['error_share'], '.1%')} lat={fmt(s['mean_latency_s'], '.3f')}s "
+              f"inflight={s['in_flight']:.0f} queued={s['queued']:.0f} "
+              f"dns_hit={fmt(s['dns_hit_rate'], '.0%')} reuse={fmt(s['reuse_rate'], '.0%')} rss={s['rss_mb']:.0f}MB")
+
+        firing = alerts(s, args.min_pages, args.max_latency)
+        strikes = {kind: strikes.get(kind, 0) + 1 for kind in (a.split(" ", 1)[0] for a in firing)}
+        for alert in firing:
+            if strikes[alert.split(" ", 1)[0]] >= args.consecutive:
+                print(f"ALERT: {alert}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Local stand-in for ufcstats.com and web.realsports.io that replays a corpus.
+
+Every response can be delayed by ``latency`` ± ``jitter`` seconds, and a
+``rate_429`` fraction of requests is answered with HTTP 429 instead. The RNG
+is seeded, so a given configuration produces the same sequence of delays and
+rejections.
+"""
+import asyncio
+import json
+import multiprocessing
+import random
+from pathlib import Path
+from typing import Optional
+
+from aiohttp import web
+
+from bench.corpus import UFCSTATS_BASE
+
+
+class MockServer:
+    def __init__(self, corpus_dir: Path, latency: float = 0.0, jitter: float = 0.0,
+                 rate_429: float = 0.0, seed: int = 0):
+        self.corpus_dir = Path(corpus_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.rng = random.Random(seed)
+        self.base_url: Optional[str] = None
+        self.served = 0
+        self.rejected = 0
+        self.runner: Optional[web.AppRunner] = None
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._shape])
+        app.router.add_get("/fight-details/{id}", self._ufcstats("fight-details"))
+        app.router.add_get("/event-details/{id}", self._ufcstats("event-details"))
+        app.router.add_get("/fighter-details/{id}", self._ufcstats("fighter-details"))
+        app.router.add_get("/userpassshop/ufc/season/{season}/entity/team/section/hotseason", self._hotseason)
+        app.router.add_get("/userpasses/ufc/type/team/entity/{id}/leaderboard", self._leaderboard)
+        app.router.add_get("/teams/{id}/sport/ufc", self._team)
+        app.router.add_get("/stats", self._stats)
+        return app
+
+    @web.middleware
+    async def _shape(self, request: web.Request, handler):
+        if request.path == "/stats":
+            return await handler(request)
+        delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        reject = self.rng.random() < self.rate_429
+        if delay:
+            await asyncio.sleep(delay)
+        if reject:
+            self.rejected += 1
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        self.served += 1
+        return await handler(request)
+
+    def _ufcstats(self, kind: str):
+        async def handler(request: web.Request) -> web.Response:
+            path = self.corpus_dir / "ufcstats" / kind / f"{request.match_info['id']}.html"
+            if not path.exists():
+                raise web.HTTPNotFound()
+            html = path.read_text().replace(UFCSTATS_BASE, self.base_url)
+            return web.Response(text=html, content_type="text/html")
+        return handler
+
+    def _json(self, path: Path, empty: dict) -> web.Response:
+        body = path.read_text() if path.exists() else json.dumps(empty)
+        return web.Response(text=body, content_type="application/json")
+
+    async def _hotseason(self, request: web.Request) -> web.Response:
+        before = request.query.get("before", "0")
+        return self._json(self.corpus_dir / "realsports/hotseason" / f"{before}.json", {"items": []})
+
+    async def _leaderboard(self, request: web.Request) -> web.Response:
+        before = request.query.get("before", "0")
+        path = self.corpus_dir / "realsports/leaderboard" / request.match_info["id"] / f"{before}.json"
+        return self._json(path, {"feedItems": []})
+
+    async def _team(self, request: web.Request) -> web.Response:
+        path = self.corpus_dir / "realsports/teams" / f"{request.match_info['id']}.json"
+        if not path.exists():
+            raise web.HTTPNotFound()
+        return self._json(path, {})
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"served": self.served, "rejected": self.rejected})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self.runner = web.AppRunner(self.app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+
+def _serve(corpus_dir, options, ready):
+    async def main():
+        server = MockServer(corpus_dir, **options)
+        ready.put(await server.start())
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+class MockServerProcess:
+    """Run the mock server in its own process so it doesn't skew client CPU numbers."""
+
+    def __init__(self, corpus_dir: Path, **options):
+        self.corpus_dir = corpus_dir
+        self.options = options
+        self.process: Optional[multiprocessing.Process] = None
+        self.base_url: Optional[str] = None
+
+    def __enter__(self) -> str:
+        ready = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_serve, args=(self.corpus_dir, self.options, ready), daemon=True)
+        self.process.start()
+        self.base_url = ready.get(timeout=30)
+        return self.base_url
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.join()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a corpus as ufcstats + Real Sports")
+    parser.add_argument("corpus_dir", type=Path)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    args = parser.parse_args()
+
+    async def main():
+        server = MockServer(args.corpus_dir, args.latency, args.jitter, args.rate_429)
+        print(f"Serving {args.corpus_dir} at {await server.start(port=args.port)}")
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+"""
+Offline scraper benchmarks against the local mock server.
+
+    cd python
+    python -m bench.run_bench                         # synthetic corpus, no latency
+    python -m bench.run_bench --latency 0.05 --jitter 0.02 --rate-429 0.01
+    python -m bench.run_bench --corpus bench/corpus_recorded --stages process_matches
+
+Reports requests (pages) per second, p50/p99 request latency and client CPU
+time per page for each stage. The server runs in a separate process, so CPU
+numbers only cover the scraper.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import statistics
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+
+import pandas as pd
+
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import request_stats
+from http_client import create_session
+from bench.corpus import UFCSTATS_BASE, generate
+from bench.mock_server import MockServerProcess
+
+STAGES = ("add_fights", "process_matches", "get_values")
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _load_csv(corpus_dir: Path, name: str, base_url: str) -> pd.DataFrame:
+    df = pd.read_csv(corpus_dir / name)
+    for column in df.columns:
+        if column.endswith("_url"):
+            df[column] = df[column].str.replace(UFCSTATS_BASE, base_url, regex=False)
+    return df
+
+
+async def bench_process_matches(corpus_dir: Path, base_url: str):
+    from process_matches_fast import AsyncFightProcessor
+
+    processor = AsyncFightProcessor(_load_csv(corpus_dir, "fights.csv", base_url),
+                                    _load_csv(corpus_dir, "fighters.csv", base_url))
+    await processor.process_all_fights()
+
+
+async def bench_add_fights(corpus_dir: Path, base_url: str):
+    from add_new_fights import find_new_fights
+
+    find_new_fights(_load_csv(corpus_dir, "fights.csv", base_url), _load_csv(corpus_dir, "fighters.csv", base_url))
+
+
+async def bench_get_values(corpus_dir: Path, base_url: str):
+    try:
+        import config  # noqa: F401
+    except ImportError:
+        # The real token file is local-only; the mock server ignores headers
+        sys.modules["config"] = types.SimpleNamespace(HEADERS={})
+    import get_fighter_values
+
+    get_fighter_values.API_BASE = base_url
+    async with create_session() as session:
+        fighters = {}
+        before = 0
+        while True:
+            batch, should_continue = await get_fighter_values.process_batch(session, before, 5)
+            fighters.update(batch)
+            if not should_continue:
+                break
+            before += 5 * 20
+
+        items = list(fighters.items())
+        for i in range(0, len(items), 10):
+            await get_fighter_values.process_pass_batch(session, items[i:i + 10])
+
+
+BENCHMARKS = {
+    "add_fights": bench_add_fights,
+    "process_matches": bench_process_matches,
+    "get_values": bench_get_values,
+}
+
+
+def run_stage(stage: str, corpus_dir: Path, base_url: str) -> dict:
+    stats = request_stats.RequestStats()
+    request_stats.use(stats)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    # Scripts print per-item progress; keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        asyncio.run(BENCHMARKS[stage](corpus_dir, base_url))
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    pages = max(stats.requests, 1)
+    return {
+        "stage": stage,
+        "requests": stats.requests,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(stats.requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(stats.latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(stats.latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(stats.latencies) * 1000, 2) if stats.latencies else 0.0,
+        "cpu_ms_per_page": round(cpu / pages * 1000, 3),
+        "http_429": stats.statuses.get("429", 0),
+        "errors": stats.errors,
+    }
+
+
+def run(corpus_dir: Path, stages=STAGES, latency=0.0, jitter=0.0, rate_429=0.0, seed=0) -> list[dict]:
+    results = []
+    for stage in stages:
+        # Fresh server per stage so injected delays/429s replay identically
+        with MockServerProcess(corpus_dir, latency=latency, jitter=jitter, rate_429=rate_429, seed=seed) as base_url:
+            results.append(run_stage(stage, corpus_dir, base_url))
+    return results
+
+
+def print_table(results: list[dict]):
+    columns = ["stage", "requests", "seconds", "pages_per_sec", "p50_ms", "p99_ms", "cpu_ms_per_page", "http_429", "errors"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in results:
+        print("  ".join(str(r[c]).ljust(widths[c]) for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, help="corpus directory (default: generate a synthetic one)")
+    parser.add_argument("--fights", type=int, default=500, help="fights in the synthetic corpus")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--latency", type=float, default=0.0, help="base response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform ± delay in seconds")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir = args.corpus or generate(Path(tmp), n_fights=args.fights)
+        results = run(corpus_dir, args.stages, args.latency, args.jitter, args.rate_429, args.seed)
+
+    print_table(results)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,37 @@
-# this pipeline doesn't work yet, follow these steps:
-# 
-# 
-#  add_new_fights.py
-# remove_duplicates.py
-# process_matches.py
-# aggregate_values.py
-# get_fighter_values.py # we need to get api key from real 
+# Runs the pipeline from the command line with the same stage graph as the web UI:
+#
+#  add_new_fights.py -> remove_duplicates.py -> process_matches_fast.py -> aggregate_values.py
+#  get_fighter_values.py # we need to get api key from real, runs alongside the scrape
+#  npx ts-node src/index.ts in our fe, once both branches are done
+#
 # if distribution is off, run update_pass_distribution.py this has better error handling, only for pass distributions though
-# run npx ts-node src/index.ts in our fe
 
-import subprocess
-import os
+import asyncio
 import sys
 from pathlib import Path
 
-def run_script(script_name):
-    """Run a Python script and check for errors."""
-    print(f"\n{'='*50}")
-    print(f"Running {script_name}...")
-    print(f"{'='*50}\n")
-    
-    # Get the directory of the current script
-    current_dir = Path(__file__).parent
-    script_path = current_dir / "scripts" / script_name
-    
-    try:
-        # Run the script and capture output
-        result = subprocess.run([sys.executable, str(script_path)], 
-                              check=True,
-                              capture_output=True,
-                              text=True)
-        print(result.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error running {script_name}:")
-        print(f"Exit code: {e.returncode}")
-        print(f"Output: {e.output}")
-        print(f"Error: {e.stderr}")
-        return False
+sys.path.insert(0, str(Path(__file__).parent))
+
+from api.pipeline_runner import PipelineRunner, pipeline_status
 
 def main():
-    # List of scripts to run in order
-    scripts = [
-        # "add_new_fights.py",
-        # "remove_duplicates.py",
-        "process_matches.py",
-        "aggregate_values.py",
-        "get_fighter_values.py"
+    # Stages to run; independent branches run concurrently
+    stages = [
+        # "add_fights",
+        # "remove_duplicates",
+        "process_matches",
+        "aggregate",
+        "get_values"
     ]
-    
-    # Run each script in sequence
-    for script in scripts:
-        success = run_script(script)
-        if not success:
-            print(f"\nPipeline failed at {script}")
-            sys.exit(1)
-    
+
+    # Token comes from scripts/config.py when run from the CLI
+    runner = PipelineRunner(token=None, mode="subprocess")
+    asyncio.run(runner.run(stages))
+
+    if pipeline_status["error"]:
+        print(f"\nPipeline failed: {pipeline_status['error']}")
+        sys.exit(1)
+
     print("\nPipeline completed successfully!")
 
 if __name__ == "__main__":
@@ -1,61 +1,105 @@
+import asyncio
+import contextvars
+import sys
+import time
 import requests
 import pandas as pd
 from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import urlparse
 
+import cancellation
+import request_stats
+from data_store import DataStore
 
+RESULTS_DIR = Path(__file__).parent.parent / "results"
+DATA_DIR = Path(__file__).parent.parent / "data"
 
-fights = pd.read_csv('../data/fights.csv') # csv of fight urls
-fighters = pd.read_csv('../data/all_fighters.csv') # csv of all fighters
 
-result = []
+def find_new_fights(fights: pd.DataFrame, fighters: pd.DataFrame, progress=None) -> list:
+    """Scrape every fighter page and return fight URLs not yet in ``fights``."""
+    result = []
+    known = set(fights['fight_url'].values)
+    total = len(fighters)
 
-def job(row_data):
+    def job(row):
+        if cancellation.requested():
+            # Queued fighters are skipped; pages already being fetched finish
+            return
+        url = row['fighter_url']
+        stats = request_stats.current()
 
-    _, row = row_data
-    url = row['fighter_url']
+        print(row['fighter_f_name'] + " " + row["fighter_l_name"])
+        print(row['fighter_url'])
 
-    print(row['fighter_f_name'] + " " + row["fighter_l_name"])
-    print(row['fighter_url'])
+        try :
+            start = time.perf_counter()
+            page = requests.get(url)
+            stats.record(page.status_code, len(page.content), elapsed=time.perf_counter() - start,
+                         host=urlparse(url).netloc)
+            soup = BeautifulSoup(page.content, 'html.parser')
+            stats.parsed("fighter")
 
-    try :
-        page = requests.get(url)
-        soup = BeautifulSoup(page.content, 'html.parser')
+            fight_urls = soup.find_all('tr', class_="b-fight-details__table-row__hover")
+            links = [tr.get('data-link') for tr in fight_urls]
 
-        fight_urls = soup.find_all('tr', class_="b-fight-details__table-row__hover")
-        links = [tr.get('data-link') for tr in fight_urls]
+            for link in links :
+                exists = link in known
+                if not exists :
+                    print("*NEW" + link)
+                    result.append(link)
 
-        for link in links :
-            exists = link in fights['fight_url'].values
-            if not exists :
-                print("*NEW" + link)
-                result.append(link)
+            print("__________")
 
-        print("__________")
+        except :
+            stats.record(error=True, host=urlparse(url).netloc)
+            print("failed")
 
-    except :
-        print("failed")
+    # Worker threads don't inherit context variables, so each job runs in a copy
+    # of this one: the stage's log store and key, counters and stop request
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, job, row) for _, row in fighters.iterrows()]
+        # Completions are counted here, on one thread, as they arrive
+        for done, _ in enumerate(as_completed(futures), 1):
+            if progress:
+                progress(done / total * 100)
 
+    return result
 
-with ThreadPoolExecutor(max_workers=10) as executor:
-    executor.map(job, fighters.iterrows())
 
+async def run(progress=None, artifacts=None) -> dict:
+    """Stage entry point: append newly discovered fight URLs to both fight lists."""
+    fights = pd.read_csv(DATA_DIR / 'fights.csv') # csv of fight urls
+    fighters = pd.read_csv(DATA_DIR / 'all_fighters.csv') # csv of all fighters
 
-print("________________")
-print("NEW MATCHES: " + str(len(result)))
+    result = await asyncio.to_thread(find_new_fights, fights, fighters, progress)
 
-for item in result :
-    print(item)
+    print("________________")
+    print("NEW MATCHES: " + str(len(result)))
 
-new_urls_df = pd.DataFrame(result, columns=['fight_url'])
+    for item in result :
+        print(item)
 
-updated_df = fights._append(new_urls_df, ignore_index=True)
+    new_urls_df = pd.DataFrame(result, columns=['fight_url'])
 
-updated_df.to_csv('../results/all_fights.csv', index=False)
+    updated_df = fights._append(new_urls_df, ignore_index=True)
 
-# update one old as well
-updated_df.to_csv('../data/fights.csv', index=False)
+    updated_df.to_csv(RESULTS_DIR / 'all_fights.csv', index=False)
 
+    # update one old as well
+    updated_df.to_csv(DATA_DIR / 'fights.csv', index=False)
 
+    store = DataStore()
+    store.write_fight_urls(updated_df['fight_url'])
+    store.write_fighters(fighters)
 
+    # The URLs found so far are saved; the next run scrapes the rest
+    cancellation.check("add_fights")
+    return {"fights": updated_df}
 
+
+if __name__ == "__main__":
+    status = cancellation.run_main(run)
+    request_stats.emit()
+    sys.exit(status)
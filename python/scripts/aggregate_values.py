@@ -1,19 +1,88 @@
-import requests
+import asyncio
+import os
+import sys
+from datetime import date
+from typing import Optional, Union
+
 import pandas as pd
-from bs4 import BeautifulSoup
+from pathlib import Path
+
+import cancellation
+import request_stats
+from data_store import DataStore
+from fight_analytics import activity, load_history
+
+RESULTS_DIR = Path(__file__).parent.parent / "results"
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+# name,active rows that win over the fight dates, e.g. fighters who announced
+# their retirement within two years of their last fight
+OVERRIDES_FILE = "active_overrides.csv"
+# YYYY-MM-DD the activity columns are computed as of (default: today)
+REFERENCE_DATE_ENV = "RAX_REFERENCE_DATE"
+
+
+def aggregate(data: pd.DataFrame) -> pd.DataFrame:
+    """Sum every point column into ``Value`` and sort fighters by it."""
+    data = data.copy()
+    data['Value'] = data.apply(lambda row: (
+        int(row["Decision - Unanimous"]) +
+        int(row["Decision - Majority"]) +
+        int(row["Decision - Split"]) +
+        int(row["KO/TKO"]) +
+        int(row["Submission"]) +
+        int(row["StrikeBonus"]) +
+        int(row["5roundBonus"])
+    ), axis=1)
+
+    return data.sort_values(by='Value', ascending=False)
+
+
+def reference_date() -> str:
+    return os.environ.get(REFERENCE_DATE_ENV) or date.today().isoformat()
+
+
+def add_activity(values: pd.DataFrame, history: Union[Path, pd.DataFrame], as_of: str,
+                 overrides: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Add ``last_fight_date``, ``fights_last_24m`` and ``active`` to ``values``, then apply ``overrides``."""
+    values = values.merge(activity(load_history(history), as_of), on="name", how="left")
+    values["fights_last_24m"] = values["fights_last_24m"].fillna(0).astype(int)
+    values["active"] = values["active"].fillna(False).astype(bool)
+    if overrides is not None:
+        forced = overrides.drop_duplicates("name", keep="last").set_index("name")["active"].astype(bool)
+        listed = values["name"].isin(forced.index)
+        values.loc[listed, "active"] = values.loc[listed, "name"].map(forced)
+    values["last_fight_date"] = values["last_fight_date"].dt.strftime("%Y-%m-%d")
+    return values
+
+
+def _run(artifacts: dict) -> pd.DataFrame:
+    data = artifacts.get("new_final")
+    if data is None:
+        data = pd.read_csv(RESULTS_DIR / 'new_final.csv')
+    history = artifacts.get("fight_history")
+    if history is None:
+        history = RESULTS_DIR / 'fight_history.csv'
+    overrides_path = DATA_DIR / OVERRIDES_FILE
+    overrides = pd.read_csv(overrides_path) if overrides_path.exists() else None
+
+    sorted = add_activity(aggregate(data), history, reference_date(), overrides)
+    sorted.to_csv(RESULTS_DIR / 'final_values.csv', index=False)
+    DataStore().write_fighter_values(sorted)
+    return sorted
+
 
-data = pd.read_csv('../results/new_final.csv')
+async def run(progress=None, artifacts=None) -> dict:
+    """Stage entry point. Reuses new_final and fight_history from process_matches when given."""
+    # pandas work, off the event loop that serves the API during in-process runs
+    sorted = await asyncio.to_thread(_run, artifacts or {})
+    if progress:
+        progress(100)
 
-data['Value'] = data.apply(lambda row: (
-    int(row["Decision - Unanimous"]) + 
-    int(row["Decision - Majority"]) + 
-    int(row["Decision - Split"]) + 
-    int(row["KO/TKO"]) + 
-    int(row["Submission"]) + 
-    int(row["StrikeBonus"]) + 
-    int(row["5roundBonus"])
-), axis=1)
+    return {"final_values": sorted}
 
-sorted = data.sort_values(by='Value', ascending=False)
 
-sorted.to_csv('../results/final_values.csv', index=False)
+if __name__ == "__main__":
+    status = cancellation.run_main(run)
+    request_stats.emit()
+    sys.exit(status)
@@ -0,0 +1,134 @@
+"""
+Cooperative cancellation for pipeline stages.
+
+A stop request reaches a stage in one of two ways:
+
+- a subprocess stage gets SIGTERM (or Ctrl-C) from the runner; ``run_main()``
+  turns the signal into a stop request instead of killing the interpreter;
+- an in-process stage's runner calls ``StopRequest.set()`` on the request
+  that ``use()`` bound to the stage's context.
+
+Stages check ``requested()`` before scheduling more work. They run their
+concurrent requests through ``gather()``: once a stop is requested, it gives
+the in-flight requests ``DRAIN_SECONDS`` to finish and then cancels the rest.
+The stage then flushes its checkpoint journal and raises ``Cancelled``. The
+next run resumes from the journal. A second signal still interrupts at once.
+"""
+import asyncio
+import os
+import signal
+import threading
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional
+
+# How long in-flight requests may take to finish after a stop request
+DRAIN_SECONDS = float(os.environ.get("RAX_DRAIN_SECONDS", "5"))
+# Exit status of a stage script that stopped on request (128 + SIGINT, as shells report Ctrl-C)
+CANCELLED_EXIT = 130
+POLL_SECONDS = 0.1
+
+
+class Cancelled(Exception):
+    """A stage stopped early on request, after saving what it had."""
+
+
+class StopRequest:
+    def __init__(self):
+        # A threading.Event, so signal handlers and worker threads can use it too
+        self.event = threading.Event()
+        self.requested_at: Optional[float] = None
+
+    def set(self):
+        if not self.event.is_set():
+            self.requested_at = time.perf_counter()
+            self.event.set()
+
+    def is_set(self) -> bool:
+        return self.event.is_set()
+
+    def elapsed(self) -> float:
+        """Seconds since the stop was requested."""
+        return time.perf_counter() - self.requested_at if self.requested_at else 0.0
+
+
+_default = StopRequest()
+_current: ContextVar[Optional[StopRequest]] = ContextVar("stop_request", default=None)
+
+
+def current() -> StopRequest:
+    """The stop request of this stage: bound via ``use()``, else the process-wide one."""
+    return _current.get() or _default
+
+
+def use(stop: StopRequest):
+    """Bind ``stop`` to the current context; tasks created from it inherit it."""
+    _current.set(stop)
+
+
+def requested() -> bool:
+    return current().is_set()
+
+
+def check(what: str = "stage"):
+    """Raise ``Cancelled`` if a stop was requested. Call it after saving a checkpoint."""
+    stop = current()
+    if stop.is_set():
+        raise Cancelled(f"{what} stopped {stop.elapsed():.2f}s after the request")
+
+
+async def gather(*aws: Awaitable, drain: Optional[float] = None) -> list:
+    """``asyncio.gather`` that drains, then cancels, its awaitables once a stop is requested.
+
+    Returns every result (exceptions included, as ``return_exceptions=True``)
+    when all finish, even if a stop arrived meanwhile. Raises ``Cancelled``
+    if some were still running when the drain deadline passed. Cancelling the
+    caller cancels and awaits every awaitable before the cancellation propagates.
+    """
+    stop = current()
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    pending = set(tasks)
+    try:
+        while pending and not stop.is_set():
+            _, pending = await asyncio.wait(pending, timeout=POLL_SECONDS)
+        if pending:
+            _, pending = await asyncio.wait(pending, timeout=DRAIN_SECONDS if drain is None else drain)
+    except asyncio.CancelledError:
+        await _cancel(tasks)
+        raise
+    if pending:
+        await _cancel(pending)
+        raise Cancelled(f"cancelled {len(pending)} of {len(tasks)} in-flight requests "
+                        f"after a {stop.elapsed():.2f}s drain")
+    # A task cancelled on its own reports CancelledError like any other exception
+    return [asyncio.CancelledError() if task.cancelled() else task.exception() or task.result()
+            for task in tasks]
+
+
+async def _cancel(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def install_signal_handlers():
+    """Make SIGTERM/SIGINT request a graceful stop; a second one interrupts as usual."""
+    def handle(signum, frame):
+        if _default.is_set():
+            raise KeyboardInterrupt
+        print(f"Received {signal.Signals(signum).name}: finishing in-flight requests, then saving progress")
+        _default.set()
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, handle)
+
+
+def run_main(entry: Callable[[], Awaitable]) -> int:
+    """Run a stage script's ``run()`` with graceful stop signals; returns the exit status."""
+    install_signal_handlers()
+    try:
+        asyncio.run(entry())
+        return 0
+    except Cancelled as e:
+        print(f"Cancelled: {e}")
+        return CANCELLED_EXIT
@@ -0,0 +1,600 @@
+"""
+SQLite store for everything the pipeline scrapes and computes: fights,
+events, fighters, per-fighter fight results, fighter values, Real Sports
+ownership and pass distributions, plus the fighter identity index
+(``fighter_identity.py``).
+
+Each stage writes its results in a single batched transaction, and upserts
+only rewrite rows whose content changed. The legacy CSV/JSON files are still
+the stage outputs that the DAG and the frontend read. ``export()`` rebuilds
+any of them from the database, in the row order the stages write.
+
+process_matches reads parsed fights back (``fight_facts()``), so a run only
+fetches the fight pages of new or recent fights instead of every page.
+
+    python scripts/data_store.py import               # seed from the legacy files
+    python scripts/data_store.py export --out DIR     # regenerate them
+    python scripts/data_store.py history "Jon Jones"  # ownership over time
+    python scripts/data_store.py at 2025-01-01        # fighters_values.json as of a date
+"""
+import argparse
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, time
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence
+
+import pandas as pd
+
+import fast_json
+
+PYTHON_DIR = Path(__file__).parent.parent
+DB_FILE = PYTHON_DIR / "results" / "rax.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    event_url TEXT NOT NULL PRIMARY KEY,
+    date TEXT
+);
+CREATE TABLE IF NOT EXISTS fights (
+    fight_url TEXT NOT NULL PRIMARY KEY,
+    event_url TEXT,
+    date TEXT,
+    winner TEXT,
+    loser TEXT,
+    method TEXT,
+    rounds INTEGER,
+    is_draw INTEGER,
+    striker TEXT,
+    strike_diff INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_fights_event ON fights(event_url);
+CREATE INDEX IF NOT EXISTS idx_fights_date ON fights(date);
+CREATE TABLE IF NOT EXISTS fighters (
+    fighter_url TEXT NOT NULL PRIMARY KEY,
+    fighter_id INTEGER,
+    first_name TEXT,
+    last_name TEXT,
+    nickname TEXT,
+    height_cm REAL,
+    weight_lbs REAL,
+    reach_cm REAL,
+    stance TEXT,
+    dob TEXT,
+    wins INTEGER,
+    losses INTEGER,
+    draws INTEGER,
+    nc_dq INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_fighters_name ON fighters(last_name, first_name);
+CREATE TABLE IF NOT EXISTS fight_results (
+    fight_url TEXT NOT NULL,
+    fighter_name TEXT NOT NULL,
+    date TEXT,
+    opponent TEXT,
+    method TEXT,
+    method_points INTEGER,
+    strike_bonus INTEGER,
+    round_bonus INTEGER,
+    total_points INTEGER,
+    position INTEGER,
+    PRIMARY KEY (fight_url, fighter_name)
+);
+CREATE INDEX IF NOT EXISTS idx_fight_results_fighter ON fight_results(fighter_name, date);
+CREATE TABLE IF NOT EXISTS fighter_values (
+    name TEXT NOT NULL PRIMARY KEY,
+    ko_tko INTEGER,
+    submission INTEGER,
+    decision_unanimous INTEGER,
+    decision_majority INTEGER,
+    decision_split INTEGER,
+    strike_bonus INTEGER,
+    five_round_bonus INTEGER,
+    value INTEGER,
+    position INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_fighter_values_value ON fighter_values(value);
+CREATE TABLE IF NOT EXISTS fighter_activity (
+    name TEXT NOT NULL PRIMARY KEY,
+    last_fight_date TEXT,
+    fights_last_24m INTEGER,
+    active INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_fighter_activity_last_fight ON fighter_activity(last_fight_date);
+CREATE TABLE IF NOT EXISTS ownership (
+    name TEXT NOT NULL PRIMARY KEY,
+    realsports_id INTEGER,
+    value TEXT,
+    age INTEGER,
+    updated_at TEXT DEFAULT (datetime('now'))
+);
+CREATE INDEX IF NOT EXISTS idx_ownership_realsports_id ON ownership(realsports_id);
+CREATE TRIGGER IF NOT EXISTS ownership_touch AFTER UPDATE OF realsports_id, value, age ON ownership
+BEGIN
+    UPDATE ownership SET updated_at = datetime('now') WHERE name = NEW.name;
+END;
+CREATE TABLE IF NOT EXISTS pass_distributions (
+    name TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (name, level)
+);
+CREATE TABLE IF NOT EXISTS ownership_snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    taken_at TEXT NOT NULL,
+    keyframe INTEGER NOT NULL,
+    fighters INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ownership_snapshots_taken_at ON ownership_snapshots(taken_at);
+CREATE TABLE IF NOT EXISTS ownership_deltas (
+    snapshot_id INTEGER NOT NULL REFERENCES ownership_snapshots(id),
+    name TEXT NOT NULL,
+    data TEXT,
+    PRIMARY KEY (snapshot_id, name)
+);
+CREATE INDEX IF NOT EXISTS idx_ownership_deltas_name ON ownership_deltas(name, snapshot_id);
+CREATE TABLE IF NOT EXISTS fighter_identities (
+    id INTEGER PRIMARY KEY,
+    canonical_name TEXT NOT NULL,
+    ufcstats_url TEXT UNIQUE,
+    realsports_id INTEGER UNIQUE
+);
+CREATE TABLE IF NOT EXISTS fighter_aliases (
+    source TEXT NOT NULL,
+    name TEXT NOT NULL,
+    identity_id INTEGER NOT NULL REFERENCES fighter_identities(id),
+    how TEXT NOT NULL,
+    PRIMARY KEY (source, name)
+);
+CREATE INDEX IF NOT EXISTS idx_fighter_aliases_identity ON fighter_aliases(identity_id);
+"""
+
+# Legacy CSV column -> table column
+FIGHTER_COLUMNS = {
+    "fighter_id": "fighter_id",
+    "fighter_f_name": "first_name",
+    "fighter_l_name": "last_name",
+    "fighter_nickname": "nickname",
+    "fighter_height_cm": "height_cm",
+    "fighter_weight_lbs": "weight_lbs",
+    "fighter_reach_cm": "reach_cm",
+    "fighter_stance": "stance",
+    "fighter_dob": "dob",
+    "fighter_w": "wins",
+    "fighter_l": "losses",
+    "fighter_d": "draws",
+    "fighter_nc_dq": "nc_dq",
+    "fighter_url": "fighter_url",
+}
+VALUE_COLUMNS = {
+    "name": "name",
+    "KO/TKO": "ko_tko",
+    "Submission": "submission",
+    "Decision - Unanimous": "decision_unanimous",
+    "Decision - Majority": "decision_majority",
+    "Decision - Split": "decision_split",
+    "StrikeBonus": "strike_bonus",
+    "5roundBonus": "five_round_bonus",
+    "Value": "value",
+}
+# Columns added since the first release, created on databases that predate them
+# (row positions in fight_history.csv and final_values.csv, for exports)
+ADDED_COLUMNS = [("fight_results", "position", "INTEGER"), ("fighter_values", "position", "INTEGER")]
+# Point columns of new_final.csv: the scored methods, then the bonuses
+METHOD_COLUMNS = ["KO/TKO", "Submission", "Decision - Unanimous", "Decision - Majority", "Decision - Split"]
+# Activity columns aggregate adds after the values (stored in fighter_activity)
+ACTIVITY_COLUMNS = ["last_fight_date", "fights_last_24m", "active"]
+HISTORY_COLUMNS = ["fighter_name", "date", "opponent", "method", "method_points",
+                   "strike_bonus", "round_bonus", "total_points"]
+FIGHT_COLUMNS = ["fight_url", "event_url", "date", "winner", "loser", "method", "rounds",
+                 "is_draw", "striker", "strike_diff"]
+
+# Parsed fight pages process_matches reads back instead of fetching again
+FIGHT_FACTS_SQL = (f"SELECT {', '.join(FIGHT_COLUMNS)} FROM fights "
+                   "WHERE date IS NOT NULL AND striker IS NOT NULL")
+# Store contents a stage reads, declared as stage inputs "results/rax.db#<view>" so
+# the stage manifest fingerprints them rather than the whole (busy) database file
+VIEWS = {"fight_facts": FIGHT_FACTS_SQL}
+# Set (to "1") by the pipeline runner on full-refresh runs: stages re-derive what
+# they would otherwise reuse from the store. In-process stages get ``full_refresh``
+# in their artifacts instead
+FULL_REFRESH_ENV = "RAX_FULL_REFRESH"
+
+# Every Nth ownership snapshot stores full records, bounding how many deltas a
+# point-in-time reconstruction has to replay
+KEYFRAME_INTERVAL = 20
+
+# Exports the ``export`` command writes, relative to python/
+LEGACY_FILES = {
+    "fights": "results/all_fights.csv",
+    "fighters": "data/all_fighters.csv",
+    "fight_history": "results/fight_history.csv",
+    "new_final": "results/new_final.csv",
+    "final_values": "results/final_values.csv",
+    "fighters_values": "../public/data/fighters_values.json",
+    "fighter_ids": "results/fighter_ids.json",
+}
+
+
+def _flatten_ownership(data: dict) -> dict:
+    """One fighters_values.json entry -> flat {field: value}, pass levels as ``pass_<level>``."""
+    record = {key: data[key] for key in ("id", "value", "age") if data.get(key) is not None}
+    for level, count in (data.get("pass_distribution") or {}).items():
+        record[f"pass_{level}"] = count
+    return record
+
+
+def _unflatten_ownership(record: dict) -> dict:
+    data = {key: value for key, value in record.items() if not key.startswith("pass_")}
+    passes = {key[len("pass_"):]: value for key, value in record.items() if key.startswith("pass_")}
+    if passes:
+        data["pass_distribution"] = passes
+    return data
+
+
+def _snapshot_time(when: str) -> str:
+    """An ISO date or timestamp in the ``taken_at`` format (local time, seconds); dates map to 23:59:59."""
+    moment = datetime.fromisoformat(when)
+    if "T" not in when and " " not in when.strip():
+        moment = datetime.combine(moment.date(), time.max)
+    elif moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.isoformat(timespec="seconds")
+
+
+def _clean(value):
+    """pandas NaN/numpy scalars -> plain Python values sqlite3 accepts."""
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+class DataStore:
+    """Batched, change-only writes into the pipeline database."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or DB_FILE)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            for table, column, kind in ADDED_COLUMNS:
+                if column not in {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection that commits (or rolls back) and closes when the block exits."""
+        # Stages may write concurrently (subprocess mode): WAL lets readers and
+        # one writer proceed together, the timeout queues the other writers
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _upsert(self, table: str, keys: Sequence[str], columns: Sequence[str],
+                rows: Iterable[Sequence], prune: bool = False) -> int:
+        """Insert or update ``rows`` in one transaction; return rows changed.
+
+        Existing rows are only rewritten when a non-key column differs. With
+        ``prune``, rows whose key is not in ``rows`` are deleted, for tables a
+        stage recomputes in full. Rows with a missing key (a fight page whose
+        fighter name failed to parse) cannot be addressed and are skipped.
+        """
+        key_index = [columns.index(k) for k in keys]
+        rows = [row for row in (tuple(_clean(v) for v in row) for row in rows)
+                if all(row[i] is not None for i in key_index)]
+        placeholders = ", ".join("?" for _ in columns)
+        values = [c for c in columns if c not in keys]
+        if values:
+            assignments = ", ".join(f"{c} = excluded.{c}" for c in values)
+            current = ", ".join(f"{table}.{c}" for c in values)
+            incoming = ", ".join(f"excluded.{c}" for c in values)
+            conflict = f"DO UPDATE SET {assignments} WHERE ({current}) IS NOT ({incoming})" if len(values) > 1 \
+                else f"DO UPDATE SET {assignments} WHERE {current} IS NOT {incoming}"
+        else:
+            conflict = "DO NOTHING"
+        sql = (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+               f"ON CONFLICT ({', '.join(keys)}) {conflict}")
+
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(sql, rows)
+            changed = conn.total_changes - before
+            if prune:
+                conn.execute(f"CREATE TEMP TABLE keep ({', '.join(keys)})")
+                conn.executemany(f"INSERT INTO keep VALUES ({', '.join('?' for _ in keys)})",
+                                 [tuple(row[i] for i in key_index) for row in rows])
+                changed += conn.execute(
+                    f"DELETE FROM {table} WHERE ({', '.join(keys)}) NOT IN (SELECT * FROM keep)").rowcount
+                conn.execute("DROP TABLE keep")
+            return changed
+
+    # -- stage writers ----------------------------------------------------
+
+    def write_fight_urls(self, urls: Iterable[str]) -> int:
+        """Known fight URLs (add_fights); details arrive with process_matches."""
+        return self._upsert("fights", ["fight_url"], ["fight_url"], ((url,) for url in urls))
+
+    def write_fighters(self, fighters: pd.DataFrame) -> int:
+        """Roster rows in the ``all_fighters.csv`` layout."""
+        legacy = [c for c in FIGHTER_COLUMNS if c in fighters.columns]
+        return self._upsert("fighters", ["fighter_url"], [FIGHTER_COLUMNS[c] for c in legacy],
+                            fighters[legacy].itertuples(index=False))
+
+    def write_fight_facts(self, facts: list[dict]) -> int:
+        """Parsed fight pages (process_matches): the fight row and its event."""
+        events = {fact["event_url"]: fact["date"] for fact in facts if fact.get("event_url")}
+        changed = self._upsert("events", ["event_url"], ["event_url", "date"], events.items())
+        return changed + self._upsert("fights", ["fight_url"], FIGHT_COLUMNS,
+                                      ([fact.get(c) for c in FIGHT_COLUMNS] for fact in facts))
+
+    def write_fight_results(self, history: pd.DataFrame) -> int:
+        """Per-fighter scored results, ``fight_history.csv`` columns plus ``fight_url``.
+
+        The table is replaced: results of fights no longer in the history are deleted.
+        """
+        columns = ["fight_url"] + HISTORY_COLUMNS
+        rows = history[columns].assign(position=range(len(history)))
+        return self._upsert("fight_results", ["fight_url", "fighter_name"], columns + ["position"],
+                            rows.itertuples(index=False), prune=True)
+
+    def fight_facts(self, before: Optional[str] = None) -> dict:
+        """Parsed fights (process_matches' journal records) by URL, only those dated before ``before``."""
+        columns = [c for c in FIGHT_COLUMNS if c != "fight_url"]
+        facts = {}
+        with self._connect() as conn:
+            for row in conn.execute(f"{FIGHT_FACTS_SQL} AND date < ?", (before or "9999",)):
+                facts[row["fight_url"]] = {c: row[c] for c in columns}
+        return facts
+
+    def digest(self, view: str) -> str:
+        """sha256 of a ``VIEWS`` query's rows, in primary key order."""
+        digest = hashlib.sha256()
+        with self._connect() as conn:
+            for row in conn.execute(f"{VIEWS[view]} ORDER BY 1"):
+                digest.update(repr(tuple(row)).encode())
+        return digest.hexdigest()
+
+    def write_fighter_values(self, values: pd.DataFrame) -> int:
+        """Aggregated point totals and, when present, activity; both tables are replaced by each aggregate run."""
+        legacy = [c for c in VALUE_COLUMNS if c in values.columns]
+        changed = self._upsert("fighter_values", ["name"], [VALUE_COLUMNS[c] for c in legacy] + ["position"],
+                               values[legacy].assign(position=range(len(values))).itertuples(index=False),
+                               prune=True)
+        if all(c in values.columns for c in ACTIVITY_COLUMNS):
+            activity = values[["name"] + ACTIVITY_COLUMNS].astype({"active": int})
+            changed += self._upsert("fighter_activity", ["name"], ["name"] + ACTIVITY_COLUMNS,
+                                    activity.itertuples(index=False), prune=True)
+        return changed
+
+    def write_ownership(self, fighters: dict) -> int:
+        """``fighters_values.json``-shaped dict from get_values."""
+        changed = self._upsert(
+            "ownership", ["name"], ["name", "realsports_id", "value", "age"],
+            ((name, data.get("id"), data.get("value"), data.get("age")) for name, data in fighters.items()),
+            prune=True)
+        changed += self._upsert(
+            "pass_distributions", ["name", "level"], ["name", "level", "count"],
+            ((name, int(level), count) for name, data in fighters.items()
+             for level, count in (data.get("pass_distribution") or {}).items()),
+            prune=True)
+        self.snapshot_ownership(fighters)
+        return changed
+
+    # -- ownership history --------------------------------------------------
+    #
+    # Each get_values run adds a snapshot. A snapshot stores, per fighter, only
+    # the fields that changed since the previous one (JSON, null = field
+    # dropped; a NULL row = fighter gone). Every KEYFRAME_INTERVAL-th snapshot
+    # stores full records instead, so rebuilding any point in time replays at
+    # most that many snapshots.
+
+    def snapshot_ownership(self, fighters: dict, taken_at: Optional[str] = None) -> int:
+        """Record ``fighters`` as the next snapshot; return its id."""
+        taken_at = taken_at or datetime.now().isoformat(timespec="seconds")
+        current = {name: _flatten_ownership(data) for name, data in fighters.items()}
+        with self._connect() as conn:
+            last = conn.execute("SELECT id FROM ownership_snapshots ORDER BY id DESC LIMIT 1").fetchone()
+            since_keyframe = conn.execute(
+                "SELECT COUNT(*) FROM ownership_snapshots WHERE id > "
+                "(SELECT COALESCE(MAX(id), 0) FROM ownership_snapshots WHERE keyframe = 1)").fetchone()[0]
+            keyframe = last is None or since_keyframe + 1 >= KEYFRAME_INTERVAL
+
+            if keyframe:
+                rows = [(name, fast_json.dumps(record).decode()) for name, record in current.items()]
+            else:
+                previous = self._ownership_state(conn, last["id"])
+                rows = [(name, None) for name in previous.keys() - current.keys()]
+                for name, record in current.items():
+                    before = previous.get(name, {})
+                    delta = {k: v for k, v in record.items() if before.get(k) != v}
+                    delta.update({k: None for k in before.keys() - record.keys()})
+                    if delta:
+                        rows.append((name, fast_json.dumps(delta).decode()))
+
+            snapshot_id = conn.execute(
+                "INSERT INTO ownership_snapshots (taken_at, keyframe, fighters) VALUES (?, ?, ?)",
+                (taken_at, int(keyframe), len(current))).lastrowid
+            conn.executemany("INSERT INTO ownership_deltas (snapshot_id, name, data) VALUES (?, ?, ?)",
+                             [(snapshot_id, name, data) for name, data in rows])
+        return snapshot_id
+
+    @staticmethod
+    def _ownership_state(conn: sqlite3.Connection, snapshot_id: int) -> dict:
+        """Flat records as of ``snapshot_id``: its keyframe plus the deltas after it."""
+        keyframe = conn.execute(
+            "SELECT MAX(id) FROM ownership_snapshots WHERE keyframe = 1 AND id <= ?", (snapshot_id,)).fetchone()[0]
+        state = {}
+        for row in conn.execute(
+                "SELECT snapshot_id, name, data FROM ownership_deltas "
+                "WHERE snapshot_id BETWEEN ? AND ? ORDER BY snapshot_id", (keyframe, snapshot_id)):
+            if row["data"] is None:
+                state.pop(row["name"], None)
+                continue
+            record = state.setdefault(row["name"], {})
+            for key, value in fast_json.loads(row["data"]).items():
+                if value is None:
+                    record.pop(key, None)
+                else:
+                    record[key] = value
+        return state
+
+    def ownership_at(self, when: Optional[str] = None) -> dict:
+        """fighters_values.json as of ``when`` (ISO date or timestamp; latest when omitted).
+
+        A date means the end of that day, so it includes the snapshots taken on it.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MAX(id) FROM ownership_snapshots WHERE taken_at <= ?",
+                (_snapshot_time(when) if when else "9999",)).fetchone()
+            if row[0] is None:
+                return {}
+            state = self._ownership_state(conn, row[0])
+        return {name: _unflatten_ownership(record) for name, record in state.items()}
+
+    def ownership_series(self, name: str) -> list[dict]:
+        """One entry per snapshot where ``name``'s ownership changed, oldest first.
+
+        Entries are ``{"taken_at": ..., **record}``, or just ``taken_at`` with
+        ``"removed": True`` when the fighter dropped out of the feed.
+        """
+        with self._connect() as conn:
+            snapshots = conn.execute(
+                "SELECT s.id, s.taken_at, s.keyframe, d.data, d.name IS NOT NULL AS present "
+                "FROM ownership_snapshots s "
+                "LEFT JOIN ownership_deltas d ON d.snapshot_id = s.id AND d.name = ? "
+                "WHERE d.name IS NOT NULL OR s.keyframe = 1 ORDER BY s.id", (name,)).fetchall()
+
+        series = []
+        record = None
+        for row in snapshots:
+            if row["keyframe"]:
+                new = fast_json.loads(row["data"]) if row["present"] else None
+            elif row["data"] is None:
+                new = None
+            else:
+                new = dict(record or {})
+                for key, value in fast_json.loads(row["data"]).items():
+                    if value is None:
+                        new.pop(key, None)
+                    else:
+                        new[key] = value
+            if new != record:
+                series.append({"taken_at": row["taken_at"], **_unflatten_ownership(new)} if new is not None
+                              else {"taken_at": row["taken_at"], "removed": True})
+            record = new
+        return series
+
+    # -- exporters ----------------------------------------------------------
+
+    def _frame(self, sql: str) -> pd.DataFrame:
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn)
+
+    def export_fights(self, path: Path):
+        self._frame("SELECT fight_url FROM fights ORDER BY fight_url DESC").to_csv(path, index=False)
+
+    def export_fighters(self, path: Path):
+        columns = ", ".join(f"{column} AS {legacy}" for legacy, column in FIGHTER_COLUMNS.items())
+        self._frame(f"SELECT {columns} FROM fighters ORDER BY fighter_id").to_csv(path, index=False)
+
+    def export_fight_history(self, path: Path):
+        self._frame(f"SELECT {', '.join(HISTORY_COLUMNS)} FROM fight_results "
+                    "ORDER BY position").to_csv(path, index=False)
+
+    def _values_frame(self) -> pd.DataFrame:
+        """final_values rows, with the activity columns once an aggregate run has stored them."""
+        columns = ", ".join(f'v.{column} AS "{legacy}"' for legacy, column in VALUE_COLUMNS.items())
+        with self._connect() as conn:
+            has_activity = conn.execute("SELECT 1 FROM fighter_activity LIMIT 1").fetchone() is not None
+        if not has_activity:
+            return self._frame(f"SELECT {columns} FROM fighter_values v ORDER BY v.position")
+        values = self._frame(f"SELECT {columns}, {', '.join(f'a.{c}' for c in ACTIVITY_COLUMNS)} "
+                             "FROM fighter_values v LEFT JOIN fighter_activity a USING (name) "
+                             "ORDER BY v.position")
+        values["active"] = values["active"].fillna(0).astype(bool)
+        return values
+
+    def export_new_final(self, path: Path):
+        """Point totals summed from fight_results, fighters in order of their first history row."""
+        methods = ", ".join(f"SUM(CASE WHEN method = '{m}' THEN method_points ELSE 0 END) AS \"{m}\""
+                            for m in METHOD_COLUMNS)
+        self._frame(f'SELECT fighter_name AS name, {methods}, SUM(strike_bonus) AS "StrikeBonus", '
+                    'SUM(round_bonus) AS "5roundBonus" FROM fight_results '
+                    "GROUP BY fighter_name ORDER BY MIN(position)").to_csv(path, index=False)
+
+    def export_final_values(self, path: Path):
+        self._values_frame().to_csv(path, index=False)
+
+    def fighters_values(self) -> dict:
+        fighters = {}
+        for row in self._frame("SELECT name, realsports_id, value, age FROM ownership").itertuples(index=False):
+            entry = {"id": int(row.realsports_id) if pd.notna(row.realsports_id) else None, "value": row.value}
+            if pd.notna(row.age):
+                entry["age"] = int(row.age)
+            fighters[row.name] = entry
+        for row in self._frame("SELECT name, level, count FROM pass_distributions").itertuples(index=False):
+            if row.name in fighters:
+                fighters[row.name].setdefault("pass_distribution", {})[str(row.level)] = int(row.count)
+        return fighters
+
+    def export_fighters_values(self, path: Path):
+        fast_json.dump(self.fighters_values(), path, pretty=True)
+
+    def export_fighter_ids(self, path: Path):
+        ids = [{"id": data["id"], "name": name} for name, data in self.fighters_values().items()]
+        fast_json.dump(sorted(ids, key=lambda x: x["id"]), path, pretty=True)
+
+    def export(self, out_dir: Path = PYTHON_DIR, names: Iterable[str] = LEGACY_FILES):
+        """Write the legacy files under ``out_dir`` (python/ by default)."""
+        for name in names:
+            path = Path(out_dir) / LEGACY_FILES[name]
+            path.parent.mkdir(parents=True, exist_ok=True)
+            getattr(self, f"export_{name}")(path)
+            print(f"Exported {name} -> {path}")
+
+    def import_legacy(self, base_dir: Path = PYTHON_DIR):
+        """Seed the database from the legacy files that exist under ``base_dir``."""
+        files = {name: Path(base_dir) / rel for name, rel in LEGACY_FILES.items()}
+        if files["fights"].exists():
+            self.write_fight_urls(pd.read_csv(files["fights"])["fight_url"])
+        if files["fighters"].exists():
+            self.write_fighters(pd.read_csv(files["fighters"]))
+        if files["final_values"].exists():
+            self.write_fighter_values(pd.read_csv(files["final_values"]))
+        if files["fighters_values"].exists():
+            self.write_ownership(fast_json.load(files["fighters_values"]))
+        # fight_history.csv has no fight URLs, so fight_results fill in on the
+        # next process_matches run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["import", "export", "history", "at"])
+    parser.add_argument("target", nargs="?", help="fighter name (history) or ISO date or timestamp (at)")
+    parser.add_argument("--db", type=Path, default=DB_FILE)
+    parser.add_argument("--out", type=Path, default=PYTHON_DIR, help="export root (default: python/)")
+    parser.add_argument("--only", nargs="+", choices=list(LEGACY_FILES), default=list(LEGACY_FILES))
+    args = parser.parse_args()
+
+    store = DataStore(args.db)
+    if args.command == "import":
+        store.import_legacy()
+    elif args.command == "export":
+        store.export(args.out, args.only)
+    elif args.command == "history":
+        for entry in store.ownership_series(args.target):
+            print(fast_json.dumps(entry).decode())
+    else:
+        print(fast_json.dumps(store.ownership_at(args.target), pretty=True).decode())
+
+
+if __name__ == "__main__":
+    main()
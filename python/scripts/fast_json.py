@@ -0,0 +1,138 @@
+"""
+Pluggable JSON layer for the Real Sports scripts.
+
+Picks the fastest available backend (msgspec, then orjson, then the stdlib
+``json`` module) once at import; ``RAX_JSON_BACKEND`` forces one. Both
+optional libraries are pure speedups: output is the same on every backend.
+``python -m bench.decode_bench`` compares them with the original parsing.
+
+Besides plain ``loads``/``dumps``, two typed decoders pull out only the fields
+the pipeline reads:
+
+    decode_hotseason(body)    -> [ShopItem(name, value, id), ...]
+    decode_pass_levels(body)  -> [7, 7, 6, ...]   (feedItems[].boostInfo.level)
+
+With msgspec these decode straight into structs and skip everything else in
+the payload; the other backends parse the whole document and project it.
+"""
+import json
+import os
+from pathlib import Path
+from typing import NamedTuple, Optional, Union
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = tuple(name for name, module in (("msgspec", msgspec), ("orjson", orjson)) if module) + ("json",)
+
+
+def _select_backend() -> str:
+    requested = os.environ.get("RAX_JSON_BACKEND")
+    if requested:
+        if requested not in BACKENDS:
+            raise ValueError(f"RAX_JSON_BACKEND={requested!r} is not available (have: {', '.join(BACKENDS)})")
+        return requested
+    return BACKENDS[0]
+
+
+BACKEND = _select_backend()
+
+
+class ShopItem(NamedTuple):
+    name: str
+    value: Union[str, int, float]
+    id: int
+
+
+if msgspec is not None:
+    class _Entity(msgspec.Struct):
+        name: str
+
+    class _ShopItem(msgspec.Struct):
+        entity: _Entity
+        value: Union[str, int, float]
+        id: int
+
+    class _HotSeason(msgspec.Struct):
+        items: Optional[list[_ShopItem]] = None
+
+    class _BoostInfo(msgspec.Struct):
+        level: Optional[int] = None
+
+    class _FeedItem(msgspec.Struct):
+        boostInfo: Optional[_BoostInfo] = None
+
+    class _Leaderboard(msgspec.Struct):
+        feedItems: Optional[list[_FeedItem]] = None
+
+    _hotseason_decoder = msgspec.json.Decoder(_HotSeason)
+    _leaderboard_decoder = msgspec.json.Decoder(_Leaderboard)
+    _generic_decoder = msgspec.json.Decoder()
+    _encoder = msgspec.json.Encoder()
+
+
+def loads(data: Union[bytes, str]):
+    if BACKEND == "msgspec":
+        return _generic_decoder.decode(data)
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, pretty: bool = False) -> bytes:
+    """Serialize ``obj`` compactly, or as sorted 4-space JSON when ``pretty``.
+
+    Pretty output always goes through the stdlib so files kept in git stay
+    byte-identical whichever backend is active; it is only used for final
+    outputs, not per-checkpoint writes. Non-string dict keys (pass
+    distribution levels) are written as strings, as the stdlib does.
+    """
+    if pretty:
+        return json.dumps(obj, indent=4, sort_keys=True).encode()
+    if BACKEND == "msgspec":
+        return _encoder.encode(obj)
+    if BACKEND == "orjson":
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def load(path: Union[str, Path]):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump(obj, path: Union[str, Path], pretty: bool = False):
+    with open(path, "wb") as f:
+        f.write(dumps(obj, pretty=pretty))
+
+
+def decode_hotseason(data: Union[bytes, str]) -> list[ShopItem]:
+    """``items[].entity.name/value/id`` from a hotseason shop page."""
+    if BACKEND == "msgspec":
+        return [ShopItem(item.entity.name, item.value, item.id)
+                for item in _hotseason_decoder.decode(data).items or []]
+    return [ShopItem(item["entity"]["name"], item["value"], item["id"])
+            for item in loads(data).get("items") or []]
+
+
+def decode_pass_levels(data: Union[bytes, str]) -> list[int]:
+    """``feedItems[].boostInfo.level`` from a pass leaderboard page, in order.
+
+    Items without a boost level are dropped.
+    """
+    if BACKEND == "msgspec":
+        return [item.boostInfo.level for item in _leaderboard_decoder.decode(data).feedItems or []
+                if item.boostInfo is not None and item.boostInfo.level is not None]
+    levels = []
+    for item in loads(data).get("feedItems") or []:
+        level = (item.get("boostInfo") or {}).get("level")
+        if level is not None:
+            levels.append(level)
+    return levels
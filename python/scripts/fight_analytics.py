@@ -0,0 +1,235 @@
+"""
+Per-fighter analytics over ``fight_history.csv``.
+
+``load_history()`` reads the history once into typed columns: fighter and
+method as categoricals, dates as ``datetime64[D]`` and points as small ints.
+Rows are sorted by fighter, then date. Every rollup below then works on
+contiguous per-fighter slices with ``reduceat``/``bincount`` and run-length
+arithmetic instead of a Python function per fighter:
+
+- ``fighter_features()``: one row per fighter. It holds record, finish
+  rate, points totals, last-N form, current and longest streaks, and days
+  since the last fight (relative to a reference date).
+- ``points_per_year()``: a fighter x year table of total points.
+- ``activity()``: last fight date, fights in the last 24 months and active
+  status as of a reference date. The aggregate stage adds these to
+  ``final_values.csv``.
+
+    cd python
+    python scripts/fight_analytics.py --out results/fighter_features.csv
+    python -m bench.analytics_bench            # 21k rows + synthetic 1M rows
+"""
+import argparse
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from process_matches_fast import LOSS_POINTS
+
+RESULTS_DIR = Path(__file__).parent.parent / "results"
+
+FINISHES = ("KO/TKO", "Submission")
+# Fights that count towards "form"
+FORM_WINDOW = 5
+# A fighter is active with a fight in this many months before the reference date
+ACTIVE_MONTHS = 24
+
+CATEGORIES = ("fighter_name", "opponent", "method")
+POINT_TYPES = {
+    "method_points": np.int16,
+    "strike_bonus": np.int32,
+    "round_bonus": np.int16,
+    "total_points": np.int32,
+}
+
+
+def load_history(source: Union[str, Path, pd.DataFrame, None] = None) -> pd.DataFrame:
+    """``fight_history`` as typed columns sorted by fighter, then date.
+
+    Rows without a fighter name are dropped. Adds ``won`` (a loss always scores ``LOSS_POINTS``) and ``finish`` (a win
+    by KO/TKO or submission).
+    """
+    if source is None:
+        source = RESULTS_DIR / "fight_history.csv"
+    if not isinstance(source, pd.DataFrame):
+        # Read strings as objects and categorize afterwards: ~2x faster than dtype="category"
+        source = pd.read_csv(source, dtype={**dict.fromkeys(CATEGORIES + ("date",), object), **POINT_TYPES})
+    history = source.astype({**dict.fromkeys(CATEGORIES, "category"), **POINT_TYPES})
+    # Rows whose fighter name failed to parse can't be attributed to anyone
+    history = history[history["fighter_name"].notna()]
+    history["date"] = pd.to_datetime(history["date"], format="%Y-%m-%d")
+    order = np.lexsort((history["date"].values, history["fighter_name"].cat.codes.values))
+    history = history.iloc[order].reset_index(drop=True)
+    history["won"] = history["method_points"].values != LOSS_POINTS
+    history["finish"] = history["won"].values & history["method"].isin(FINISHES).values
+    return history
+
+
+def _days(history: pd.DataFrame) -> np.ndarray:
+    """Fight dates as day numbers (days since 1970-01-01)."""
+    return history["date"].values.astype("datetime64[D]").astype(np.int64)
+
+
+def _groups(history: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Fighter code per row, and the start row and row count of each fighter's slice."""
+    codes = history["fighter_name"].cat.codes.values
+    if len(codes) == 0:
+        return codes, np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    counts = np.diff(np.r_[starts, len(codes)])
+    return codes, starts, counts
+
+
+def _streaks(won: np.ndarray, starts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Signed current streak (+wins / -losses) and longest win streak per fighter."""
+    n = len(won)
+    # A run of equal results ends at a result change or at the next fighter's first fight
+    first_fight = np.zeros(n, dtype=bool)
+    first_fight[starts] = True
+    boundary = first_fight.copy()
+    boundary[1:] |= won[1:] != won[:-1]
+    run_starts = np.flatnonzero(boundary)
+    run_lengths = np.diff(np.r_[run_starts, n])
+    run_won = won[run_starts]
+    run_group = np.cumsum(first_fight[run_starts]) - 1
+
+    # A fighter's current streak is their last run
+    is_last_run = np.r_[run_group[1:] != run_group[:-1], True]
+    current = np.where(run_won, run_lengths, -run_lengths)[is_last_run]
+
+    longest = np.zeros(len(starts), dtype=np.int64)
+    np.maximum.at(longest, run_group[run_won], run_lengths[run_won])
+    return current, longest
+
+
+def fighter_features(history: pd.DataFrame, reference_date: Optional[str] = None,
+                     form_window: int = FORM_WINDOW) -> pd.DataFrame:
+    """One row per fighter from a ``load_history()`` frame.
+
+    ``days_since_last_fight`` counts from ``reference_date`` (default: the
+    latest fight in the history, so results don't depend on the clock).
+    """
+    codes, starts, counts = _groups(history)
+    if len(starts) == 0:
+        return pd.DataFrame(columns=["name", "fights", "wins", "losses", "win_rate", "finishes",
+                                     "finish_rate", "total_points", "points_per_fight", "best_fight",
+                                     "form_points", "form_wins", "current_streak", "longest_win_streak",
+                                     "first_fight", "last_fight", "days_since_last_fight",
+                                     "mean_days_between_fights"])
+    days = _days(history)
+    won = history["won"].values
+    points = history["total_points"].values.astype(np.int64)
+
+    wins = np.add.reduceat(won.astype(np.int64), starts)
+    finishes = np.add.reduceat(history["finish"].values.astype(np.int64), starts)
+    total = np.add.reduceat(points, starts)
+
+    # Position from the end of each fighter's slice: 0 is the latest fight
+    ends = starts + counts
+    from_end = np.repeat(ends, counts) - 1 - np.arange(len(codes))
+    recent = from_end < form_window
+    group = np.repeat(np.arange(len(starts)), counts)
+    form_fights = np.minimum(counts, form_window)
+    form_points = np.bincount(group[recent], weights=points[recent], minlength=len(starts)) / form_fights
+    form_wins = np.bincount(group[recent], weights=won[recent], minlength=len(starts)).astype(np.int64)
+
+    current_streak, longest_win_streak = _streaks(won, starts)
+
+    first, last = days[starts], days[ends - 1]
+    reference = (np.datetime64(reference_date, "D").astype(np.int64) if reference_date is not None
+                 else days.max())
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_gap = np.where(counts > 1, (last - first) / (counts - 1), np.nan)
+        finish_rate = np.where(wins > 0, finishes / wins, 0.0)
+
+    return pd.DataFrame({
+        "name": history["fighter_name"].cat.categories[codes[starts]],
+        "fights": counts,
+        "wins": wins,
+        "losses": counts - wins,
+        "win_rate": wins / counts,
+        "finishes": finishes,
+        "finish_rate": finish_rate,
+        "total_points": total,
+        "points_per_fight": total / counts,
+        "best_fight": np.maximum.reduceat(points, starts),
+        "form_points": form_points,
+        "form_wins": form_wins,
+        "current_streak": current_streak,
+        "longest_win_streak": longest_win_streak,
+        "first_fight": first.astype("datetime64[D]"),
+        "last_fight": last.astype("datetime64[D]"),
+        "days_since_last_fight": reference - last,
+        "mean_days_between_fights": mean_gap,
+    })
+
+
+def points_per_year(history: pd.DataFrame) -> pd.DataFrame:
+    """Fighter x year total points (0 for years without a fight)."""
+    codes, starts, _ = _groups(history)
+    years = history["date"].values.astype("datetime64[Y]").astype(np.int64) + 1970
+    first_year = years.min() if len(years) else 1970
+    width = (years.max() - first_year + 1) if len(years) else 0
+    fighters = history["fighter_name"].cat.categories
+    # One bincount over (fighter code, year) cells instead of a groupby per fighter
+    cells = np.bincount(codes.astype(np.int64) * width + (years - first_year),
+                        weights=history["total_points"].values, minlength=len(fighters) * width)
+    table = pd.DataFrame(cells.reshape(len(fighters), width).astype(np.int64), index=fighters,
+                         columns=range(first_year, first_year + width))
+    table.index.name = "name"
+    return table.loc[fighters[codes[starts]]]
+
+
+def activity(history: pd.DataFrame, reference_date: Optional[str] = None) -> pd.DataFrame:
+    """``name``, ``last_fight_date``, ``fights_last_24m`` and ``active`` per fighter as of ``reference_date``.
+
+    Only fights on or before ``reference_date`` (default: the latest fight) count, so a past date gives the status the
+    fighters had then. A fighter without a fight by then has a NaT ``last_fight_date``.
+    """
+    codes, starts, _ = _groups(history)
+    days = _days(history)
+    if len(days) == 0:
+        return pd.DataFrame({"name": pd.Series(dtype=object), "last_fight_date": pd.Series(dtype="datetime64[s]"),
+                             "fights_last_24m": pd.Series(dtype=np.int64), "active": pd.Series(dtype=bool)})
+    reference = pd.Timestamp(reference_date) if reference_date is not None else pd.Timestamp(days.max(), unit="D")
+    cutoff = reference - pd.DateOffset(months=ACTIVE_MONTHS)
+    reference, cutoff = (np.datetime64(t.date(), "D").astype(np.int64) for t in (reference, cutoff))
+
+    # Rows are sorted by (fighter, date), so fighter * span + day is a sorted key
+    # and two searchsorted calls find, per fighter, how many fights fall on or
+    # before the reference date and on or before the window start
+    base, span = days.min() - 1, days.max() - days.min() + 2
+    key = codes.astype(np.int64) * span + (days - base)
+    group_key = codes[starts].astype(np.int64) * span
+    upto_reference = np.searchsorted(key, group_key + np.clip(reference - base, 0, span - 1), side="right")
+    upto_cutoff = np.searchsorted(key, group_key + np.clip(cutoff - base, 0, span - 1), side="right")
+
+    recent = upto_reference - upto_cutoff
+    fought = upto_reference > starts
+    last = np.where(fought, days[np.maximum(upto_reference - 1, 0)], np.iinfo(np.int64).min)
+    return pd.DataFrame({
+        "name": np.asarray(history["fighter_name"].cat.categories[codes[starts]], dtype=object),
+        "last_fight_date": last.astype("datetime64[D]"),
+        "fights_last_24m": recent,
+        "active": recent > 0,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-fighter features from fight_history.csv")
+    parser.add_argument("--history", default=str(RESULTS_DIR / "fight_history.csv"))
+    parser.add_argument("--reference-date", help="YYYY-MM-DD for days_since_last_fight (default: latest fight)")
+    parser.add_argument("--form-window", type=int, default=FORM_WINDOW)
+    parser.add_argument("--out", default=str(RESULTS_DIR / "fighter_features.csv"))
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    features = fighter_features(history, args.reference_date, args.form_window)
+    features.to_csv(args.out, index=False)
+    print(f"Wrote {len(features)} fighters to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Binary fighter bundle: ``fight_history.csv``, ``final_values.csv`` and
+``fighters_values.json`` joined once into ``results/fighters.bundle``, a file
+consumers memory-map instead of parsing CSV and JSON and joining by name.
+
+Layout (little-endian, every section 64-byte aligned):
+
+    b"RAXB", uint32 version, uint32 header length, header (JSON)
+    fighters        FIGHTER_DTYPE, one fixed-width record per fighter
+    fights          FIGHT_DTYPE, one record per fighter per fight, sorted by
+                    fighter then date; fighter i's fights are
+                    fights[first_fight[i]:first_fight[i] + fight_count[i]]
+    names           UTF-8 string pool. Fighters come first, so fighter i is
+                    name i; opponents who are not fighters follow
+    name_offsets    uint32, name i is names[name_offsets[i]:name_offsets[i + 1]]
+    methods         UTF-8 pool of the fight methods, coded by ``fights.method``
+    method_offsets
+
+The header records each section's dtype, shape and offset. Dates are day
+ordinals (days since 1970-01-01), so ``fights["day"].astype("datetime64[D]")``
+gives the dates back.
+
+    cd python
+    python scripts/fighter_bundle.py                  # write results/fighters.bundle
+    python scripts/fighter_bundle.py "Jon Jones"      # print one fighter from it
+    python -m bench.bundle_bench                      # cold load vs CSV + JSON
+"""
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+from functools import cached_property
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+import cancellation
+import fast_json
+import request_stats
+from fight_analytics import load_history
+
+RESULTS_DIR = Path(__file__).parent.parent / "results"
+PUBLIC_DATA_DIR = Path(__file__).parent.parent.parent / "public" / "data"
+BUNDLE_FILE = "fighters.bundle"
+
+MAGIC = b"RAXB"
+VERSION = 1
+ALIGN = 64
+PASS_LEVELS = (7, 6, 5, 4, 3)
+MISSING = -1
+
+FIGHTER_DTYPE = np.dtype([
+    ("realsports_id", "<i4"),      # MISSING when the fighter isn't on Real Sports
+    ("owned_passes", "<i4"),
+    ("age", "<i2"),                # MISSING when unknown
+    ("active", "u1"),
+    ("value", "<i4"),              # total Rax from final_values.csv
+    ("passes", "<i4", (len(PASS_LEVELS),)),
+    ("first_fight", "<u4"),
+    ("fight_count", "<u4"),
+])
+FIGHT_DTYPE = np.dtype([
+    ("fighter", "<u4"),
+    ("opponent", "<u4"),           # index into the name pool
+    ("day", "<i4"),
+    ("method", "u1"),              # index into the method pool
+    ("method_points", "<i2"),
+    ("strike_bonus", "<i2"),
+    ("round_bonus", "<i2"),
+    ("total_points", "<i4"),
+])
+_PREAMBLE = struct.Struct("<4sII")
+
+
+def _pool(strings) -> tuple[np.ndarray, np.ndarray]:
+    """UTF-8 bytes of ``strings`` back to back, and the offsets delimiting each."""
+    encoded = [s.encode() for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype="u1"), offsets
+
+
+def build(history: Union[Path, pd.DataFrame], values: pd.DataFrame, fighters_values: dict,
+          identities: Optional[dict] = None) -> dict[str, np.ndarray]:
+    """The bundle's sections as arrays.
+
+    ``identities`` maps ufcstats names to their Real Sports entry
+    (``fighter_identities.json``); names missing from it join on the name itself.
+    """
+    history = load_history(history)
+    identities = identities or {}
+    opponent = history["opponent"].astype(object).fillna("")
+    fighter_names = sorted(set(history["fighter_name"].astype(object)) | set(values["name"].dropna()))
+    names = pd.Index(fighter_names + sorted(set(opponent) - set(fighter_names)))
+
+    fighter = names.get_indexer(history["fighter_name"])
+    order = np.lexsort((history["date"].values, fighter))
+    history = history.iloc[order]
+    fighter, opponent = fighter[order], opponent.iloc[order]
+
+    methods = list(history["method"].cat.categories)
+    method = history["method"].cat.codes.values
+    if (method < 0).any():
+        # Fights without a parsed method share an empty-string method
+        methods.append("")
+        method = np.where(method < 0, len(methods) - 1, method)
+    fights = np.zeros(len(history), dtype=FIGHT_DTYPE)
+    fights["fighter"] = fighter
+    fights["opponent"] = names.get_indexer(opponent)
+    fights["day"] = history["date"].values.astype("datetime64[D]").astype(np.int64)
+    fights["method"] = method
+    for column in ("method_points", "strike_bonus", "round_bonus", "total_points"):
+        fights[column] = history[column].values
+
+    fighters = np.zeros(len(fighter_names), dtype=FIGHTER_DTYPE)
+    counts = np.bincount(fighter, minlength=len(fighters))
+    fighters["fight_count"] = counts
+    fighters["first_fight"] = np.r_[0, np.cumsum(counts)[:-1]]
+    fighters["realsports_id"] = fighters["age"] = MISSING
+
+    by_name = values.dropna(subset=["name"]).drop_duplicates("name").set_index("name")
+    at = names.get_indexer(by_name.index)
+    fighters["value"][at] = by_name["Value"].values
+    if "active" in by_name.columns:
+        fighters["active"][at] = by_name["active"].astype(bool).values
+
+    for i, name in enumerate(fighter_names):
+        identity = identities.get(name)
+        entry = fighters_values.get(identity["realsports_name"] if identity else name)
+        if entry is None:
+            continue
+        fighters["realsports_id"][i] = entry.get("id") if entry.get("id") is not None else MISSING
+        fighters["owned_passes"][i] = int(entry.get("value") or 0)
+        if entry.get("age") is not None:
+            fighters["age"][i] = entry["age"]
+        passes = entry.get("pass_distribution") or {}
+        fighters["passes"][i] = [passes.get(str(level), 0) for level in PASS_LEVELS]
+
+    name_pool, name_offsets = _pool(names)
+    method_pool, method_offsets = _pool(methods)
+    return {"fighters": fighters, "fights": fights, "names": name_pool, "name_offsets": name_offsets,
+            "methods": method_pool, "method_offsets": method_offsets}
+
+
+def _aligned(n: int) -> int:
+    return -(-n // ALIGN) * ALIGN
+
+
+def write(sections: dict[str, np.ndarray], path: Path):
+    """Write ``sections`` as a bundle; readers never see a partial file."""
+    layout, offset = {}, 0
+    for name, array in sections.items():
+        layout[name] = {"dtype": np.lib.format.dtype_to_descr(array.dtype), "shape": list(array.shape),
+                        "offset": offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({"sections": layout}).encode()
+    start = _aligned(_PREAMBLE.size + len(header))
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)) + header)
+        for name, array in sections.items():
+            f.seek(start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+
+def _decode(pool: np.ndarray, offsets: np.ndarray, i: int) -> str:
+    return bytes(pool[offsets[i]:offsets[i + 1]]).decode()
+
+
+def _descr(descr):
+    """A JSON round-tripped dtype description back in the tuple form numpy expects."""
+    return descr if isinstance(descr, str) else [tuple(field) for field in descr]
+
+
+class Bundle:
+    """Read-only view of a bundle file.
+
+    The file is mapped once; sections are views into the map, so pages are only
+    read when a section is touched.
+    """
+
+    def __init__(self, path: Union[str, Path, None] = None):
+        self.path = Path(path or RESULTS_DIR / BUNDLE_FILE)
+        with open(self.path, "rb") as f:
+            magic, version, size = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{self.path} is not a version {VERSION} fighter bundle")
+            layout = json.loads(f.read(size))["sections"]
+        start = _aligned(_PREAMBLE.size + size)
+        self._map = np.memmap(self.path, mode="r", dtype="u1")
+        self.sections = {}
+        for name, spec in layout.items():
+            dtype = np.lib.format.descr_to_dtype(_descr(spec["dtype"]))
+            begin = start + spec["offset"]
+            count = int(np.prod(spec["shape"]))
+            self.sections[name] = self._map[begin:begin + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+        self.fighters = self.sections["fighters"]
+        self.fights = self.sections["fights"]
+
+    def __len__(self) -> int:
+        return len(self.fighters)
+
+    def name(self, i: int) -> str:
+        return _decode(self.sections["names"], self.sections["name_offsets"], i)
+
+    @cached_property
+    def names(self) -> list[str]:
+        """Every name in the pool; the first ``len(self)`` are the fighters."""
+        pool, offsets = bytes(self.sections["names"]), self.sections["name_offsets"].tolist()
+        return [pool[a:b].decode() for a, b in zip(offsets[:-1], offsets[1:])]
+
+    @cached_property
+    def methods(self) -> list[str]:
+        return [_decode(self.sections["methods"], self.sections["method_offsets"], i)
+                for i in range(len(self.sections["method_offsets"]) - 1)]
+
+    @cached_property
+    def _index(self) -> dict[str, int]:
+        return {name: i for i, name in enumerate(self.names[:len(self)])}
+
+    def index(self, name: str) -> int:
+        """Fighter number of ``name``; KeyError if it isn't a fighter."""
+        return self._index[name]
+
+    def fights_of(self, i: int) -> np.ndarray:
+        first, count = int(self.fighters["first_fight"][i]), int(self.fighters["fight_count"][i])
+        return self.fights[first:first + count]
+
+    def fighter(self, name: str) -> dict:
+        """One fighter as plain Python values, with their fights in date order."""
+        i = self.index(name)
+        record = self.fighters[i]
+        fights = self.fights_of(i)
+        return {
+            "name": name,
+            "realsports_id": None if record["realsports_id"] == MISSING else int(record["realsports_id"]),
+            "owned_passes": int(record["owned_passes"]),
+            "age": None if record["age"] == MISSING else int(record["age"]),
+            "active": bool(record["active"]),
+            "value": int(record["value"]),
+            "pass_distribution": dict(zip(map(str, PASS_LEVELS), record["passes"].tolist())),
+            "fights": [
+                {"date": str(day), "opponent": self.name(opponent), "method": self.methods[method] or None,
+                 "total_points": int(points)}
+                for day, opponent, method, points in zip(fights["day"].astype("datetime64[D]"), fights["opponent"],
+                                                         fights["method"], fights["total_points"])
+            ],
+        }
+
+
+def load(path: Union[str, Path, None] = None) -> Bundle:
+    return Bundle(path)
+
+
+def _run(artifacts: dict):
+    history = artifacts.get("fight_history")
+    if history is None:
+        history = RESULTS_DIR / "fight_history.csv"
+    values = artifacts.get("final_values")
+    if values is None:
+        values = pd.read_csv(RESULTS_DIR / "final_values.csv")
+    fighters_values = artifacts.get("fighters_values")
+    if fighters_values is None:
+        path = PUBLIC_DATA_DIR / "fighters_values.json"
+        fighters_values = fast_json.load(path) if path.exists() else {}
+    identities = artifacts.get("identities")
+    if identities is None:
+        path = RESULTS_DIR / "fighter_identities.json"
+        identities = fast_json.load(path) if path.exists() else {}
+
+    sections = build(history, values, fighters_values, identities)
+    path = RESULTS_DIR / BUNDLE_FILE
+    write(sections, path)
+    print(f"Wrote {len(sections['fighters'])} fighters and {len(sections['fights'])} fights to {path} "
+          f"({path.stat().st_size / 1e6:.1f} MB)")
+
+
+async def run(progress=None, artifacts=None) -> dict:
+    """Stage entry point: join the stage outputs into results/fighters.bundle."""
+    await asyncio.to_thread(_run, artifacts or {})
+    if progress:
+        progress(100)
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write or inspect the binary fighter bundle")
+    parser.add_argument("fighter", nargs="?", help="print this fighter from the existing bundle")
+    args = parser.parse_args()
+    if args.fighter:
+        print(json.dumps(load().fighter(args.fighter), indent=2))
+        return 0
+    status = cancellation.run_main(run)
+    request_stats.emit()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""
+Fighter identity index: ufcstats fighter URL <-> Real Sports id <-> canonical name.
+
+ufcstats and Real Sports spell names differently: accents, suffixes ("Jr."),
+punctuation, spacing ("DongHun" / "Dong Hun"), middle names ("Ian Garry" /
+"Ian Machado Garry"). Joining on the raw display string silently drops those
+fighters. Each name is reduced to a series of progressively looser keys, and
+a name resolves at the first key that points to exactly one identity:
+
+    exact      the display string itself
+    key        accents/punctuation/suffixes/quoted nicknames stripped
+    compact    key without spaces
+    tokens     key tokens sorted (swapped name order)
+    first_last first and last token only (middle names)
+    fuzzy      difflib ratio >= FUZZY_CUTOFF against unlinked identities
+
+A key shared by two fighters (there are two Bruno Silvas) is ambiguous and
+never resolves by name alone. Identities and every alias seen, with how it
+matched, persist in the data store. Each run only resolves names it has not
+seen before.
+
+As a stage this writes results/fighter_identities.json. For each ufcstats
+display name in final_values.csv, the file gives the Real Sports name and id
+to join on.
+"""
+import asyncio
+import difflib
+import re
+import sys
+import unicodedata
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+import cancellation
+import fast_json
+import request_stats
+from data_store import DataStore
+
+RESULTS_DIR = Path(__file__).parent.parent / "results"
+DATA_DIR = Path(__file__).parent.parent / "data"
+PUBLIC_DATA_DIR = Path(__file__).parent.parent.parent / "public" / "data"
+
+FUZZY_CUTOFF = 0.88
+SUFFIXES = {"jr", "sr", "ii", "iii", "iv"}
+# Letters NFKD does not decompose
+TRANSLITERATE = str.maketrans({"ł": "l", "Ł": "L", "ø": "o", "Ø": "O", "đ": "d", "Đ": "D",
+                               "ß": "ss", "æ": "ae", "Æ": "AE", "ı": "i"})
+KEY_KINDS = ("exact", "key", "compact", "tokens", "first_last")
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase ASCII tokens without accents, punctuation, suffixes or quoted nicknames."""
+    text = unicodedata.normalize("NFKD", name.translate(TRANSLITERATE))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r'["“”][^"“”]*["“”]', " ", text)
+    text = re.sub(r"['’`]", "", text.lower())
+    return " ".join(t for t in re.findall(r"[a-z0-9]+", text) if t not in SUFFIXES)
+
+
+def name_keys(name: str) -> dict[str, str]:
+    """Every lookup key for ``name``, strictest first."""
+    key = normalize_name(name)
+    tokens = key.split()
+    keys = {"exact": name.strip(), "key": key, "compact": key.replace(" ", ""),
+            "tokens": " ".join(sorted(tokens))}
+    if tokens:
+        keys["first_last"] = f"{tokens[0]} {tokens[-1]}"
+    return keys
+
+
+class IdentityIndex:
+    """In-memory hash index over the persisted identities; ``save()`` writes what changed."""
+
+    def __init__(self, store: Optional[DataStore] = None):
+        self.store = store or DataStore()
+        self.identities: dict[int, dict] = {}
+        self.by_url: dict[str, int] = {}
+        self.by_realsports: dict[int, int] = {}
+        self.unlinked: set[int] = set()           # identities without a Real Sports id
+        self.realsports_names: dict[int, str] = {}
+        self.aliases: dict[tuple[str, str], tuple[int, str]] = {}
+        self.keys: dict[str, dict[str, set[int]]] = {kind: defaultdict(set) for kind in KEY_KINDS}
+        self._dirty: set[int] = set()
+        self._new_aliases: dict[tuple[str, str], tuple[int, str]] = {}
+
+        with self.store._connect() as conn:
+            for row in conn.execute("SELECT id, canonical_name, ufcstats_url, realsports_id FROM fighter_identities"):
+                self._index(dict(row))
+            for row in conn.execute("SELECT source, name, identity_id, how FROM fighter_aliases"):
+                self._remember(row["source"], row["name"], row["identity_id"], row["how"])
+
+    def _index(self, identity: dict):
+        self.identities[identity["id"]] = identity
+        if identity["ufcstats_url"]:
+            self.by_url[identity["ufcstats_url"]] = identity["id"]
+        if identity["realsports_id"] is None:
+            self.unlinked.add(identity["id"])
+        else:
+            self.by_realsports[identity["realsports_id"]] = identity["id"]
+        for kind, key in name_keys(identity["canonical_name"]).items():
+            self.keys[kind][key].add(identity["id"])
+
+    def _remember(self, source: str, name: str, identity_id: int, how: str):
+        self.aliases[(source, name)] = (identity_id, how)
+        if source == "realsports":
+            self.realsports_names[identity_id] = name
+        # Later lookups of this spelling hit the exact tier
+        self.keys["exact"][name.strip()].add(identity_id)
+
+    def _create(self, name: str, ufcstats_url: Optional[str] = None, realsports_id: Optional[int] = None) -> int:
+        identity_id = max(self.identities, default=0) + 1
+        self._index({"id": identity_id, "canonical_name": name,
+                     "ufcstats_url": ufcstats_url, "realsports_id": realsports_id})
+        self._dirty.add(identity_id)
+        return identity_id
+
+    def _alias(self, source: str, name: str, identity_id: int, how: str):
+        if self.aliases.get((source, name)) != (identity_id, how):
+            self._new_aliases[(source, name)] = (identity_id, how)
+            self._remember(source, name, identity_id, how)
+
+    def match_name(self, name: str, candidates: Optional[set[int]] = None,
+                   fuzzy: bool = True) -> tuple[Optional[int], str]:
+        """Resolve a display name by key tiers; ``(None, "ambiguous" | "unmatched")`` otherwise."""
+        keys = name_keys(name)
+        for kind in KEY_KINDS:
+            if kind not in keys:
+                continue
+            ids = self.keys[kind].get(keys[kind], set())
+            if candidates is not None:
+                ids = ids & candidates
+            if len(ids) == 1:
+                return next(iter(ids)), kind
+            if len(ids) > 1:
+                return None, "ambiguous"
+        if fuzzy:
+            pool = {key: ids if candidates is None else ids & candidates
+                    for key, ids in self.keys["key"].items()}
+            pool = {key: ids for key, ids in pool.items() if ids}
+            close = difflib.get_close_matches(keys["key"], list(pool), n=1, cutoff=FUZZY_CUTOFF)
+            if close and len(pool[close[0]]) == 1:
+                return next(iter(pool[close[0]])), "fuzzy"
+        return None, "unmatched"
+
+    def add_ufcstats(self, name: str, url: Optional[str] = None) -> int:
+        """A ufcstats fighter: a roster row with its URL, or a display name from fight pages."""
+        if url:
+            # The URL is the key; the roster name is already the canonical name
+            return self.by_url.get(url) or self._create(name, ufcstats_url=url)
+        if ("ufcstats", name) in self.aliases:
+            return self.aliases[("ufcstats", name)][0]
+        identity_id, how = self.match_name(name, fuzzy=False)
+        if identity_id is None:
+            identity_id, how = self._create(name), "new"
+        self._alias("ufcstats", name, identity_id, how)
+        return identity_id
+
+    def add_realsports(self, name: str, realsports_id: int) -> tuple[int, str]:
+        """Link a Real Sports fighter to a ufcstats identity, or create a Real Sports-only one."""
+        if realsports_id in self.by_realsports:
+            identity_id = self.by_realsports[realsports_id]
+            how = self.aliases.get(("realsports", name), (identity_id, "id"))[1]
+            self._alias("realsports", name, identity_id, how)
+            return identity_id, how
+        identity_id, how = self.match_name(name, candidates=self.unlinked)
+        if identity_id is None:
+            identity_id, how = self._create(name, realsports_id=realsports_id), "new"
+        else:
+            self.identities[identity_id]["realsports_id"] = realsports_id
+            self.by_realsports[realsports_id] = identity_id
+            self.unlinked.discard(identity_id)
+            self._dirty.add(identity_id)
+        self._alias("realsports", name, identity_id, how)
+        return identity_id, how
+
+    def save(self):
+        """Write new or changed identities and aliases in one transaction."""
+        with self.store._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO fighter_identities (id, canonical_name, ufcstats_url, realsports_id) "
+                "VALUES (:id, :canonical_name, :ufcstats_url, :realsports_id)",
+                [self.identities[i] for i in sorted(self._dirty)])
+            conn.executemany(
+                "INSERT OR REPLACE INTO fighter_aliases (source, name, identity_id, how) VALUES (?, ?, ?, ?)",
+                [(source, name, i, how) for (source, name), (i, how) in self._new_aliases.items()])
+        self._dirty.clear()
+        self._new_aliases.clear()
+
+
+def build(roster: pd.DataFrame, display_names, fighters_values: dict,
+          index: Optional[IdentityIndex] = None) -> tuple[IdentityIndex, dict]:
+    """Fold new roster rows, fight-page names and Real Sports entries into the index.
+
+    Returns the index and the join map ``{display name: {realsports_name, realsports_id, ...}}``.
+    """
+    index = index or IdentityIndex()
+    for first, last, url in roster[["fighter_f_name", "fighter_l_name", "fighter_url"]].itertuples(index=False):
+        name = " ".join(str(part) for part in (first, last) if isinstance(part, str))
+        if name:
+            index.add_ufcstats(name, url)
+    display_ids = {name: index.add_ufcstats(name) for name in display_names if isinstance(name, str) and name}
+
+    # Real Sports ids are stable, so names with an id already linked are O(1)
+    fuzzy = []
+    for name, data in fighters_values.items():
+        if data.get("id") is None:
+            continue
+        _, how = index.add_realsports(name, data["id"])
+        if how == "fuzzy":
+            fuzzy.append(name)
+
+    joins = {}
+    for display, identity_id in display_ids.items():
+        identity = index.identities[identity_id]
+        realsports_name = index.realsports_names.get(identity_id)
+        if realsports_name is not None:
+            if realsports_name not in fighters_values:
+                # Linked by an earlier run but not in this feed (off the leaderboard, or
+                # get_values skipped): nothing to join against until it comes back
+                continue
+            how = index.aliases[("realsports", realsports_name)][1]
+        elif display in fighters_values:
+            # Ambiguous display names (two fighters share it) keep the old exact join
+            realsports_name, how = display, "exact"
+        else:
+            continue
+        joins[display] = {
+            "realsports_name": realsports_name,
+            "realsports_id": fighters_values[realsports_name].get("id"),
+            "ufcstats_url": identity["ufcstats_url"],
+            "match": how,
+        }
+    for name in fuzzy:
+        print(f"Warning: fuzzy identity match for '{name}', check fighter_aliases")
+    return index, joins
+
+
+def _run(artifacts: dict) -> dict:
+    values = artifacts.get("final_values")
+    if values is None:
+        values = pd.read_csv(RESULTS_DIR / "final_values.csv")
+    fighters_values = artifacts.get("fighters_values")
+    if fighters_values is None:
+        # get_values may never have run; the join map is then empty, not an error
+        path = PUBLIC_DATA_DIR / "fighters_values.json"
+        fighters_values = fast_json.load(path) if path.exists() else {}
+    roster_path = DATA_DIR / "all_fighters.csv"
+    roster = pd.read_csv(roster_path) if roster_path.exists() else \
+        pd.DataFrame(columns=["fighter_f_name", "fighter_l_name", "fighter_url"])
+
+    index, joins = build(roster, values["name"], fighters_values)
+    index.save()
+    fast_json.dump(joins, RESULTS_DIR / "fighter_identities.json", pretty=True)
+
+    renamed = sum(1 for display, join in joins.items() if join["realsports_name"] != display)
+    print(f"Linked {len(joins)} of {values['name'].nunique()} fighters to Real Sports "
+          f"({renamed} under a different name)")
+    return joins
+
+
+async def run(progress=None, artifacts=None) -> dict:
+    """Stage entry point: refresh the identity index and write the join map."""
+    # Fuzzy matching and the store writes are blocking; keep them off the event loop
+    joins = await asyncio.to_thread(_run, artifacts or {})
+    if progress:
+        progress(100)
+    return {"identities": joins}
+
+
+if __name__ == "__main__":
+    status = cancellation.run_main(run)
+    request_stats.emit()
+    sys.exit(status)
@@ -1,13 +1,18 @@
 import asyncio
-import aiohttp
-import json
-import zlib
-import ssl
+import sys
 from tqdm import tqdm
 from config import HEADERS
 from datetime import datetime
 import re
-import os
+from pathlib import Path
+
+import cancellation
+import fast_json
+import request_stats
+import tracing
+from data_store import DataStore
+from journal import Journal
+from http_client import REALSPORTS_BASE, create_session
 
 # gets card purchases for each fighter
 # last ran dec 25 2024
@@ -16,41 +21,30 @@ import os
 # TODO: 
 # https://web.realsports.io/teams/346/sport/ufc -> get age and add vet status tag
 
-# Load existing progress if available
-def load_progress():
-    if os.path.exists('../../public/data/fighters_values_partial.json'):
-        with open('../../public/data/fighters_values_partial.json', 'r') as f:
-            return json.load(f)
-    return {}
+API_BASE = REALSPORTS_BASE
 
-# Save current progress
-def save_progress(fighters_data):
-    with open('../../public/data/fighters_values_partial.json', 'w') as f:
-        json.dump(fighters_data, f, indent=4, sort_keys=True)
+PUBLIC_DATA_DIR = Path(__file__).parent.parent.parent / "public" / "data"
+JOURNAL_FILE = PUBLIC_DATA_DIR / "fighters_values.journal.jsonl"
+OUTPUT_FILE = PUBLIC_DATA_DIR / "fighters_values.json"
 
+@tracing.traced("hotseason_page")
 async def get_fighters_page(session, before):
-    url = f'https://web.realsports.io/userpassshop/ufc/season/2023/entity/team/section/hotseason?before={before}'
+    url = f'{API_BASE}/userpassshop/ufc/season/2023/entity/team/section/hotseason?before={before}'
     
     try:
-        async with session.get(url, headers=HEADERS) as response:
+        async with session.get(url) as response:
             if response.status == 200:
-                content = await response.read()
-                if 'gzip' in response.headers.get('Content-Encoding', ''):
-                    data = zlib.decompress(content, 16+zlib.MAX_WBITS)
-                elif 'deflate' in response.headers.get('Content-Encoding', ''):
-                    data = zlib.decompress(content)
-                else:
-                    data = content
-                
-                json_data = json.loads(data)
+                body = await response.read()
+                with tracing.span("decode"):
+                    items = fast_json.decode_hotseason(body)
+                request_stats.parsed("hotseason")
                 fighters_dict = {}
                 
-                if 'items' in json_data and json_data['items']:
-                    for item in json_data['items']:
-                        name = item['entity']['name']
+                if items:
+                    for name, value, fighter_id in items:
                         fighters_dict[name] = {
-                            'value': item['value'],
-                            'id': item['id']
+                            'value': value,
+                            'id': fighter_id
                         }
                     print(f"Found {len(fighters_dict)} fighters for before={before}")
                     return fighters_dict, True
@@ -65,37 +59,31 @@ async def get_fighters_page(session, before):
         return {}, False
 
 # New function to get pass distribution for a fighter
+@tracing.traced("passes")
 async def get_fighter_passes(session, fighter_id):
     pass_distribution = {7: 0, 6: 0, 5: 0, 4: 0, 3: 0}
     current_before = 0
     max_before = 1000
     
     while current_before <= max_before:
-        url = f'https://web.realsports.io/userpasses/ufc/type/team/entity/{fighter_id}/leaderboard?before={current_before}&season=2023&sort=boostvalue'
+        url = f'{API_BASE}/userpasses/ufc/type/team/entity/{fighter_id}/leaderboard?before={current_before}&season=2023&sort=boostvalue'
         
         try:
-            async with session.get(url, headers=HEADERS) as response:
+            async with session.get(url) as response:
                 if response.status == 200:
-                    content = await response.read()
-                    if 'gzip' in response.headers.get('Content-Encoding', ''):
-                        data = zlib.decompress(content, 16+zlib.MAX_WBITS)
-                    elif 'deflate' in response.headers.get('Content-Encoding', ''):
-                        data = zlib.decompress(content)
-                    else:
-                        data = content
-                    
-                    json_data = json.loads(data)
+                    body = await response.read()
+                    with tracing.span("decode"):
+                        levels = fast_json.decode_pass_levels(body)
+                    request_stats.parsed("leaderboard")
                     found_level_2 = False
                     
-                    if 'feedItems' in json_data and json_data['feedItems']:
-                        for item in json_data['feedItems']:
-                            if 'boostInfo' in item and 'level' in item['boostInfo']:
-                                level = item['boostInfo']['level']
-                                if level <= 2:
-                                    found_level_2 = True
-                                    break
-                                if level in pass_distribution:
-                                    pass_distribution[level] += 1
+                    if levels:
+                        for level in levels:
+                            if level <= 2:
+                                found_level_2 = True
+                                break
+                            if level in pass_distribution:
+                                pass_distribution[level] += 1
                         
                         if found_level_2:
                             break
@@ -114,13 +102,17 @@ async def get_fighter_passes(session, fighter_id):
     
     return pass_distribution
 
+@tracing.traced("age")
 async def get_fighter_age(session, fighter_id):
-    url = f'https://web.realsports.io/teams/{fighter_id}/sport/ufc'
+    url = f'{API_BASE}/teams/{fighter_id}/sport/ufc'
     
     try:
-        async with session.get(url, headers=HEADERS) as response:
+        async with session.get(url) as response:
             if response.status == 200:
-                data = await response.json()
+                body = await response.read()
+                with tracing.span("decode"):
+                    data = fast_json.loads(body)
+                request_stats.parsed("team")
                 details = data.get('team', {}).get('additionalInfo', {}).get('details', [])
                 
                 for detail in details:
@@ -137,22 +129,19 @@ async def get_fighter_age(session, fighter_id):
         return None
 
 async def process_pass_batch(session, fighters_batch):
-    pass_tasks = []
-    age_tasks = []
-    
-    for name, data in fighters_batch:
-        pass_tasks.append((name, get_fighter_passes(session, data['id'])))
-        age_tasks.append((name, get_fighter_age(session, data['id'])))
-    
-    # Process passes and ages separately
+    # Process passes and ages separately; after a stop request, start no new requests
     pass_results = []
-    for name, task in pass_tasks:
-        result = await task
+    for name, data in fighters_batch:
+        if cancellation.requested():
+            break
+        result = await get_fighter_passes(session, data['id'])
         pass_results.append((name, result))
     
     age_results = []
-    for name, task in age_tasks:
-        result = await task
+    for name, data in fighters_batch[:len(pass_results)]:
+        if cancellation.requested():
+            break
+        result = await get_fighter_age(session, data['id'])
         age_results.append((name, result))
     
     # Create a dictionary for easier lookup
@@ -166,7 +155,7 @@ async def process_batch(session, start_before, batch_size=5):
     for before in range(start_before, start_before + (batch_size * 20), 20):
         tasks.append(get_fighters_page(session, before))
     
-    results = await asyncio.gather(*tasks)
+    results = await cancellation.gather(*tasks)
     
     combined_dict = {}
     should_continue = False
@@ -177,16 +166,22 @@ async def process_batch(session, start_before, batch_size=5):
     
     return combined_dict, should_continue
 
-async def main():
-    # Load any existing progress
-    all_fighters = load_progress()
+async def run(progress=None, artifacts=None) -> dict:
+    """Stage entry point: refresh values, pass distributions and ages."""
+    # Resume from an interrupted run by replaying its checkpoint journal
+    journal = Journal(JOURNAL_FILE)
+    all_fighters = journal.replay()
     print(f"Loaded {len(all_fighters)} fighters from previous progress")
+    # Fighters whose passes and age an interrupted run already refreshed
+    done_journal = Journal(JOURNAL_FILE.with_suffix(".done.jsonl"))
+    done = done_journal.replay()
     
     start_before = 0
     max_before = 1500
     batch_size = 5
     
-    async with aiohttp.ClientSession() as session:
+    # One pooled session for every phase: shop pages, leaderboards and team pages
+    async with create_session(HEADERS) as session:
         # Always refresh fighter values from API (values change over time)
         print("\nFetching current fighter values from API...")
         current_before = start_before
@@ -194,6 +189,7 @@ async def main():
         
         with tqdm(total=max_before) as pbar:
             while current_before <= max_before:
+                cancellation.check("get_values")
                 fighters_dict, should_continue = await process_batch(session, current_before, batch_size)
                 fresh_values.update(fighters_dict)
                 
@@ -203,9 +199,13 @@ async def main():
                 
                 current_before += batch_size * 20
                 pbar.update(batch_size * 20)
+                if progress:
+                    progress(min(current_before / max_before, 1) * 20)
                 await asyncio.sleep(0.2)  # Reduced delay
         
         # Update all fighters with fresh values, preserving existing pass_distribution and age
+        previous = {name: {'value': data.get('value'), 'id': data.get('id')}
+                    for name, data in all_fighters.items()}
         for name, fresh_data in fresh_values.items():
             if name in all_fighters:
                 # Update value and id, but preserve pass_distribution and age if they exist
@@ -215,41 +215,50 @@ async def main():
                 # New fighter, add them
                 all_fighters[name] = fresh_data
         
-        # Save progress after updating values
-        save_progress(all_fighters)
+        # Checkpoint only the fighters whose value or id changed
+        journal.append({name: fresh_data for name, fresh_data in fresh_values.items()
+                        if fresh_data != previous.get(name)})
         
         # Now get pass distribution for each fighter (refresh all, not just missing ones)
         print("\nGetting pass distribution for each fighter...")
         batch_size = 10  # Increased batch size
-        fighters_items = list(all_fighters.items())  # Process all fighters to refresh pass distribution
+        fighters_items = [item for item in all_fighters.items() if item[0] not in done]
+        if done:
+            print(f"Skipping {len(done)} fighters refreshed before the last run stopped")
         
         with tqdm(total=len(fighters_items)) as pbar:
             for i in range(0, len(fighters_items), batch_size):
                 batch = fighters_items[i:i + batch_size]
                 results = await process_pass_batch(session, batch)
                 
+                updates = {}
                 for name, passes, age in results:
                     if passes:
                         all_fighters[name]['pass_distribution'] = passes
+                        updates.setdefault(name, {})['pass_distribution'] = passes
                     if age is not None:
                         all_fighters[name]['age'] = age
+                        updates.setdefault(name, {})['age'] = age
                 
-                # Save progress every 50 fighters
-                if i % 50 == 0:
-                    save_progress(all_fighters)
+                # Checkpoint this batch only: appending is O(batch), not O(all fighters)
+                journal.append(updates)
+                done_journal.append({name: {"done": True} for name, _, _ in results})
+                cancellation.check("get_values")
                 
                 pbar.update(len(batch))
+                if progress:
+                    progress(20 + (i + len(batch)) / len(fighters_items) * 80)
                 await asyncio.sleep(0.1)  # Reduced delay
     
-    # Save final results
-    with open('../../public/data/fighters_values.json', 'w') as f:
-        json.dump(all_fighters, f, indent=4, sort_keys=True)
-    
-    # Clean up partial file
-    if os.path.exists('../../public/data/fighters_values_partial.json'):
-        os.remove('../../public/data/fighters_values_partial.json')
+    # Write the final file atomically, then drop the journal
+    journal.compact(all_fighters, OUTPUT_FILE)
+    done_journal.discard()
+    DataStore().write_ownership(all_fighters)
     
     print(f"\nComplete! Saved {len(all_fighters)} fighters to 'fighters_values.json'")
+    return {"fighters_values": all_fighters}
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    status = cancellation.run_main(run)
+    request_stats.emit()
+    sys.exit(status)
\ No newline at end of file
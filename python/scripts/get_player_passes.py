@@ -1,24 +1,17 @@
 import asyncio
-import aiohttp
 import json
-import zlib
 import os
 from tqdm import tqdm
 from config import HEADERS
+from http_client import create_session
 
 async def get_players_passes_page(session, before):
     url = f'https://web.realsports.io/userpassshop/mlb/season/2024/entity/player/section/hotseason?before={before}'
     
     try:
-        async with session.get(url, headers=HEADERS) as response:
+        async with session.get(url) as response:
             if response.status == 200:
-                content = await response.read()
-                if 'gzip' in response.headers.get('Content-Encoding', ''):
-                    data = zlib.decompress(content, 16+zlib.MAX_WBITS)
-                elif 'deflate' in response.headers.get('Content-Encoding', ''):
-                    data = zlib.decompress(content)
-                else:
-                    data = content
+                data = await response.read()
                 
                 json_data = json.loads(data)
                 passes_dict = {}
@@ -76,7 +69,7 @@ async def main():
     max_before = 2000
     batch_size = 5
     
-    async with aiohttp.ClientSession() as session:
+    async with create_session(HEADERS) as session:
         current_before = start_before
         all_passes = {}
         
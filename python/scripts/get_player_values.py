@@ -1,10 +1,9 @@
 import asyncio
-import aiohttp
 import json
-import zlib
 import os
 from tqdm import tqdm
 from config import HEADERS
+from http_client import create_session
 
 # Load existing progress if available
 def load_progress():
@@ -22,15 +21,9 @@ async def get_players_page(session, before):
     url = f'https://web.realsports.io/userpassshop/mlb/season/2024/entity/player/section/earningsregularseason?before={before}'
     
     try:
-        async with session.get(url, headers=HEADERS) as response:
+        async with session.get(url) as response:
             if response.status == 200:
-                content = await response.read()
-                if 'gzip' in response.headers.get('Content-Encoding', ''):
-                    data = zlib.decompress(content, 16+zlib.MAX_WBITS)
-                elif 'deflate' in response.headers.get('Content-Encoding', ''):
-                    data = zlib.decompress(content)
-                else:
-                    data = content
+                data = await response.read()
                 
                 json_data = json.loads(data)
                 players_dict = {}
@@ -79,7 +72,7 @@ async def main():
     max_before = 2000  # Increased for MLB as there might be more players
     batch_size = 5
     
-    async with aiohttp.ClientSession() as session:
+    async with create_session(HEADERS) as session:
         # Get all players and their IDs if we don't have them
         if not all_players:
             current_before = start_before
@@ -0,0 +1,49 @@
+"""
+Shared aiohttp session factory for the scraping and Real Sports scripts.
+
+One session per run keeps connections alive across fetch phases (shop pages,
+pass leaderboards, team pages) instead of paying a TLS handshake per batch.
+Responses are decompressed by aiohttp itself, DNS lookups are cached, and
+every request is counted by ``request_stats`` and, when a tracer is
+installed, timed phase by phase by ``tracing``.
+"""
+from typing import Optional
+
+import aiohttp
+
+import request_stats
+import tracing
+
+REALSPORTS_BASE = 'https://web.realsports.io'
+
+# Real Sports rate-limits aggressively, so keep per-host concurrency modest
+REALSPORTS_LIMIT_PER_HOST = 20
+
+DNS_CACHE_TTL = 300          # seconds
+KEEPALIVE_TIMEOUT = 30       # seconds an idle pooled connection stays open
+DEFAULT_TIMEOUT = 30         # seconds per request
+
+
+def create_session(headers: Optional[dict] = None,
+                   limit: int = 100,
+                   limit_per_host: int = REALSPORTS_LIMIT_PER_HOST,
+                   timeout: float = DEFAULT_TIMEOUT) -> aiohttp.ClientSession:
+    """Return a pooled keep-alive session with DNS caching and request counting.
+
+    ``headers`` are sent with every request, so callers no longer pass them
+    per call.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        use_dns_cache=True,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=headers,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        auto_decompress=True,
+        trace_configs=[request_stats.trace_config(), tracing.trace_config()],
+    )
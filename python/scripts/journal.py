@@ -0,0 +1,85 @@
+"""
+Append-only JSONL checkpoint journal.
+
+Each checkpoint appends one line per changed record,
+
+    {"key": "Jon Jones", "set": {"value": "4100", "id": 346}}
+
+so the cost is proportional to what changed, not to everything fetched so
+far. ``replay()`` folds the lines back into a dict to resume a run. A line
+cut short by a crash is ignored. ``compact()`` writes the final document
+through a temp file and ``os.replace``, then drops the journal; ``discard()``
+drops it when the results are saved elsewhere.
+"""
+import os
+from pathlib import Path
+from typing import Union
+
+import fast_json
+
+
+class Journal:
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._file = None
+
+    def replay(self) -> dict:
+        records = {}
+        if not self.path.exists():
+            return records
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = fast_json.loads(line)
+                except ValueError:
+                    # Torn write from a crash mid-append: everything before it is intact
+                    break
+                records.setdefault(entry["key"], {}).update(entry["set"])
+        return records
+
+    def append(self, updates: dict):
+        """Record ``{key: {field: value}}`` updates durably."""
+        if not updates:
+            return
+        if self._file is None:
+            self._open()
+        self._file.write(b"".join(fast_json.dumps({"key": key, "set": fields}) + b"\n"
+                                  for key, fields in updates.items()))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "ab")
+        # Drop a torn last line so new entries don't get glued onto it
+        if self._file.tell():
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+                if torn:
+                    f.seek(0)
+                    keep = f.read().rfind(b"\n") + 1
+            if torn:
+                self._file.truncate(keep)
+                self._file.seek(0, os.SEEK_END)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """Drop the journal once the work it checkpoints is complete."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def compact(self, records: dict, output_path: Union[str, Path]):
+        """Atomically write ``records`` to ``output_path`` and discard the journal."""
+        output_path = Path(output_path)
+        tmp = output_path.with_name(output_path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(fast_json.dumps(records, pretty=True))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, output_path)
+        self.discard()
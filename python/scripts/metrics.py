@@ -0,0 +1,223 @@
+"""
+In-process Prometheus metrics for the pipeline server.
+
+A dependency-free registry of counters, gauges and histograms rendered in the
+Prometheus text exposition format (0.0.4) at ``GET /metrics``. Metrics are
+labelled by ``stage``. HTTP ones are fed by the ``request_stats`` aiohttp
+hooks, stage ones by the pipeline runner.
+
+Subprocess stages count into their own registry. It is shipped back on the
+``STAGE_STATS`` line and merged when the stage ends, so subprocess numbers
+arrive per stage while in-process numbers are live.
+"""
+import bisect
+import os
+import resource
+import threading
+from typing import Callable, Iterable, Optional
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: dict[tuple, object] = {}
+        self.lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        with self.lock:
+            return [(self.name, _format_labels(self.labelnames, key), value)
+                    for key, value in sorted(self.values.items())]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def set_function(self, function: Callable[[], float]):
+        """Read an unlabelled gauge's value from ``function`` at scrape time."""
+        self.function = function
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        if self.function is not None:
+            return [(self.name, "", self.function())]
+        return super().samples()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS, registry: Optional["Registry"] = None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            counts, total = self.values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            # Per-bucket (not cumulative) counts; the last slot is +Inf
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+
+    def get(self, **labels) -> tuple[int, float]:
+        """``(count, sum)`` of the observations under ``labels``."""
+        counts, total = self.values.get(self._key(labels)) or ([0], 0.0)
+        return sum(counts), total
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        out = []
+        with self.lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    out.append((f"{self.name}_bucket", _format_labels(self.labelnames, key, le), cumulative))
+                labels = _format_labels(self.labelnames, key)
+                out.append((f"{self.name}_sum", labels, total))
+                out.append((f"{self.name}_count", labels, cumulative))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self.metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines += [f"{name}{labels} {_format_value(value)}" for name, labels, value in metric.samples()]
+        return "\n".join(lines) + "\n"
+
+    def dump(self) -> dict:
+        """Counters and histograms as JSON-safe data, for ``merge()`` in another process."""
+        data = {}
+        for metric in self.metrics.values():
+            if isinstance(metric, (Counter, Histogram)):
+                with metric.lock:
+                    data[metric.name] = [[list(key), value] for key, value in metric.values.items()]
+        return data
+
+    def merge(self, data: dict):
+        """Add a ``dump()`` from a subprocess into this registry."""
+        for name, entries in data.items():
+            metric = self.metrics.get(name)
+            if metric is None:
+                continue
+            with metric.lock:
+                for key, value in entries:
+                    key = tuple(key)
+                    if isinstance(metric, Histogram):
+                        counts, total = metric.values.get(key) or ([0] * (len(metric.buckets) + 1), 0.0)
+                        metric.values[key] = ([a + b for a, b in zip(counts, value[0])], total + value[1])
+                    else:
+                        metric.values[key] = metric.values.get(key, 0) + value
+
+
+def rss_bytes() -> int:
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = Counter("rax_http_requests_total", "HTTP responses received, by host and status",
+                        ("stage", "host", "status"))
+HTTP_ERRORS = Counter("rax_http_request_errors_total", "HTTP requests that raised before a response",
+                      ("stage", "host"))
+HTTP_BYTES = Counter("rax_http_response_bytes_total", "Response body bytes downloaded", ("stage", "host"))
+HTTP_LATENCY = Histogram("rax_http_request_duration_seconds", "Request start to response headers",
+                         ("stage", "host"))
+HTTP_INFLIGHT = Gauge("rax_http_requests_in_flight", "Requests started and not yet answered", ("stage",))
+HTTP_QUEUED = Gauge("rax_http_connection_queue_depth", "Requests waiting for a pooled connection", ("stage",))
+HTTP_CONNECTIONS = Counter("rax_http_connections_total", "Connections used, new or reused from the pool",
+                           ("stage", "kind"))
+DNS_CACHE = Counter("rax_dns_cache_total", "DNS cache lookups by result (hit/miss)", ("stage", "result"))
+PAGES_PARSED = Counter("rax_pages_parsed_total", "Pages/responses parsed, by kind", ("stage", "kind"))
+STAGE_DURATION = Histogram("rax_stage_duration_seconds", "Stage wall time", ("stage", "status"),
+                           buckets=STAGE_BUCKETS)
+STAGE_RUNNING = Gauge("rax_stage_running", "1 while the stage is executing", ("stage",))
+STAGE_CACHE = Counter("rax_stage_cache_total", "Manifest checks by result (hit = skipped as unchanged)",
+                      ("stage", "result"))
+PIPELINE_RUNNING = Gauge("rax_pipeline_running", "Pipeline runs in progress")
+PIPELINE_PROGRESS = Gauge("rax_pipeline_progress_percent", "Progress of the least advanced run in progress")
+CANCEL_LATENCY = Histogram("rax_cancel_latency_seconds", "Cancel request until every stage of the run stopped",
+                           buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30))
+JOBS_QUEUED = Gauge("rax_jobs_queued", "Pipeline jobs waiting for a worker")
+RESIDENT_MEMORY = Gauge("rax_process_resident_memory_bytes", "Resident set size of the server process")
+PEAK_MEMORY = Gauge("rax_process_peak_resident_memory_bytes", "Peak resident set size of the server process")
+RESIDENT_MEMORY.set_function(rss_bytes)
+PEAK_MEMORY.set_function(lambda: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
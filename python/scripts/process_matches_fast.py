@@ -3,14 +3,24 @@ Optimized fight processor using aiohttp for aggressive parallelization.
 Expected to be ~4-5x faster than the original process_matches.py.
 """
 import asyncio
+import os
 import aiohttp
+import numpy as np
 import pandas as pd
+from array import array
 from bs4 import BeautifulSoup
-from datetime import datetime
-from collections import defaultdict
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date as Date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
 from pathlib import Path
-import json
+import sys
+
+import cancellation
+import request_stats
+import tracing
+from data_store import FULL_REFRESH_ENV, DataStore
+from http_client import create_session
+from journal import Journal
 
 SCORING = {
     "KO/TKO": 100,
@@ -25,37 +35,227 @@ MAX_CONCURRENT = 30  # Aggressive parallelization
 BATCH_SIZE = 100
 SAVE_INTERVAL = 500
 
+RESULTS_DIR = Path(__file__).parent.parent / "results"
+DATA_DIR = Path(__file__).parent.parent / "data"
+# Facts of fights parsed by a run that was stopped, keyed by fight URL (under RESULTS_DIR)
+JOURNAL_NAME = "fight_facts.journal.jsonl"
+
+LOSS_POINTS = 25
+# Fights older than this are taken from the data store instead of fetched again;
+# ufcstats corrections (overturned results, fixed stats) land within weeks
+SETTLED_DAYS = 90
+
+
+class FightFact(NamedTuple):
+    """One parsed fight page, as emitted by ``process_fight``."""
+    index: int                  # position in the fights CSV; the reduction's sort key
+    fight_url: str
+    event_url: Optional[str]
+    date: str
+    winner: Optional[str]
+    loser: Optional[str]
+    method: Optional[str]
+    rounds: Optional[int]
+    is_draw: int
+    striker: str
+    strike_diff: int
+
+
+class FightHistory:
+    """Columnar fight history: one row per fighter per fight.
+
+    Fighter names, methods and fight URLs are interned to small ints and each
+    column is a typed ``array``, so a row costs ~22 bytes instead of a
+    seven-key dict. Dates are stored as proleptic ordinals. Per-fighter totals
+    (``new_final.csv``) are computed from the columns when saving rather than
+    kept as running counters.
+    """
+    __slots__ = ("names", "name_ids", "methods", "method_ids", "urls", "url_ids",
+                 "fighter", "opponent", "url", "day", "method", "method_points",
+                 "strike_bonus", "round_bonus")
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.name_ids: Dict[str, int] = {}
+        self.methods: List[Optional[str]] = []
+        self.method_ids: Dict[Optional[str], int] = {}
+        self.urls: List[str] = []
+        self.url_ids: Dict[str, int] = {}
+        self.fighter = array('i')
+        self.opponent = array('i')
+        self.url = array('i')
+        self.day = array('i')
+        self.method = array('h')
+        self.method_points = array('h')
+        self.strike_bonus = array('i')
+        self.round_bonus = array('h')
+
+    @staticmethod
+    def _intern(value, values: list, ids: dict) -> int:
+        code = ids.get(value)
+        if code is None:
+            code = ids[value] = len(values)
+            values.append(value)
+        return code
+
+    def fighter_id(self, name: str) -> int:
+        return self._intern(name, self.names, self.name_ids)
+
+    def append(self, url: str, fighter: str, date: str, opponent: str, method: Optional[str],
+               method_points: int, strike_bonus: int, round_bonus: int):
+        self.fighter.append(self.fighter_id(fighter))
+        self.opponent.append(self.fighter_id(opponent))
+        self.url.append(self._intern(url, self.urls, self.url_ids))
+        self.day.append(Date.fromisoformat(date).toordinal())
+        self.method.append(self._intern(method, self.methods, self.method_ids))
+        self.method_points.append(method_points)
+        self.strike_bonus.append(strike_bonus)
+        self.round_bonus.append(round_bonus)
+
+    def __len__(self) -> int:
+        return len(self.fighter)
+
+    def add_fact(self, fact: FightFact):
+        """Append both sides of a decided fight; draws and one-sided pages score nothing."""
+        if fact.is_draw or not fact.winner or not fact.loser:
+            return
+        round_bonus = FIVE_ROUND_BONUS if fact.rounds == 5 else 0
+        self.append(fact.fight_url, fact.winner, fact.date, fact.loser, fact.method,
+                    SCORING.get(fact.method, 0),
+                    fact.strike_diff if fact.striker == fact.winner else 0, round_bonus)
+        self.append(fact.fight_url, fact.loser, fact.date, fact.winner, fact.method, LOSS_POINTS,
+                    fact.strike_diff if fact.striker == fact.loser else 0, round_bonus)
+
+    @classmethod
+    def concat(cls, parts: Iterable["FightHistory"]) -> "FightHistory":
+        """Join histories end to end, re-interning each part's ids into the result.
+
+        Concatenating the histories of consecutive chunks gives exactly the
+        history of the whole sequence, so chunks can be reduced independently.
+        """
+        merged = cls()
+        for part in parts:
+            remap = {
+                "names": np.array([merged.fighter_id(n) for n in part.names], dtype=np.int32),
+                "methods": np.array([cls._intern(m, merged.methods, merged.method_ids)
+                                     for m in part.methods], dtype=np.int16),
+                "urls": np.array([cls._intern(u, merged.urls, merged.url_ids)
+                                  for u in part.urls], dtype=np.int32),
+            }
+            for column, values in (("fighter", "names"), ("opponent", "names"), ("url", "urls"),
+                                   ("method", "methods")):
+                getattr(merged, column).frombytes(remap[values][part._column(column)].tobytes())
+            for column in ("day", "method_points", "strike_bonus", "round_bonus"):
+                getattr(merged, column).extend(getattr(part, column))
+        return merged
+
+    def _column(self, name: str) -> np.ndarray:
+        column = getattr(self, name)
+        return np.frombuffer(column, dtype=np.dtype(column.typecode)) if len(column) else \
+            np.zeros(0, dtype=np.dtype(column.typecode))
+
+    def totals_frame(self) -> pd.DataFrame:
+        """Per-fighter point totals in first-seen order (``new_final.csv``)."""
+        n = len(self.names)
+        fighter = self._column("fighter")
+        method = self._column("method")
+        points = self._column("method_points")
+        columns = {"name": self.names}
+        for scored in SCORING:
+            code = self.method_ids.get(scored)
+            mask = method == code if code is not None else np.zeros(len(method), dtype=bool)
+            columns[scored] = np.bincount(fighter[mask], weights=points[mask], minlength=n).astype(np.int64)
+        columns["StrikeBonus"] = np.bincount(fighter, weights=self._column("strike_bonus"), minlength=n).astype(np.int64)
+        columns["5roundBonus"] = np.bincount(fighter, weights=self._column("round_bonus"), minlength=n).astype(np.int64)
+        return pd.DataFrame(columns)
+
+    def history_frame(self) -> pd.DataFrame:
+        """Rows grouped by fighter (first-seen order), in the order they were added."""
+        order = np.argsort(self._column("fighter"), kind="stable")
+        names = np.array(self.names, dtype=object)
+        methods = np.array(self.methods, dtype=object)
+        urls = np.array(self.urls, dtype=object)
+        days = self._column("day")[order]
+        dates = {d: Date.fromordinal(int(d)).isoformat() for d in np.unique(days)}
+        method_points = self._column("method_points")[order].astype(np.int64)
+        strike_bonus = self._column("strike_bonus")[order].astype(np.int64)
+        round_bonus = self._column("round_bonus")[order].astype(np.int64)
+        return pd.DataFrame({
+            "fighter_name": names[self._column("fighter")[order]],
+            "fight_url": urls[self._column("url")[order]],
+            "date": [dates[d] for d in days],
+            "opponent": names[self._column("opponent")[order]],
+            "method": methods[self._column("method")[order]],
+            "method_points": method_points,
+            "strike_bonus": strike_bonus,
+            "round_bonus": round_bonus,
+            "total_points": method_points + strike_bonus + round_bonus,
+        })
+
+
+def _reduce_chunk(facts: Sequence[FightFact]) -> FightHistory:
+    history = FightHistory()
+    for fact in facts:
+        history.add_fact(fact)
+    return history
+
+
+def reduce_facts(facts: Iterable[FightFact], workers: int = 1) -> FightHistory:
+    """Build the fight history from facts in fights-CSV order, whatever order they arrived in.
+
+    With ``workers > 1`` contiguous chunks are reduced in worker processes
+    and concatenated; the result is identical to the serial reduction.
+    """
+    ordered = sorted(facts, key=lambda fact: fact.index)
+    if workers <= 1 or len(ordered) < 2 * workers:
+        return _reduce_chunk(ordered)
+    size = -(-len(ordered) // workers)
+    chunks = [ordered[i:i + size] for i in range(0, len(ordered), size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return FightHistory.concat(pool.map(_reduce_chunk, chunks))
+
 
 class AsyncFightProcessor:
-    def __init__(self, fights_csv: str, fighters_csv: str):
-        self.fights = pd.read_csv(fights_csv)
-        self.fighters = pd.read_csv(fighters_csv)
-        self.result = {}
+    def __init__(self, fights_csv: Union[str, pd.DataFrame], fighters_csv: Union[str, pd.DataFrame],
+                 progress: Optional[Callable[[float], None]] = None):
+        self.fights = fights_csv if isinstance(fights_csv, pd.DataFrame) else pd.read_csv(fights_csv)
+        self.fighters = fighters_csv if isinstance(fighters_csv, pd.DataFrame) else pd.read_csv(fighters_csv)
+        self.progress = progress
+        # One immutable record per parsed fight page, appended as pages complete
+        self.fight_facts: List[FightFact] = []
         self.errors = []
         self.processed_count = 0
         self.total_fights = len(self.fights)
-        self.lock = asyncio.Lock()
         
         print(f"Loaded {self.total_fights} fights from CSV")
         if self.total_fights == 0:
             raise ValueError("No fights loaded from CSV file")
 
+    @staticmethod
+    def get_event_url(soup: BeautifulSoup) -> Optional[str]:
+        """Extract the event page link from a fight page."""
+        title_elem = soup.find('h2', class_='b-content__title')
+        if not title_elem:
+            return None
+        event_link = title_elem.find('a')
+        if not event_link:
+            return None
+        return event_link.get('href')
+
     async def get_event_date(self, session: aiohttp.ClientSession, soup: BeautifulSoup) -> Optional[str]:
         """Extract event date from fight page."""
         try:
-            title_elem = soup.find('h2', class_='b-content__title')
-            if not title_elem:
-                return None
-            event_link = title_elem.find('a')
-            if not event_link:
+            new_url = self.get_event_url(soup)
+            if not new_url:
                 return None
                 
-            new_url = event_link['href']
             async with session.get(new_url, timeout=aiohttp.ClientTimeout(total=10)) as response:
                 if response.status != 200:
                     return None
                 content = await response.text()
-                new_soup = BeautifulSoup(content, 'html.parser')
+                with tracing.span("parse", page="event"):
+                    new_soup = BeautifulSoup(content, 'html.parser')
+                request_stats.parsed("event")
                 
                 date_item = new_soup.find('li', class_='b-list__box-list-item')
                 if date_item:
@@ -65,6 +265,7 @@ class AsyncFightProcessor:
             pass
         return None
 
+    @tracing.traced("extract")
     def get_strike_stats(self, soup: BeautifulSoup) -> Tuple[Optional[str], int]:
         """Extract strike statistics from fight page."""
         try:
@@ -97,6 +298,7 @@ class AsyncFightProcessor:
         except Exception:
             return None, 0
 
+    @tracing.traced("extract")
     def get_fight_details(self, soup: BeautifulSoup) -> Dict:
         """Extract fight details including winner, loser, method, and rounds."""
         names = soup.find_all('div', class_='b-fight-details__person')
@@ -154,21 +356,7 @@ class AsyncFightProcessor:
             'rounds': rounds
         }
 
-    @staticmethod
-    def create_fighter_record(name: str) -> Dict:
-        """Create initial fighter record structure."""
-        return {
-            "name": name,
-            "KO/TKO": 0,
-            "Submission": 0,
-            "Decision - Unanimous": 0,
-            "Decision - Majority": 0,
-            "Decision - Split": 0,
-            "StrikeBonus": 0,
-            "5roundBonus": 0,
-            "fight_history": []
-        }
-
+    @tracing.traced("fight")
     async def process_fight(self, session: aiohttp.ClientSession, url: str, index: int) -> bool:
         """Process individual fight data."""
         try:
@@ -178,9 +366,12 @@ class AsyncFightProcessor:
                     return False
                 
                 content = await response.text()
-                soup = BeautifulSoup(content, 'html.parser')
+                with tracing.span("parse", page="fight"):
+                    soup = BeautifulSoup(content, 'html.parser')
+                request_stats.parsed("fight")
             
-            event_date = await self.get_event_date(session, soup)
+            with tracing.span("event_date"):
+                event_date = await self.get_event_date(session, soup)
             if not event_date:
                 return False
             
@@ -189,139 +380,135 @@ class AsyncFightProcessor:
                 return False
             
             details = self.get_fight_details(soup)
-            
-            if details['is_draw'] or not details['winner'] or not details['loser']:
-                return True  # Not an error, just a draw or incomplete
-            
-            # Thread-safe update
-            async with self.lock:
-                self._update_fighter_records(details, event_date, striker, strike_diff)
-            
+            # Scoring happens once, in reduce_facts, so completion order doesn't matter
+            self.fight_facts.append(FightFact(
+                index=index,
+                fight_url=url,
+                event_url=self.get_event_url(soup),
+                date=event_date,
+                winner=details['winner'],
+                loser=details['loser'],
+                method=details['method'],
+                rounds=int(details['rounds']) if details['rounds'] else None,
+                is_draw=int(details['is_draw']),
+                striker=striker,
+                strike_diff=strike_diff,
+            ))
             return True
             
         except Exception as e:
             self.errors.append(url)
             return False
 
-    def _update_fighter_records(self, details: Dict, date: str, striker: str, strike_diff: int):
-        """Update fighter records with fight outcome (called under lock)."""
-        winner, loser = details['winner'], details['loser']
-        is_five_rounds = details['rounds'] == '5'
-        
-        for fighter in [winner, loser]:
-            if fighter not in self.result:
-                self.result[fighter] = self.create_fighter_record(fighter)
-
-        method_points = SCORING.get(details['method'], 0)
-
-        # Update winner
-        self._add_fight_history(
-            winner, date, loser, details['method'],
-            method_points,
-            strike_diff if striker == winner else 0,
-            FIVE_ROUND_BONUS if is_five_rounds else 0
-        )
-
-        # Update loser (25 points for loss)
-        self._add_fight_history(
-            loser, date, winner, details['method'],
-            25,
-            strike_diff if striker == loser else 0,
-            FIVE_ROUND_BONUS if is_five_rounds else 0
-        )
-
-    def _add_fight_history(self, fighter: str, date: str, opponent: str, 
-                          method: str, method_points: int, strike_bonus: int, 
-                          round_bonus: int):
-        """Add fight to history and update totals."""
-        if method_points > 0 and method in self.result[fighter]:
-            self.result[fighter][method] += method_points
-        
-        self.result[fighter]["StrikeBonus"] += strike_bonus
-        self.result[fighter]["5roundBonus"] += round_bonus
-        
-        self.result[fighter]["fight_history"].append({
-            "date": date,
-            "opponent": opponent,
-            "method": method,
-            "method_points": method_points,
-            "strike_bonus": strike_bonus,
-            "round_bonus": round_bonus,
-            "total_points": method_points + strike_bonus + round_bonus
-        })
-
     async def process_batch(self, session: aiohttp.ClientSession, batch: List[Tuple[int, str]]):
         """Process a batch of fights concurrently."""
         tasks = [self.process_fight(session, url, idx) for idx, url in batch]
-        await asyncio.gather(*tasks, return_exceptions=True)
+        await cancellation.gather(*tasks)
         
         self.processed_count += len(batch)
         progress = (self.processed_count / self.total_fights) * 100
         print(f"Progress: {self.processed_count}/{self.total_fights} ({progress:.1f}%)")
+        if self.progress:
+            self.progress(progress)
+
+    def resume(self, records: dict) -> int:
+        """Reuse facts journaled by a stopped run for the fights still in the CSV."""
+        for index, url in enumerate(self.fights['fight_url']):
+            if url in records:
+                self.fight_facts.append(FightFact(**{**records[url], "index": index, "fight_url": url}))
+        self.processed_count = len(self.fight_facts)
+        return self.processed_count
+
+    def checkpoint(self, journal: Journal, start: int) -> int:
+        """Journal the facts parsed since ``start``; returns the new start."""
+        journal.append({fact.fight_url: {k: v for k, v in fact._asdict().items() if k not in ("index", "fight_url")}
+                        for fact in self.fight_facts[start:]})
+        return len(self.fight_facts)
 
-    async def process_all_fights(self):
-        """Process all fights using async HTTP with connection pooling."""
+    async def process_all_fights(self, journal: Optional[Journal] = None, known: Optional[dict] = None):
+        """Process all fights using async HTTP with connection pooling.
+
+        Fights in ``known`` (journal-shaped records by URL, e.g. from the data
+        store) are not fetched. With a ``journal``, fights it already holds are
+        skipped too and every batch is checkpointed to it. After a stop request
+        no new batch starts, and ``cancellation.Cancelled`` is raised once the
+        journal is flushed.
+        """
         print(f"Starting async processing with {MAX_CONCURRENT} concurrent connections...")
+        records = dict(known or {})
+        if journal:
+            records.update(journal.replay())
+        resumed = self.resume(records) if records else 0
+        if resumed:
+            print(f"Skipping {resumed} fights already parsed by earlier or stopped runs")
+        saved = len(self.fight_facts)
         
-        connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT, limit_per_host=MAX_CONCURRENT)
-        timeout = aiohttp.ClientTimeout(total=30)
-        
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            # Create batches
-            fight_urls = [(i, row['fight_url']) for i, row in self.fights.iterrows()]
+        async with create_session(limit=MAX_CONCURRENT, limit_per_host=MAX_CONCURRENT) as session:
+            # Create batches; positions, not index labels, fix the output order
+            done = {fact.fight_url for fact in self.fight_facts}
+            fight_urls = [(i, url) for i, url in enumerate(self.fights['fight_url']) if url not in done]
             
-            for i in range(0, len(fight_urls), BATCH_SIZE):
-                batch = fight_urls[i:i + BATCH_SIZE]
-                await self.process_batch(session, batch)
-                
-                # Brief pause between batches to avoid overwhelming the server
-                await asyncio.sleep(0.1)
+            try:
+                for i in range(0, len(fight_urls), BATCH_SIZE):
+                    if cancellation.requested():
+                        break
+                    batch = fight_urls[i:i + BATCH_SIZE]
+                    await self.process_batch(session, batch)
+                    if journal:
+                        saved = self.checkpoint(journal, saved)
+                    
+                    # Brief pause between batches to avoid overwhelming the server
+                    await asyncio.sleep(0.1)
+            finally:
+                if journal:
+                    self.checkpoint(journal, saved)
         
+        cancellation.check("process_matches")
         print(f"Processing complete! Processed {self.processed_count} fights")
 
-    def save_results(self):
-        """Save processed results to CSV files."""
-        results_dir = Path(__file__).parent.parent / "results"
-        
-        final_list = [
-            {**{k: v for k, v in fighter.items() if k != 'fight_history'}, 
-             "fight_history": fighter["fight_history"]} 
-            for fighter in self.result.values()
-        ]
-        
-        df = pd.DataFrame(final_list)
+    def save_results(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Save processed results to CSV files and return (stats, history) frames."""
+        results_dir = RESULTS_DIR
         
-        # Save main stats (without fight_history)
-        df_stats = df.drop('fight_history', axis=1)
+        history = reduce_facts(self.fight_facts)
+        df_stats = history.totals_frame()
         df_stats.to_csv(results_dir / 'new_final.csv', index=False)
         print(f"Saved fighter stats to new_final.csv")
         
-        # Save detailed fight history
-        fight_history_rows = []
-        for fighter in final_list:
-            for fight in fighter['fight_history']:
-                fight_row = {
-                    'fighter_name': fighter['name'],
-                    **fight
-                }
-                fight_history_rows.append(fight_row)
-        
-        pd.DataFrame(fight_history_rows).to_csv(results_dir / 'fight_history.csv', index=False)
+        # fight_url is only kept in the data store; the CSV layout is unchanged
+        df_results = history.history_frame()
+        df_history = df_results.drop(columns='fight_url')
+        df_history.to_csv(results_dir / 'fight_history.csv', index=False)
         print(f"Saved fight history to fight_history.csv")
+        
+        store = DataStore()
+        store.write_fight_facts([fact._asdict() for fact in self.fight_facts])
+        store.write_fight_results(df_results)
+        print(f"Saved {len(self.fight_facts)} fights to the data store")
+        return df_stats, df_history
 
 
-async def main():
-    results_dir = Path(__file__).parent.parent / "results"
-    data_dir = Path(__file__).parent.parent / "data"
+async def run(progress=None, artifacts=None) -> dict:
+    """Stage entry point. Reuses the deduped fights from earlier stages when given."""
+    artifacts = artifacts or {}
+    results_dir = RESULTS_DIR
+    fights = artifacts.get("fights")
     
     processor = AsyncFightProcessor(
-        str(results_dir / 'all_fights.csv'),
-        str(data_dir / 'fighters.csv')
+        fights if fights is not None else str(results_dir / 'all_fights.csv'),
+        str(DATA_DIR / 'fighters.csv'),
+        progress=progress,
     )
     
     start_time = datetime.now()
-    await processor.process_all_fights()
-    processor.save_results()
+    journal = Journal(results_dir / JOURNAL_NAME)
+    # A full refresh parses every page again, replacing whatever the store holds
+    full_refresh = artifacts.get("full_refresh", os.environ.get(FULL_REFRESH_ENV) == "1")
+    settled = (Date.today() - timedelta(days=SETTLED_DAYS)).isoformat()
+    await processor.process_all_fights(journal, known=None if full_refresh else DataStore().fight_facts(before=settled))
+    # Reducing the facts and writing the CSVs and store is CPU work: run it off the event loop
+    df_stats, df_history = await asyncio.to_thread(processor.save_results)
+    journal.discard()
     
     elapsed = (datetime.now() - start_time).total_seconds()
     print(f"\nTotal time: {elapsed:.1f} seconds ({elapsed/60:.1f} minutes)")
@@ -333,6 +520,10 @@ async def main():
             for error in processor.errors:
                 f.write(f"{error}\n")
 
+    return {"new_final": df_stats, "fight_history": df_history}
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    status = cancellation.run_main(run)
+    request_stats.emit()
+    sys.exit(status)
@@ -1,44 +1,67 @@
-import requests
+import asyncio
+import sys
 import pandas as pd
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor
-
-print("=" * 50)
-print("Starting remove_duplicates.py")
-print("=" * 50)
-
-# Process results/all_fights.csv
-print("\n[1/2] Processing ../results/all_fights.csv...")
-fights = pd.read_csv('../results/all_fights.csv')
-original_count = len(fights)
-print(f"  Original count: {original_count} fights")
-
-fights_cleaned = fights.drop_duplicates(subset=['fight_url'])
-cleaned_count = len(fights_cleaned)
-duplicates_removed = original_count - cleaned_count
-print(f"  After removing duplicates: {cleaned_count} fights")
-print(f"  Duplicates removed: {duplicates_removed}")
-
-sorted = fights_cleaned.sort_values(by="fight_url", ascending=False)
-sorted.to_csv("../results/all_fights.csv", index=False)
-print("  ✓ Saved to ../results/all_fights.csv")
-
-# Process data/fights.csv
-print("\n[2/2] Processing ../data/fights.csv...")
-fights = pd.read_csv('../data/fights.csv')
-original_count = len(fights)
-print(f"  Original count: {original_count} fights")
-
-fights_cleaned = fights.drop_duplicates(subset=['fight_url'])
-cleaned_count = len(fights_cleaned)
-duplicates_removed = original_count - cleaned_count
-print(f"  After removing duplicates: {cleaned_count} fights")
-print(f"  Duplicates removed: {duplicates_removed}")
-
-sorted = fights_cleaned.sort_values(by="fight_url", ascending=False)
-sorted.to_csv("../data/fights.csv", index=False)
-print("  ✓ Saved to ../data/fights.csv")
-
-print("\n" + "=" * 50)
-print("✓ remove_duplicates.py completed successfully!")
-print("=" * 50)
\ No newline at end of file
+from pathlib import Path
+from typing import Optional
+
+import cancellation
+import request_stats
+
+RESULTS_DIR = Path(__file__).parent.parent / "results"
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+
+def dedupe(fights: pd.DataFrame, path: Path) -> pd.DataFrame:
+    """Drop duplicate fight URLs, sort and write the result to ``path``."""
+    original_count = len(fights)
+    print(f"  Original count: {original_count} fights")
+
+    fights_cleaned = fights.drop_duplicates(subset=['fight_url'])
+    cleaned_count = len(fights_cleaned)
+    duplicates_removed = original_count - cleaned_count
+    print(f"  After removing duplicates: {cleaned_count} fights")
+    print(f"  Duplicates removed: {duplicates_removed}")
+
+    sorted = fights_cleaned.sort_values(by="fight_url", ascending=False)
+    sorted.to_csv(path, index=False)
+    print(f"  ✓ Saved to {path}")
+    return sorted
+
+
+def _run(artifacts: dict, progress=None) -> pd.DataFrame:
+    fights: Optional[pd.DataFrame] = artifacts.get("fights")
+
+    print("=" * 50)
+    print("Starting remove_duplicates.py")
+    print("=" * 50)
+
+    # Process results/all_fights.csv
+    print("\n[1/2] Processing ../results/all_fights.csv...")
+    all_fights = fights if fights is not None else pd.read_csv(RESULTS_DIR / 'all_fights.csv')
+    cleaned = dedupe(all_fights, RESULTS_DIR / 'all_fights.csv')
+    if progress:
+        progress(50)
+
+    # Process data/fights.csv
+    print("\n[2/2] Processing ../data/fights.csv...")
+    data_fights = fights if fights is not None else pd.read_csv(DATA_DIR / 'fights.csv')
+    dedupe(data_fights, DATA_DIR / 'fights.csv')
+    if progress:
+        progress(100)
+
+    print("\n" + "=" * 50)
+    print("✓ remove_duplicates.py completed successfully!")
+    print("=" * 50)
+    return cleaned
+
+
+async def run(progress=None, artifacts=None) -> dict:
+    """Stage entry point. Reuses the fights DataFrame from add_fights when given."""
+    cleaned = await asyncio.to_thread(_run, artifacts or {}, progress)
+    return {"fights": cleaned}
+
+
+if __name__ == "__main__":
+    status = cancellation.run_main(run)
+    request_stats.emit()
+    sys.exit(status)
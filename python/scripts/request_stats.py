@@ -0,0 +1,171 @@
+"""
+Per-stage HTTP counters: requests, bytes downloaded, status histogram, errors
+and request latencies. The same hooks feed the live ``metrics`` registry,
+labelled with the stage.
+
+Scripts attach ``trace_config()`` to their aiohttp sessions (or call
+``record()`` for requests-based code). In-process stages get their own
+``RequestStats`` via ``use()``; a script run on its own counts into a
+module-level default and prints a ``STAGE_STATS`` line on exit so the
+pipeline runner can pick it up.
+"""
+import asyncio
+import json
+import os
+import resource
+import sys
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+import aiohttp
+
+import metrics
+
+STATS_PREFIX = "STAGE_STATS "
+# Set by the pipeline runner on subprocess stages so their metrics carry the stage key
+STAGE_ENV = "RAX_STAGE"
+
+
+class RequestStats:
+    def __init__(self, stage: Optional[str] = None):
+        # Label for the ``metrics`` series this stage feeds
+        self.stage = stage or os.environ.get(STAGE_ENV) or Path(sys.argv[0]).stem or "script"
+        self.requests = 0
+        self.bytes = 0
+        self.errors = 0
+        self.statuses = Counter()
+        # Seconds from request start to response headers, in completion order
+        self.latencies: list[float] = []
+        self.lock = threading.Lock()
+
+    def record(self, status: Optional[int] = None, nbytes: int = 0, error: bool = False,
+               elapsed: Optional[float] = None, host: str = ""):
+        if error:
+            metrics.HTTP_ERRORS.inc(stage=self.stage, host=host)
+        else:
+            metrics.HTTP_REQUESTS.inc(stage=self.stage, host=host, status=status)
+        if nbytes:
+            metrics.HTTP_BYTES.inc(nbytes, stage=self.stage, host=host)
+        if elapsed is not None:
+            metrics.HTTP_LATENCY.observe(elapsed, stage=self.stage, host=host)
+        with self.lock:
+            self.requests += 1
+            self.bytes += nbytes
+            if status is not None:
+                self.statuses[str(status)] += 1
+            if error:
+                self.errors += 1
+            if elapsed is not None:
+                self.latencies.append(elapsed)
+
+    def parsed(self, kind: str, count: int = 1):
+        """Count parsed pages for this stage's pages/sec series."""
+        metrics.PAGES_PARSED.inc(count, stage=self.stage, kind=kind)
+
+    def add_bytes(self, nbytes: int, host: str = ""):
+        metrics.HTTP_BYTES.inc(nbytes, stage=self.stage, host=host)
+        with self.lock:
+            self.bytes += nbytes
+
+    def merge(self, data: dict):
+        with self.lock:
+            self.requests += data.get("requests", 0)
+            self.bytes += data.get("bytes", 0)
+            self.errors += data.get("errors", 0)
+            self.statuses.update(data.get("statuses", {}))
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "bytes": self.bytes,
+                "errors": self.errors,
+                "statuses": dict(self.statuses),
+            }
+
+
+_default = RequestStats()
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current() -> RequestStats:
+    return _current.get() or _default
+
+
+def use(stats: RequestStats):
+    """Route counters recorded in the calling context (and tasks it spawns) to ``stats``."""
+    _current.set(stats)
+
+
+def record(status: Optional[int] = None, nbytes: int = 0, error: bool = False,
+           elapsed: Optional[float] = None, host: str = ""):
+    current().record(status, nbytes, error, elapsed, host)
+
+
+def parsed(kind: str, count: int = 1):
+    current().parsed(kind, count)
+
+
+def peak_rss_kb() -> int:
+    """High-water resident set size of this process (KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def trace_config() -> aiohttp.TraceConfig:
+    """aiohttp hooks that count every request made through the session."""
+    async def on_request_start(session, ctx, params):
+        ctx.start = asyncio.get_running_loop().time()
+        ctx.stats = current()
+        ctx.host = params.url.host or ""
+        metrics.HTTP_INFLIGHT.inc(stage=ctx.stats.stage)
+
+    async def on_request_end(session, ctx, params):
+        metrics.HTTP_INFLIGHT.dec(stage=ctx.stats.stage)
+        ctx.stats.record(params.response.status, elapsed=asyncio.get_running_loop().time() - ctx.start,
+                         host=ctx.host)
+
+    async def on_request_exception(session, ctx, params):
+        metrics.HTTP_INFLIGHT.dec(stage=ctx.stats.stage)
+        if getattr(ctx, "queued", False):
+            # Cancelled while waiting for a connection: the queued_end hook never fires
+            metrics.HTTP_QUEUED.dec(stage=ctx.stats.stage)
+        ctx.stats.record(error=True, host=ctx.host)
+
+    async def on_chunk(session, ctx, params):
+        ctx.stats.add_bytes(len(params.chunk), host=ctx.host)
+
+    async def on_queued_start(session, ctx, params):
+        ctx.queued = True
+        metrics.HTTP_QUEUED.inc(stage=ctx.stats.stage)
+
+    async def on_queued_end(session, ctx, params):
+        ctx.queued = False
+        metrics.HTTP_QUEUED.dec(stage=ctx.stats.stage)
+
+    def counter(metric: metrics.Counter, **labels):
+        async def hook(session, ctx, params):
+            metric.inc(stage=ctx.stats.stage, **labels)
+        return hook
+
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(on_request_start)
+    config.on_request_end.append(on_request_end)
+    config.on_request_exception.append(on_request_exception)
+    config.on_response_chunk_received.append(on_chunk)
+    config.on_connection_queued_start.append(on_queued_start)
+    config.on_connection_queued_end.append(on_queued_end)
+    config.on_connection_create_end.append(counter(metrics.HTTP_CONNECTIONS, kind="new"))
+    config.on_connection_reuseconn.append(counter(metrics.HTTP_CONNECTIONS, kind="reused"))
+    config.on_dns_cache_hit.append(counter(metrics.DNS_CACHE, result="hit"))
+    config.on_dns_cache_miss.append(counter(metrics.DNS_CACHE, result="miss"))
+    return config
+
+
+def emit():
+    """Print this process's counters for the pipeline runner (subprocess mode)."""
+    data = {**_default.snapshot(), "peak_rss_kb": peak_rss_kb(), "metrics": metrics.REGISTRY.dump()}
+    print(STATS_PREFIX + json.dumps(data))
+    sys.stdout.flush()
@@ -0,0 +1,174 @@
+"""
+Projected Rax for every fighter under every card tier at once.
+
+The frontend projects a fighter's yearly Rax (``calculateDailyAdjustedValue``)
+one fighter and one multiplier at a time. For each calendar day (MM-DD) it
+takes the best score the fighter ever posted on that day, times the card's
+multiplier, and sums over the days.
+
+``day_matrix()`` builds that as a fighter x day-of-year matrix of best scores
+from ``fight_history.csv``, with one ``np.maximum.at``. A multiplier scales
+every day of a fighter alike. A fighter's projection is therefore their row
+sum times the multiplier, and ``ScoringEngine.project()`` scores every fighter
+under every tier as one broadcast product. A per-fighter scenario matrix works
+the same way.
+
+``ScoringEngine.portfolio()`` values a set of cards together. A day holds at
+most ``CLAIMS_PER_DAY`` claims, so on a day where more of the cards have
+scores, only the best ones count, as in the frontend's claim conflicts.
+
+    cd python
+    python scripts/scoring.py --top 20                         # all tiers, best fighters first
+    python scripts/scoring.py --tiers Common Epic "Leg 1" --out results/tier_sensitivity.csv
+"""
+import argparse
+from pathlib import Path
+from typing import Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from fight_analytics import load_history
+
+RESULTS_DIR = Path(__file__).parent.parent / "results"
+
+# Card tiers and multipliers, as in the frontend's tier pickers
+TIERS = {
+    "Common": 1.2, "Uncommon": 1.4, "Rare": 1.6, "Epic": 2.0,
+    **{f"Leg {i + 1}": round(5.0 + 0.4 * i, 1) for i in range(5)},
+    **{f"Mystic {i + 1}": round(10.0 + 0.2 * i, 1) for i in range(10)},
+    **{f"Iconic {i + 1}": round(20.0 + 0.3 * i, 1) for i in range(20)},
+}
+DEFAULT_TIER = "Common"
+# Scores on one calendar day beyond the best three are lost
+CLAIMS_PER_DAY = 3
+# MM-DD days, Feb 29 included
+DAYS = 366
+_MONTH_STARTS = np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+
+Multiplier = Union[str, float]
+
+
+def day_of_year(dates: np.ndarray) -> np.ndarray:
+    """Index 0-365 of each date's MM-DD in a leap year (Feb 29 is 59)."""
+    days = dates.astype("datetime64[D]")
+    months = days.astype("datetime64[M]")
+    return _MONTH_STARTS[months.astype(np.int64) % 12] + (days - months).astype(np.int64)
+
+
+def day_matrix(history: pd.DataFrame) -> tuple[pd.Index, np.ndarray]:
+    """Fighter names and their fighter x ``DAYS`` matrix of best ``total_points`` per MM-DD (0: never fought then)."""
+    codes = history["fighter_name"].cat.codes.values.astype(np.int64)
+    names = pd.Index(history["fighter_name"].cat.categories, name="name")
+    matrix = np.zeros(len(names) * DAYS, dtype=np.int32)
+    np.maximum.at(matrix, codes * DAYS + day_of_year(history["date"].values), history["total_points"].values)
+    return names, matrix.reshape(len(names), DAYS)
+
+
+def multiplier(tier: Multiplier) -> float:
+    """A tier name's multiplier; numbers (or numeric strings, from query strings) pass through."""
+    if tier in TIERS:
+        return TIERS[tier]
+    try:
+        return float(tier)
+    except ValueError:
+        raise KeyError(f"Unknown tier: {tier}") from None
+
+
+class ScoringEngine:
+    """Projections over one fight history's day-of-year matrix."""
+
+    def __init__(self, history: Union[str, Path, pd.DataFrame, None] = None):
+        self.names, self.matrix = day_matrix(load_history(history))
+        self.base = self.matrix.sum(axis=1, dtype=np.int64)
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def index(self, names: Sequence[str]) -> np.ndarray:
+        """Row numbers of ``names``; KeyError naming the first unknown fighter."""
+        try:
+            return np.array([self._index[name] for name in names], dtype=np.intp)
+        except KeyError as e:
+            raise KeyError(f"Unknown fighter: {e.args[0]}") from None
+
+    def project(self, multipliers: Union[Sequence[Multiplier], np.ndarray, None] = None) -> pd.DataFrame:
+        """Projected Rax of every fighter (rows) under every multiplier (columns).
+
+        ``multipliers`` is a sequence of tier names or numbers (default: every
+        tier), or a fighters x scenarios array for per-fighter scenarios.
+        """
+        if multipliers is None:
+            multipliers = list(TIERS)
+        if isinstance(multipliers, np.ndarray) and multipliers.ndim == 2:
+            scenarios = multipliers.astype(float)
+            columns = pd.RangeIndex(scenarios.shape[1], name="scenario")
+        else:
+            scenarios = np.array([multiplier(m) for m in multipliers])[np.newaxis, :]
+            columns = pd.Index(list(multipliers), name="tier")
+        return pd.DataFrame(self.base[:, np.newaxis] * scenarios, index=self.names, columns=columns)
+
+    def assigned(self, tiers: Mapping[str, Multiplier], default: Multiplier = DEFAULT_TIER) -> np.ndarray:
+        """Multiplier per fighter: ``tiers`` for the fighters listed, ``default`` for the rest."""
+        multipliers = np.full(len(self), multiplier(default))
+        multipliers[self.index(list(tiers))] = [multiplier(t) for t in tiers.values()]
+        return multipliers
+
+    def portfolio(self, cards: Mapping[str, Multiplier]) -> dict:
+        """Projected Rax of a set of cards ({fighter: tier}) held together.
+
+        Each day keeps the ``CLAIMS_PER_DAY`` best scores among the cards; the
+        rest are reported as lost.
+        """
+        rows = self.index(list(cards))
+        scaled = self.matrix[rows] * np.array([multiplier(t) for t in cards.values()])[:, np.newaxis]
+        # Rank of each card's score within its day (0 = best), ties broken by card order
+        rank = np.argsort(np.argsort(-scaled, axis=0, kind="stable"), axis=0, kind="stable")
+        kept = np.where(rank < CLAIMS_PER_DAY, scaled, 0.0)
+        return {
+            "value": float(kept.sum()),
+            "lost": float((scaled - kept).sum()),
+            "fighters": {name: {"tier": tier, "multiplier": multiplier(tier), "value": float(value),
+                                "lost": float(lost)}
+                         for (name, tier), value, lost in zip(cards.items(), kept.sum(axis=1),
+                                                              (scaled - kept).sum(axis=1))},
+        }
+
+
+_engine: Optional[ScoringEngine] = None
+_engine_key = None
+
+
+def engine(path: Optional[Path] = None) -> ScoringEngine:
+    """A ScoringEngine over ``fight_history.csv``, rebuilt only when the file changes."""
+    global _engine, _engine_key
+    path = Path(path or RESULTS_DIR / "fight_history.csv")
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    if key != _engine_key:
+        _engine, _engine_key = ScoringEngine(path), key
+    return _engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Projected Rax per fighter under each card tier")
+    parser.add_argument("--history", default=str(RESULTS_DIR / "fight_history.csv"))
+    parser.add_argument("--tiers", nargs="+", help=f"tier names or multipliers (default: all {len(TIERS)} tiers)")
+    parser.add_argument("--top", type=int, help="only the N fighters with the highest base projection")
+    parser.add_argument("--out", help="write the table to this CSV instead of printing it")
+    args = parser.parse_args()
+
+    table = ScoringEngine(args.history).project(args.tiers)
+    table = table.iloc[np.argsort(-table.iloc[:, 0].values, kind="stable")]
+    if args.top:
+        table = table.head(args.top)
+    if args.out:
+        table.to_csv(args.out)
+        print(f"Wrote {len(table)} fighters x {table.shape[1]} tiers to {args.out}")
+    else:
+        print(table.round(1).to_string())
+
+
+if __name__ == "__main__":
+    main()
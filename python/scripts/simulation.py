@@ -0,0 +1,310 @@
+"""
+Monte Carlo distribution of next-season Rax, per fighter and for a portfolio.
+
+The projection in ``scoring.py`` is deterministic. It counts a fighter's best
+score on every MM-DD they ever fought, as if every one of those dates
+recurred. This module resamples the fight calendar instead. In each scenario,
+for each fighter:
+
+1. Draw one of their recent seasons (the ``SEASONS`` 365-day periods before
+   the reference date, only those since their debut). Its fight count is the
+   number of fights this scenario.
+2. Draw that many fights, with replacement, from the fighter's fights in
+   those seasons. Each keeps its MM-DD and points; two draws on the same day
+   count once (the better one), as in the projection.
+
+A retired fighter draws only empty seasons; one who fought once in five years
+fights in about a fifth of the scenarios. All draws are vectorized NumPy:
+one uniform array picks the seasons of every (scenario, fighter) cell, and a
+second picks the fights.
+
+``simulate_fighters()`` keeps a per-fighter histogram of season points, so
+exact percentiles cost the same memory at any scenario count.
+``simulate_portfolio()`` scores cards together, keeping the ``CLAIMS_PER_DAY``
+best claims per day. It also reports how often each card scores on one of its
+claimed days. Scenarios run in chunks of fixed-seed streams, spread over
+``processes`` worker processes, so results depend on the seed but not on the
+process count.
+
+    cd python
+    python scripts/simulation.py --scenarios 20000 --top 20
+    python scripts/simulation.py --portfolio "Jon Jones=Epic" "Islam Makhachev=Leg 1"
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from aggregate_values import reference_date as default_reference_date
+from fight_analytics import load_history
+from scoring import CLAIMS_PER_DAY, DAYS, DEFAULT_TIER, day_of_year, multiplier
+
+RESULTS_DIR = Path(__file__).parent.parent / "results"
+
+SEASON_DAYS = 365
+# Recent seasons a fighter's calendar is resampled from
+SEASONS = 5
+SCENARIOS = 10_000
+# Scenarios per random stream; also the unit of work handed to a process
+CHUNK = 1_000
+# Per-chunk budget of (scenario, card, day) cells for portfolios
+PORTFOLIO_CELLS = 4_000_000
+PERCENTILES = (5, 25, 50, 75, 95)
+PROCESSES = min(4, os.cpu_count() or 1)
+
+
+class CalendarModel:
+    """The arrays the draws index into, built once from a fight history.
+
+    Plain NumPy arrays, so the model pickles cheaply into worker processes.
+    """
+
+    def __init__(self, history: Union[str, Path, pd.DataFrame, None] = None,
+                 reference_date: Optional[str] = None, seasons: int = SEASONS):
+        history = load_history(history)
+        self.names = pd.Index(history["fighter_name"].cat.categories, name="name")
+        codes = history["fighter_name"].cat.codes.values.astype(np.int64)
+        days = history["date"].values.astype("datetime64[D]")
+        reference = np.datetime64(reference_date or date.today().isoformat(), "D")
+        self.reference_date = str(reference)
+        self.seasons = seasons
+
+        # Season 0 is the latest; fights after the reference date don't exist yet
+        season = (reference - days).astype(np.int64) // SEASON_DAYS
+        past = season >= 0
+        debut = np.full(len(self.names), -1)
+        np.maximum.at(debut, codes[past], season[past])
+        # Seasons a fighter could have fought in: since their debut, at most ``seasons``
+        self.n_seasons = np.clip(debut + 1, 1, seasons)
+        recent = past & (season < seasons)
+        self.season_counts = np.bincount(codes[recent] * seasons + season[recent],
+                                         minlength=len(self.names) * seasons).reshape(-1, seasons)
+
+        # Each fighter's recent fights, contiguous (history is sorted by fighter)
+        self.pool_points = history["total_points"].values[recent].astype(np.int64)
+        self.pool_days = day_of_year(days[recent])
+        self.pool_size = np.bincount(codes[recent], minlength=len(self.names))
+        self.pool_start = np.r_[0, np.cumsum(self.pool_size)[:-1]]
+        self.points_span = int(self.pool_points.max(initial=0)) + 1
+        # Most points a season can produce, bounding each fighter's histogram
+        best = np.zeros(len(self.names), dtype=np.int64)
+        np.maximum.at(best, codes[recent], self.pool_points)
+        self.max_points = self.season_counts.max(axis=1) * best
+
+        # MM-DDs a fighter has ever scored on: the days the projection claims
+        self.claimed = np.zeros((len(self.names), DAYS), dtype=bool)
+        self.claimed[codes[past], day_of_year(days[past])] = True
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def index(self, names) -> np.ndarray:
+        try:
+            return np.array([self._index[name] for name in names], dtype=np.intp)
+        except KeyError as e:
+            raise KeyError(f"Unknown fighter: {e.args[0]}") from None
+
+    def draw(self, rng: np.random.Generator, scenarios: int, fighters: np.ndarray):
+        """One season of fights for each (scenario, fighter) cell.
+
+        Returns the cell of every drawn fight (scenario * len(fighters) +
+        fighter position), its points and its day, each cell's fights counted
+        once per day (best points kept), and the fight count per cell.
+        """
+        k = len(fighters)
+        season = (rng.random((scenarios, k), dtype=np.float32) * self.n_seasons[fighters]).astype(np.int64)
+        fights = self.season_counts[fighters, season]
+        cell = np.repeat(np.arange(scenarios * k), fights.ravel())
+        slot = cell % k
+        pick = self.pool_start[fighters][slot] + \
+            (rng.random(len(cell), dtype=np.float32) * self.pool_size[fighters][slot]).astype(np.int64)
+        points, day = self.pool_points[pick], self.pool_days[pick]
+
+        # Same cell and day drawn twice: keep the better fight. Cells come out
+        # of np.repeat in order, so a stable sort on (cell, day, -points) packed
+        # into one int64 only reorders within cells (~6x faster than lexsort)
+        key = cell * DAYS + day
+        order = np.argsort(key * self.points_span + (self.points_span - 1 - points), kind="stable")
+        first = np.r_[True, key[order][1:] != key[order][:-1]]
+        keep = order[first]
+        return cell[keep], points[keep], day[keep], fights
+
+
+def _chunks(scenarios: int, size: int, seed: Optional[int]) -> list[tuple[int, np.random.SeedSequence]]:
+    """(scenario count, seed) per chunk; the split depends only on ``scenarios`` and ``size``."""
+    counts = [size] * (scenarios // size) + ([scenarios % size] if scenarios % size else [])
+    return list(zip(counts, np.random.SeedSequence(seed).spawn(len(counts))))
+
+
+def _fighter_histograms(model: CalendarModel, chunks) -> tuple[np.ndarray, np.ndarray]:
+    """Per-fighter histogram of season points (flat, ``_offsets`` apart) and scenarios with a fight."""
+    offsets = _offsets(model)
+    hist = np.zeros(offsets[-1], dtype=np.int64)
+    fought = np.zeros(len(model), dtype=np.int64)
+    # Fighters without a recent fight score 0 in every scenario; only draw for the rest
+    drawn = np.flatnonzero(model.pool_size > 0)
+    idle = np.flatnonzero(model.pool_size == 0)
+    for scenarios, seed in chunks:
+        cell, points, _, fights = model.draw(np.random.default_rng(seed), scenarios, drawn)
+        totals = np.bincount(cell, weights=points, minlength=scenarios * len(drawn)).astype(np.int64)
+        hist += np.bincount(np.tile(offsets[drawn], scenarios) + totals, minlength=len(hist))
+        hist[offsets[idle]] += scenarios
+        fought[drawn] += (fights > 0).sum(axis=0)
+    return hist, fought
+
+
+def _offsets(model: CalendarModel) -> np.ndarray:
+    return np.r_[0, np.cumsum(model.max_points + 1)]
+
+
+def _portfolio_values(model: CalendarModel, cards: np.ndarray, multipliers: np.ndarray, chunks):
+    """Portfolio value per scenario, plus per-card kept value, fight count and claimed-day hit sums."""
+    k = len(cards)
+    values, kept_sum = [], np.zeros(k)
+    fought, hit_rate = np.zeros(k, dtype=np.int64), np.zeros(k)
+    claimed = model.claimed[cards]
+    for scenarios, seed in chunks:
+        cell, points, day, fights = model.draw(np.random.default_rng(seed), scenarios, cards)
+        scaled = np.zeros((scenarios * k, DAYS))
+        scaled[cell, day] = points * multipliers[cell % k]
+        scaled = scaled.reshape(scenarios, k, DAYS)
+        # Rank of each card's claim within its day (0 = best), ties broken by card order
+        rank = np.argsort(np.argsort(-scaled, axis=1, kind="stable"), axis=1, kind="stable")
+        kept = np.where(rank < CLAIMS_PER_DAY, scaled, 0.0)
+        values.append(kept.sum(axis=(1, 2)))
+        kept_sum += kept.sum(axis=(0, 2))
+        fought += (fights > 0).sum(axis=0)
+        hits = np.zeros((scenarios * k, DAYS), dtype=bool)
+        hits[cell, day] = True
+        hit_rate += (hits.reshape(scenarios, k, DAYS) & claimed).sum(axis=(0, 2)) / np.maximum(claimed.sum(axis=1), 1)
+    return np.concatenate(values) if values else np.zeros(0), kept_sum, fought, hit_rate
+
+
+_MODEL: Optional[CalendarModel] = None
+
+
+def _init_worker(model: CalendarModel):
+    global _MODEL
+    _MODEL = model
+
+
+def _run_in_worker(task):
+    fn, args = task
+    return fn(_MODEL, *args)
+
+
+def _run(model: CalendarModel, fn, args, chunks, processes: int) -> list:
+    """``fn(model, *args, chunk_group)`` per group of chunks, in ``processes`` workers."""
+    processes = max(1, min(processes, len(chunks)))
+    if processes == 1:
+        return [fn(model, *args, chunks)]
+    groups = [chunks[i::processes] for i in range(processes)]
+    # spawn, not fork: the API server calls this from a thread
+    with ProcessPoolExecutor(processes, mp_context=get_context("spawn"), initializer=_init_worker,
+                             initargs=(model,)) as pool:
+        return list(pool.map(_run_in_worker, [(fn, (*args, group)) for group in groups]))
+
+
+def _percentile_columns(values) -> dict:
+    return {f"p{q}": v for q, v in zip(PERCENTILES, values)}
+
+
+def simulate_fighters(model: CalendarModel, scenarios: int = SCENARIOS, tier: Union[str, float] = DEFAULT_TIER,
+                      seed: Optional[int] = 0, processes: int = PROCESSES) -> pd.DataFrame:
+    """Per fighter: mean, percentiles and chance of fighting over ``scenarios`` simulated seasons."""
+    results = _run(model, _fighter_histograms, (), _chunks(scenarios, CHUNK, seed), processes)
+    hist = sum(r[0] for r in results)
+    fought = sum(r[1] for r in results)
+
+    offsets = _offsets(model)
+    owner = np.repeat(np.arange(len(model)), model.max_points + 1)
+    value = np.arange(len(hist)) - offsets[owner]
+    mean = np.bincount(owner, weights=hist * value, minlength=len(model)) / scenarios
+    # Inverted-CDF percentiles: the first value whose cumulative count reaches q% of the scenarios
+    cum = np.cumsum(hist)
+    before = np.r_[0, cum][offsets[:-1]]
+    percentiles = [np.searchsorted(cum, before + np.ceil(q / 100 * scenarios), side="left") - offsets[:-1]
+                   for q in PERCENTILES]
+
+    m = multiplier(tier)
+    return pd.DataFrame({
+        "mean": mean * m,
+        **_percentile_columns(p * m for p in percentiles),
+        "p_fights": fought / scenarios,
+    }, index=model.names)
+
+
+def simulate_portfolio(model: CalendarModel, cards: Mapping[str, Union[str, float]], scenarios: int = SCENARIOS,
+                       seed: Optional[int] = 0, processes: int = PROCESSES) -> dict:
+    """Distribution of a set of cards ({fighter: tier}) held together, with per-card detail."""
+    rows = model.index(list(cards))
+    multipliers = np.array([multiplier(t) for t in cards.values()])
+    chunk = max(1, min(CHUNK, PORTFOLIO_CELLS // (max(len(rows), 1) * DAYS)))
+    results = _run(model, _portfolio_values, (rows, multipliers), _chunks(scenarios, chunk, seed), processes)
+    values = np.concatenate([r[0] for r in results])
+    kept, fought, hits = (sum(r[i] for r in results) for i in (1, 2, 3))
+
+    return {
+        "scenarios": scenarios,
+        "mean": float(values.mean()) if scenarios else 0.0,
+        "percentiles": _percentile_columns(np.percentile(values, PERCENTILES, method="inverted_cdf").tolist()
+                                           if scenarios else [0.0] * len(PERCENTILES)),
+        "fighters": {
+            name: {"tier": tier, "multiplier": float(m), "mean": kept[i] / scenarios,
+                   "p_fights": fought[i] / scenarios, "claimed_days": int(model.claimed[rows[i]].sum()),
+                   "claimed_day_hit_rate": hits[i] / scenarios}
+            for i, ((name, tier), m) in enumerate(zip(cards.items(), multipliers))
+        } if scenarios else {},
+    }
+
+
+_model: Optional[CalendarModel] = None
+_model_key = None
+
+
+def model(path: Optional[Path] = None, reference_date: Optional[str] = None) -> CalendarModel:
+    """A CalendarModel over ``fight_history.csv``, rebuilt when the file or the reference date changes.
+
+    The reference date defaults to the aggregate stage's (``RAX_REFERENCE_DATE``, else today).
+    """
+    global _model, _model_key
+    path = Path(path or RESULTS_DIR / "fight_history.csv")
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size, reference_date or default_reference_date())
+    if key != _model_key:
+        _model, _model_key = CalendarModel(path, key[-1]), key
+    return _model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo next-season Rax per fighter or for a portfolio")
+    parser.add_argument("--history", default=str(RESULTS_DIR / "fight_history.csv"))
+    parser.add_argument("--reference-date", help="YYYY-MM-DD the seasons end at (default: today)")
+    parser.add_argument("--scenarios", type=int, default=SCENARIOS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=PROCESSES)
+    parser.add_argument("--tier", default=DEFAULT_TIER)
+    parser.add_argument("--top", type=int, default=25, help="fighters to print, by mean")
+    parser.add_argument("--portfolio", nargs="+", metavar="NAME=TIER", help="simulate these cards together")
+    args = parser.parse_args()
+
+    calendar = CalendarModel(args.history, args.reference_date)
+    if args.portfolio:
+        cards = dict(card.rsplit("=", 1) for card in args.portfolio)
+        result = simulate_portfolio(calendar, cards, args.scenarios, args.seed, args.processes)
+        print(pd.Series(result["percentiles"]).round(1).to_string())
+        print(pd.DataFrame(result["fighters"]).T.to_string())
+    else:
+        table = simulate_fighters(calendar, args.scenarios, args.tier, args.seed, args.processes)
+        print(table.sort_values("mean", ascending=False).head(args.top).round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
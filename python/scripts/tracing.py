@@ -0,0 +1,319 @@
+"""
+Per-request tracing spans and an optional sampling profiler.
+
+With a ``Tracer`` installed (``use()`` for in-process stages, or
+``RAX_TRACE_FILE`` for a script run on its own), every request made through an
+``http_client`` session records a span split into phases:
+
+    queue    waiting for a free pooled connection
+    dns      host resolution (DNS cache misses only)
+    connect  TCP + TLS handshake of a new connection
+    ttfb     request sent -> response headers received
+    body     response headers -> last body chunk read
+
+Scripts wrap their own hot spots in ``span("parse")`` and similar. Each
+asyncio task gets its own track, so the Chrome trace (chrome://tracing or
+Perfetto) shows one row per concurrent fetch with its phases nested under
+it. With no tracer installed every hook returns straight away.
+
+``Sampler`` samples the event loop thread's Python stack at a fixed interval
+and writes folded stacks for speedscope or flamegraph.pl.
+
+Any stage script can run under both with
+
+    RAX_TRACE_FILE=t.json RAX_PROFILE_FILE=p.folded python tracing.py get_fighter_values.py
+"""
+import asyncio
+import atexit
+import functools
+import os
+import runpy
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+import aiohttp
+
+import fast_json
+
+TRACE_ENV = "RAX_TRACE_FILE"
+PROFILE_ENV = "RAX_PROFILE_FILE"
+SAMPLE_INTERVAL = 0.005      # seconds between profiler samples
+
+
+class Tracer:
+    """Collects complete ("X") Chrome trace events for one stage or script run."""
+
+    def __init__(self, name: str = "rax"):
+        self.name = name
+        self.epoch = time.time()
+        self.origin = time.perf_counter()
+        self.events: list[dict] = []
+        self.tracks: dict[int, int] = {}
+        self.lock = threading.Lock()
+
+    def track(self) -> int:
+        """Small stable id for the calling task (or thread outside a loop)."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else threading.get_ident()
+        with self.lock:
+            return self.tracks.setdefault(key, len(self.tracks) + 1)
+
+    def add(self, name: str, cat: str, start: float, end: float, track: int, args: Optional[dict] = None) -> dict:
+        event = {"name": name, "cat": cat, "ph": "X", "ts": round((start - self.origin) * 1e6, 1),
+                 "dur": round((end - start) * 1e6, 1), "tid": track, "args": args or {}}
+        with self.lock:
+            self.events.append(event)
+        return event
+
+    def chrome_trace(self) -> dict:
+        with self.lock:
+            events = list(self.events)
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"name": self.name, "epoch": self.epoch}}
+
+    def write(self, path: Union[str, Path]):
+        fast_json.dump(self.chrome_trace(), path)
+
+
+_default: Optional[Tracer] = None
+_current: ContextVar[Optional[Tracer]] = ContextVar("tracer", default=None)
+
+
+def current() -> Optional[Tracer]:
+    return _current.get() or _default
+
+
+def use(tracer: Optional[Tracer]):
+    """Route spans recorded in the calling context (and tasks it spawns) to ``tracer``."""
+    _current.set(tracer)
+
+
+@contextmanager
+def span(name: str, cat: str = "app", **args):
+    """Time the enclosed block as a span on the current task's track."""
+    tracer = current()
+    if tracer is None:
+        yield
+        return
+    track = tracer.track()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.add(name, cat, start, time.perf_counter(), track, args)
+
+
+def traced(name: str, cat: str = "app"):
+    """Decorator form of ``span`` for plain and ``async`` functions."""
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with span(name, cat):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with span(name, cat):
+                    return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def trace_config() -> aiohttp.TraceConfig:
+    """aiohttp hooks that break each request into queue/dns/connect/ttfb/body spans."""
+    def phase(name: str, edge: str):
+        async def hook(session, ctx, params):
+            if getattr(ctx, "trace", None) is not None:
+                ctx.trace["marks"][f"{name}_{edge}"] = time.perf_counter()
+        return hook
+
+    async def on_request_start(session, ctx, params):
+        tracer = current()
+        ctx.trace = None if tracer is None else {
+            "tracer": tracer, "track": tracer.track(), "start": time.perf_counter(), "marks": {},
+            "args": {"method": params.method, "url": str(params.url)},
+        }
+
+    async def on_request_end(session, ctx, params):
+        trace = ctx.trace
+        if trace is None:
+            return
+        now = time.perf_counter()
+        tracer, track, marks = trace["tracer"], trace["track"], trace["marks"]
+        trace["args"]["status"] = params.response.status
+        trace["args"]["bytes"] = 0
+        trace["request"] = tracer.add("request", "http", trace["start"], now, track, trace["args"])
+        for name in ("queue", "dns", "connect"):
+            if f"{name}_end" in marks:
+                tracer.add(name, "http", marks[f"{name}_start"], marks[f"{name}_end"], track)
+        tracer.add("ttfb", "http", marks.get("sent", trace["start"]), now, track)
+        # Body reads happen after this hook; the chunk hook stretches both spans
+        trace["body_start"] = now
+        trace["body"] = tracer.add("body", "http", now, now, track)
+
+    async def on_chunk(session, ctx, params):
+        trace = getattr(ctx, "trace", None)
+        if trace is None or "body" not in trace:
+            return
+        now = time.perf_counter()
+        trace["body"]["dur"] = round((now - trace["body_start"]) * 1e6, 1)
+        trace["request"]["dur"] = round((now - trace["start"]) * 1e6, 1)
+        trace["request"]["args"]["bytes"] += len(params.chunk)
+
+    async def on_headers_sent(session, ctx, params):
+        if getattr(ctx, "trace", None) is not None:
+            ctx.trace["marks"]["sent"] = time.perf_counter()
+
+    async def on_request_exception(session, ctx, params):
+        trace = getattr(ctx, "trace", None)
+        if trace is not None and "request" not in trace:
+            trace["tracer"].add("request", "http", trace["start"], time.perf_counter(), trace["track"],
+                                {**trace["args"], "error": type(params.exception).__name__})
+
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(on_request_start)
+    config.on_connection_queued_start.append(phase("queue", "start"))
+    config.on_connection_queued_end.append(phase("queue", "end"))
+    config.on_dns_resolvehost_start.append(phase("dns", "start"))
+    config.on_dns_resolvehost_end.append(phase("dns", "end"))
+    config.on_connection_create_start.append(phase("connect", "start"))
+    config.on_connection_create_end.append(phase("connect", "end"))
+    config.on_request_headers_sent.append(on_headers_sent)
+    config.on_request_end.append(on_request_end)
+    config.on_response_chunk_received.append(on_chunk)
+    config.on_request_exception.append(on_request_exception)
+    return config
+
+
+def summarize(events: Iterable[dict]) -> dict[str, dict]:
+    """Count, total and percentile durations per span name."""
+    durations: dict[str, list[float]] = {}
+    for event in events:
+        if event.get("ph") == "X":
+            durations.setdefault(event["name"], []).append(event["dur"] / 1e3)
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        summary[name] = {
+            "count": len(values),
+            "total_s": round(sum(values) / 1e3, 3),
+            "p50_ms": round(statistics.median(values), 2),
+            "p99_ms": round(values[min(len(values) - 1, int(len(values) * 0.99))], 2),
+        }
+    return dict(sorted(summary.items(), key=lambda item: -item[1]["total_s"]))
+
+
+def merge_traces(traces: Iterable[dict]) -> dict:
+    """Combine per-stage traces into one timeline, one Chrome "process" per stage."""
+    traces = list(traces)
+    if not traces:
+        return {"traceEvents": [], "displayTimeUnit": "ms"}
+    epoch = min(t.get("otherData", {}).get("epoch", 0) for t in traces)
+    events = []
+    for pid, trace in enumerate(traces, start=1):
+        other = trace.get("otherData", {})
+        shift = (other.get("epoch", epoch) - epoch) * 1e6
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": other.get("name", str(pid))}})
+        events += [{**event, "pid": pid, "ts": round(event["ts"] + shift, 1)} for event in trace["traceEvents"]]
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"epoch": epoch}}
+
+
+class Sampler:
+    """Sampling profiler for one thread (the event loop's by default).
+
+    A daemon thread reads the target thread's frame every ``interval``
+    seconds and counts whole stacks. The GIL is only held for the stack
+    walk, so at the default interval the overhead stays around 1%.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "Sampler":
+        self.thread_id = self.thread_id or threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="rax-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, n: int = 10) -> list[tuple[str, float]]:
+        """Functions with the most samples at the top of the stack, as a share of all samples."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [(name, count / self.samples) for name, count in leaves.most_common(n)] if self.samples else []
+
+    def write(self, path: Union[str, Path]):
+        Path(path).write_text(self.folded())
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Sampler":
+        """Read back stacks written by ``write()`` (for ``top()`` on a subprocess profile)."""
+        sampler = cls()
+        for line in Path(path).read_text().splitlines():
+            stack, _, count = line.rpartition(" ")
+            sampler.stacks[stack] += int(count)
+            sampler.samples += int(count)
+        return sampler
+
+
+def _install_from_env():
+    """Subprocess stages: the runner asks for a trace/profile through the environment."""
+    global _default
+    trace_file, profile_file = os.environ.get(TRACE_ENV), os.environ.get(PROFILE_ENV)
+    if trace_file:
+        _default = Tracer(Path(sys.argv[0]).stem or "rax")
+        atexit.register(lambda: _default.write(trace_file))
+    if profile_file:
+        sampler = Sampler().start()
+
+        def write_profile():
+            sampler.stop()
+            sampler.write(profile_file)
+        atexit.register(write_profile)
+
+
+if __name__ == "__main__":
+    # Launcher: install from the environment, then run the target script as __main__
+    sys.argv = sys.argv[1:]
+    import tracing  # noqa: F401  (the importable copy is the one scripts record into)
+    runpy.run_path(sys.argv[0], run_name="__main__")
+else:
+    _install_from_env()
@@ -1,10 +1,9 @@
 import asyncio
-import aiohttp
 import json
-import zlib
 import os
 from tqdm import tqdm
 from config import HEADERS
+from http_client import create_session
 
 # Script to update pass distribution for fighters
 # Handles retries for 429 errors and skips 401 errors
@@ -34,15 +33,9 @@ async def get_fighter_passes(session, fighter_id, retry_count=0):
         url = f'https://web.realsports.io/userpasses/ufc/type/team/entity/{fighter_id}/leaderboard?before={current_before}&season=2023&sort=boostvalue'
         
         try:
-            async with session.get(url, headers=HEADERS) as response:
+            async with session.get(url) as response:
                 if response.status == 200:
-                    content = await response.read()
-                    if 'gzip' in response.headers.get('Content-Encoding', ''):
-                        data = zlib.decompress(content, 16+zlib.MAX_WBITS)
-                    elif 'deflate' in response.headers.get('Content-Encoding', ''):
-                        data = zlib.decompress(content)
-                    else:
-                        data = content
+                    data = await response.read()
                     
                     json_data = json.loads(data)
                     found_level_2 = False
@@ -97,7 +90,7 @@ async def get_fighter_age(session, fighter_id):
     url = f'https://web.realsports.io/teams/{fighter_id}/sport/ufc'
     
     try:
-        async with session.get(url, headers=HEADERS) as response:
+        async with session.get(url) as response:
             if response.status == 200:
                 data = await response.json()
                 details = data.get('team', {}).get('additionalInfo', {}).get('details', [])
@@ -170,7 +163,7 @@ async def main():
     batch_size = 5  # Smaller batch size to avoid rate limits
     failed_fighters = []
     
-    async with aiohttp.ClientSession() as session:
+    async with create_session(HEADERS) as session:
         with tqdm(total=len(fighters_items)) as pbar:
             for i in range(0, len(fighters_items), batch_size):
                 batch = fighters_items[i:i + batch_size]
@@ -0,0 +1,36 @@
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+PYTHON_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PYTHON_DIR))
+sys.path.insert(0, str(PYTHON_DIR / "scripts"))
+
+from bench.mock_server import MockServerProcess
+
+import data_store
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+GOLDEN_DIR = Path(__file__).parent / "golden"
+
+try:
+    import config  # noqa: F401
+except ImportError:
+    # The real token file is local-only; the mock server ignores headers
+    sys.modules["config"] = types.SimpleNamespace(HEADERS={})
+
+
+@pytest.fixture(scope="session")
+def mock_base_url():
+    """Base URL of a mock ufcstats/Real Sports server replaying the frozen corpus."""
+    with MockServerProcess(CORPUS_DIR) as base_url:
+        yield base_url
+
+
+@pytest.fixture(autouse=True)
+def scratch_data_store(tmp_path, monkeypatch):
+    """Keep stage writes out of the real results/rax.db."""
+    monkeypatch.setattr(data_store, "DB_FILE", tmp_path / "rax.db")
+    return tmp_path / "rax.db"
@@ -0,0 +1,96 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+import cancellation
+import process_matches_fast
+from bench.corpus import UFCSTATS_BASE
+from conftest import CORPUS_DIR
+from journal import Journal
+
+
+def test_gather_drains_then_cancels_after_a_stop():
+    async def scenario():
+        stop = cancellation.StopRequest()
+        cancellation.use(stop)
+        asyncio.get_running_loop().call_later(0.05, stop.set)
+        finished = []
+
+        async def request(seconds):
+            await asyncio.sleep(seconds)
+            finished.append(seconds)
+
+        with pytest.raises(cancellation.Cancelled, match="cancelled 1 of 3"):
+            await cancellation.gather(request(0.1), request(0.15), request(30), drain=0.3)
+        return finished, stop.elapsed()
+
+    finished, elapsed = asyncio.run(scenario())
+    # The in-flight requests that fit in the drain finished; the slow one didn't hold it up
+    assert finished == [0.1, 0.15] and elapsed < 1
+
+
+def test_gather_cancels_its_tasks_with_the_caller():
+    async def scenario():
+        started, cleaned_up = asyncio.Event(), []
+
+        async def request(seconds):
+            started.set()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                cleaned_up.append(seconds)
+            return seconds
+
+        async def cancelled_child():
+            raise asyncio.CancelledError
+
+        # A child cancelled on its own is one result among the others
+        results = await cancellation.gather(request(0), cancelled_child(), drain=0)
+        assert results[0] == 0 and isinstance(results[1], asyncio.CancelledError)
+
+        cleaned_up.clear()
+        started.clear()
+        outer = asyncio.ensure_future(cancellation.gather(request(30), request(60)))
+        await started.wait()
+        outer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await outer
+        # No orphans: both children were cancelled and finished before the caller saw it
+        assert sorted(cleaned_up) == [30, 60]
+        assert len(asyncio.all_tasks()) == 1
+
+    asyncio.run(scenario())
+
+
+def test_stopped_fight_processing_resumes_from_its_journal(tmp_path, monkeypatch, mock_base_url):
+    monkeypatch.setattr(process_matches_fast, "BATCH_SIZE", 10)
+    fights = pd.read_csv(CORPUS_DIR / "fights.csv")
+    fights["fight_url"] = fights["fight_url"].str.replace(UFCSTATS_BASE, mock_base_url, regex=False)
+    fighters = pd.read_csv(CORPUS_DIR / "fighters.csv")
+    journal = Journal(tmp_path / process_matches_fast.JOURNAL_NAME)
+
+    async def process(journal, stop_after_batches=None):
+        stop = cancellation.StopRequest()
+        cancellation.use(stop)
+        batches = 0
+
+        def progress(percent):
+            nonlocal batches
+            batches += 1
+            if batches == stop_after_batches:
+                stop.set()
+
+        processor = process_matches_fast.AsyncFightProcessor(fights, fighters, progress=progress)
+        await processor.process_all_fights(journal)
+        return processor, batches
+
+    with pytest.raises(cancellation.Cancelled):
+        asyncio.run(process(journal, stop_after_batches=2))
+    assert len(journal.replay()) == 20
+
+    resumed, batches = asyncio.run(process(journal))
+    assert batches == 2  # only the 20 fights the stopped run never reached
+    full, _ = asyncio.run(process(None))
+    key = lambda fact: fact.index
+    assert sorted(resumed.fight_facts, key=key) == sorted(full.fight_facts, key=key)
@@ -0,0 +1,125 @@
+import json
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import data_store
+from data_store import DataStore
+
+VALUES = pd.DataFrame([
+    {"name": "A", "KO/TKO": 100, "Submission": 0, "Decision - Unanimous": 0, "Decision - Majority": 0,
+     "Decision - Split": 0, "StrikeBonus": 5, "5roundBonus": 0, "Value": 105},
+    {"name": "B", "KO/TKO": 0, "Submission": 90, "Decision - Unanimous": 0, "Decision - Majority": 0,
+     "Decision - Split": 0, "StrikeBonus": 0, "5roundBonus": 25, "Value": 115},
+    {"name": None, "KO/TKO": 25, "Submission": 0, "Decision - Unanimous": 0, "Decision - Majority": 0,
+     "Decision - Split": 0, "StrikeBonus": 0, "5roundBonus": 0, "Value": 25},
+])
+
+
+def test_upserts_only_touch_changed_rows(scratch_data_store):
+    store = DataStore()
+
+    assert store.write_fighter_values(VALUES) == 2  # the nameless row is skipped
+    assert store.write_fighter_values(VALUES) == 0
+
+    changed = VALUES.iloc[:1].copy()
+    changed.loc[0, "Value"] = 110
+    assert store.write_fighter_values(changed) == 2  # A updated, B pruned
+
+
+def test_exports_match_legacy_layout(tmp_path):
+    store = DataStore(tmp_path / "store.db")
+    store.write_fighter_values(VALUES)
+    fighters = {"A": {"id": 7, "value": "12", "age": 30, "pass_distribution": {7: 1, 3: 2}},
+                "B": {"id": 8, "value": "3"}}
+    store.write_ownership(fighters)
+    store.export(tmp_path / "out", ["final_values", "new_final", "fighters_values"])
+
+    final = pd.read_csv(tmp_path / "out/results/final_values.csv")
+    assert list(final.columns) == list(VALUES.columns)
+    assert list(final["name"]) == ["A", "B"]  # as written, not re-sorted
+    assert "Value" not in pd.read_csv(tmp_path / "out/results/new_final.csv").columns
+    assert json.loads((tmp_path / "public/data/fighters_values.json").read_text()) == \
+        json.loads(json.dumps(fighters))
+
+
+def test_ownership_snapshots_store_deltas_and_reconstruct(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_store, "KEYFRAME_INTERVAL", 3)
+    store = DataStore(tmp_path / "store.db")
+    runs = [
+        {"A": {"id": 1, "value": "10", "pass_distribution": {7: 1, 3: 0}}, "B": {"id": 2, "value": "5"}},
+        {"A": {"id": 1, "value": "12", "pass_distribution": {7: 1, 3: 0}}, "B": {"id": 2, "value": "5"}},
+        {"A": {"id": 1, "value": "12", "pass_distribution": {7: 2, 3: 0}}},
+        {"A": {"id": 1, "value": "12", "pass_distribution": {7: 2, 3: 0}}, "B": {"id": 2, "value": "6", "age": 30}},
+        {"A": {"id": 1, "value": "15", "pass_distribution": {7: 2, 3: 1}}, "B": {"id": 2, "value": "6", "age": 30}},
+    ]
+    for day, fighters in enumerate(runs, start=1):
+        store.snapshot_ownership(fighters, taken_at=f"2025-01-0{day}T00:00:00")
+
+    with store._connect() as conn:
+        deltas = dict(conn.execute(
+            "SELECT snapshot_id, COUNT(*) FROM ownership_deltas GROUP BY snapshot_id").fetchall())
+    assert deltas == {1: 2, 2: 1, 3: 2, 4: 2, 5: 1}  # keyframes at 1 and 4, unchanged fighters omitted
+
+    expected = json.loads(json.dumps(runs))
+    for day in range(1, 6):
+        assert store.ownership_at(f"2025-01-0{day}T12:00:00") == expected[day - 1]
+    assert store.ownership_at("2024-12-31") == {}
+    # A bare date covers the whole day, including the snapshot taken at its midnight
+    assert store.ownership_at("2025-01-03") == expected[2]
+    assert store.ownership_at("2025-01-03T00:00:00") == expected[2]
+    assert store.ownership_at("2025-01-02T23:59:59") == expected[1]
+
+    assert [(e["taken_at"][:10], e.get("value"), e.get("removed")) for e in store.ownership_series("B")] == [
+        ("2025-01-01", "5", None), ("2025-01-03", None, True), ("2025-01-04", "6", None)]
+    assert [e["pass_distribution"]["7"] for e in store.ownership_series("A")] == [1, 1, 2, 2]
+
+
+def test_fight_results_follow_the_latest_history(tmp_path):
+    path = tmp_path / "store.db"
+    with sqlite3.connect(path) as conn:  # a database from before row positions were stored
+        conn.execute("CREATE TABLE fight_results (fight_url TEXT NOT NULL, fighter_name TEXT NOT NULL, date TEXT, "
+                     "opponent TEXT, method TEXT, method_points INTEGER, strike_bonus INTEGER, "
+                     "round_bonus INTEGER, total_points INTEGER, PRIMARY KEY (fight_url, fighter_name))")
+    store = DataStore(path)
+    facts = [{"fight_url": url, "event_url": "e", "date": day, "winner": "A", "loser": "B", "method": "KO/TKO",
+              "rounds": 3, "is_draw": 0, "striker": "A", "strike_diff": 4}
+             for url, day in (("f1", "2024-01-01"), ("f2", "2025-06-01"))]
+    store.write_fight_urls(["f3"])  # known, not parsed yet
+    digest = store.digest("fight_facts")
+    store.write_fight_facts(facts)
+    assert store.digest("fight_facts") != digest
+    # The stage manifest's fingerprint of the view ignores the rest of the database
+    digest = store.digest("fight_facts")
+    store.write_fight_urls(["f4"])
+    store.write_ownership({"A": {"id": 1, "value": "3"}})
+    assert store.digest("fight_facts") == digest
+    assert list(store.fight_facts(before="2025-01-01")) == ["f1"]
+    assert store.fight_facts()["f2"] == {k: v for k, v in facts[1].items() if k != "fight_url"}
+
+    history = pd.DataFrame([
+        {"fight_url": url, "fighter_name": name, "date": "2024-01-01", "opponent": "X", "method": "KO/TKO",
+         "method_points": 100, "strike_bonus": 0, "round_bonus": 0, "total_points": 100}
+        for url, name in (("f2", "B"), ("f1", "A"), ("f2", "A"))])
+    store.write_fight_results(history)
+    # f1 dropped out upstream: its result goes, and the rest keep the order they were written in
+    assert store.write_fight_results(history.iloc[[0, 2]]) == 2
+    store.export(tmp_path / "out", ["fight_history", "new_final"])
+    assert pd.read_csv(tmp_path / "out/results/fight_history.csv")["fighter_name"].tolist() == ["B", "A"]
+    assert pd.read_csv(tmp_path / "out/results/new_final.csv")[["name", "KO/TKO"]].values.tolist() == \
+        [["B", 100], ["A", 100]]
+
+
+def test_connections_are_closed(tmp_path, monkeypatch):
+    opened = []
+    connect = sqlite3.connect
+    monkeypatch.setattr(sqlite3, "connect", lambda *args, **kwargs: opened.append(connect(*args, **kwargs)) or opened[-1])
+
+    store = DataStore(tmp_path / "store.db")
+    store.write_fighter_values(VALUES)
+    store.export(tmp_path / "out", ["final_values"])
+    assert opened
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+import fast_json
+from conftest import CORPUS_DIR
+
+EDGE_CASES = [
+    b'{}',
+    b'{"items": null, "feedItems": null}',
+    b'{"items": [], "feedItems": [{}, {"boostInfo": null}, {"boostInfo": {}}, {"boostInfo": {"level": 3}}]}',
+]
+
+
+@pytest.fixture(params=fast_json.BACKENDS)
+def backend(request, monkeypatch):
+    monkeypatch.setattr(fast_json, "BACKEND", request.param)
+    return request.param
+
+
+def test_typed_decoders_match_stdlib(backend):
+    pages = sorted((CORPUS_DIR / "realsports").glob("*/*.json")) + \
+        sorted((CORPUS_DIR / "realsports/leaderboard").glob("*/*.json"))
+    for body in [p.read_bytes() for p in pages] + EDGE_CASES:
+        doc = json.loads(body)
+        assert fast_json.decode_hotseason(body) == [
+            (item["entity"]["name"], item["value"], item["id"]) for item in doc.get("items") or []]
+        assert fast_json.decode_pass_levels(body) == [
+            item["boostInfo"]["level"] for item in doc.get("feedItems") or []
+            if (item.get("boostInfo") or {}).get("level") is not None]
+
+
+def test_dumps_round_trips_and_pretty_matches_stdlib(backend):
+    doc = {"B": {"id": 2, "value": "10", "pass_distribution": {7: 0, 3: 1}}, "A": {"id": 1, "value": "5"}}
+    as_stdlib = json.loads(json.dumps(doc))
+
+    assert fast_json.loads(fast_json.dumps(doc)) == as_stdlib
+    assert fast_json.dumps(doc, pretty=True) == json.dumps(doc, indent=4, sort_keys=True).encode()
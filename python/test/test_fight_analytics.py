@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from bench.analytics_bench import baseline_features
+from conftest import GOLDEN_DIR
+from fight_analytics import activity, fighter_features, load_history, points_per_year
+from process_matches_fast import LOSS_POINTS
+
+
+def row(fighter, date, won, method="KO/TKO", points=100):
+    method_points = points if won else LOSS_POINTS
+    return {"fighter_name": fighter, "date": date, "opponent": "X", "method": method,
+            "method_points": method_points, "strike_bonus": 0, "round_bonus": 0, "total_points": method_points}
+
+
+def test_features_follow_date_order_not_row_order():
+    history = load_history(pd.DataFrame([
+        row("A", "2022-01-01", False),
+        row("A", "2020-01-01", True, "Submission", 90),
+        row("B", "2019-06-01", True, "Decision - Split", 70),
+        row("A", "2021-01-01", True, "Decision - Unanimous", 80),
+        row("A", "2023-01-01", False),
+        row("A", "2019-01-01", True),
+        row(None, "2019-01-01", True),
+    ]))
+    features = fighter_features(history, reference_date="2024-01-01", form_window=3).set_index("name")
+
+    a = features.loc["A"]
+    assert (a.fights, a.wins, a.losses, a.finishes) == (5, 3, 2, 2)
+    assert a.current_streak == -2 and a.longest_win_streak == 3
+    assert a.form_points == (80 + 2 * LOSS_POINTS) / 3 and a.form_wins == 1
+    assert a.days_since_last_fight == 365 and a.mean_days_between_fights == (365 * 4 + 1) / 4
+    b = features.loc["B"]
+    assert (b.fights, b.current_streak, b.finish_rate) == (1, 1, 0.0) and np.isnan(b.mean_days_between_fights)
+
+    yearly = points_per_year(history)
+    assert yearly.loc["A", 2019] == 100 and yearly.loc["A", 2022] == LOSS_POINTS and yearly.loc["B", 2021] == 0
+    assert yearly.values.sum() == history["total_points"].sum()
+
+
+def test_matches_groupby_apply_on_golden_history():
+    path = GOLDEN_DIR / "fight_history.csv"
+    features = fighter_features(load_history(path))
+    expected = baseline_features(path)
+
+    columns = [c for c in expected.columns if c not in ("name", "last_fight")]
+    actual, expected = (frame.set_index("name")[columns].sort_index().astype(float) for frame in (features, expected))
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_activity_counts_the_window_before_the_reference_date():
+    history = load_history(pd.DataFrame([
+        row("A", "2021-06-01", True),
+        row("A", "2022-01-02", True),
+        row("A", "2023-06-01", False),
+        row("A", "2024-06-01", True),
+        row("B", "2021-12-31", True),
+        row("C", "2025-01-01", True),
+    ]))
+    status = activity(history, "2024-01-01").set_index("name")
+
+    # The window is the 24 months after 2022-01-01; A's 2024 fight is still ahead
+    assert status.loc["A", "last_fight_date"] == pd.Timestamp("2023-06-01")
+    assert status.loc["A", "fights_last_24m"] == 2 and status.loc["A", "active"]
+    assert status.loc["B", "fights_last_24m"] == 0 and not status.loc["B", "active"]
+    assert pd.isna(status.loc["C", "last_fight_date"]) and not status.loc["C", "active"]
+
+    # Without a reference date, the latest fight (2025-01-01) is the reference
+    latest = activity(history).set_index("name")
+    assert latest["fights_last_24m"].to_dict() == {"A": 2, "B": 0, "C": 1}
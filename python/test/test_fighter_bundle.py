@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import fighter_bundle
+from conftest import GOLDEN_DIR
+
+FIGHTERS_VALUES = {
+    "Bruno Johnson Jr.": {"id": 7, "value": "120", "age": 31,
+                          "pass_distribution": {"3": 5, "4": 4, "5": 3, "6": 2, "7": 1}},
+    "Gabe Volkov": {"id": 8, "value": "3"},
+}
+IDENTITIES = {"Bruno Johnson": {"realsports_name": "Bruno Johnson Jr.", "realsports_id": 7}}
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    values = pd.read_csv(GOLDEN_DIR / "final_values.csv")
+    sections = fighter_bundle.build(GOLDEN_DIR / "fight_history.csv", values, FIGHTERS_VALUES, IDENTITIES)
+    fighter_bundle.write(sections, tmp_path / fighter_bundle.BUNDLE_FILE)
+    return fighter_bundle.load(tmp_path / fighter_bundle.BUNDLE_FILE)
+
+
+def test_bundle_round_trips_the_joined_history(bundle):
+    history = pd.read_csv(GOLDEN_DIR / "fight_history.csv")
+    assert isinstance(bundle.fights.base, np.memmap)
+    assert len(bundle.fights) == len(history) and len(bundle) == history["fighter_name"].nunique()
+
+    # Every fighter's slice holds their fights in date order
+    for name, group in history.groupby("fighter_name"):
+        fights = bundle.fights_of(bundle.index(name))
+        expected = group.sort_values("date", kind="mergesort")
+        assert fights["total_points"].tolist() == expected["total_points"].tolist()
+        assert [bundle.name(i) for i in fights["opponent"]] == expected["opponent"].tolist()
+        assert [bundle.methods[m] for m in fights["method"]] == expected["method"].tolist()
+        assert fights["day"].astype("datetime64[D]").astype(str).tolist() == expected["date"].tolist()
+
+    # Real Sports data joins through the identity map; unknown fields stay MISSING
+    johnson = bundle.fighter("Bruno Johnson")
+    assert (johnson["realsports_id"], johnson["owned_passes"], johnson["age"]) == (7, 120, 31)
+    assert johnson["pass_distribution"] == {"7": 1, "6": 2, "5": 3, "4": 4, "3": 5}
+    assert johnson["value"] == 603 and johnson["active"]
+    volkov = bundle.fighter("Gabe Volkov")
+    assert volkov["age"] is None and volkov["pass_distribution"]["7"] == 0
+    assert bundle.fighter("Bruno Walker")["realsports_id"] is None
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "final_values.csv"
+    path.write_bytes((GOLDEN_DIR / "final_values.csv").read_bytes())
+    with pytest.raises(ValueError, match="not a version 1 fighter bundle"):
+        fighter_bundle.load(path)
+
+
+def test_build_skips_nameless_values_and_keeps_fights_without_a_method(tmp_path):
+    history = pd.DataFrame([
+        {"fighter_name": name, "date": "2020-01-01", "opponent": opponent, "method": method,
+         "method_points": 100, "strike_bonus": 0, "round_bonus": 0, "total_points": 100}
+        for name, opponent, method in (("A", "Z", "KO/TKO"), ("Z", "A", None))])
+    # The nameless row comes after Z's own, so it would overwrite the last fighter's value
+    values = pd.DataFrame({"name": ["A", "Z", None], "Value": [100, 200, 575], "active": [True, True, False]})
+    fighter_bundle.write(fighter_bundle.build(history, values, {}, {}), tmp_path / "b.bundle")
+    bundle = fighter_bundle.load(tmp_path / "b.bundle")
+
+    z = bundle.fighter("Z")
+    assert (z["value"], z["active"]) == (200, True)
+    assert z["fights"][0]["method"] is None and bundle.fighter("A")["fights"][0]["method"] == "KO/TKO"
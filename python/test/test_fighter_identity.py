@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+
+from data_store import DataStore
+from fighter_identity import IdentityIndex, build, normalize_name
+
+ROSTER = pd.DataFrame([
+    ("Jan", "Błachowicz", "http://ufcstats.com/fighter-details/1"),
+    ("Ian", "Machado Garry", "http://ufcstats.com/fighter-details/2"),
+    ("Bruno", "Silva", "http://ufcstats.com/fighter-details/3"),
+    ("Bruno", "Silva", "http://ufcstats.com/fighter-details/4"),
+    ("Dong Hun", "Choi", "http://ufcstats.com/fighter-details/5"),
+    ("Khamzat", "Chimaev", "http://ufcstats.com/fighter-details/6"),
+], columns=["fighter_f_name", "fighter_l_name", "fighter_url"])
+
+FIGHTERS_VALUES = {
+    "Jan Blachowicz": {"id": 10},
+    "Ian Garry": {"id": 11},
+    "Bruno Silva": {"id": 12},
+    "DongHun Choi": {"id": 13},
+    "Khamzat Chimaevv": {"id": 14},
+    "Somebody Else": {"id": 15},
+}
+
+
+@pytest.mark.parametrize("raw, key", [
+    ("Jan Błachowicz", "jan blachowicz"),
+    ("Jon 'Bones' Jones", "jon bones jones"),
+    ('Jon "Bones" Jones', "jon jones"),
+    ("Allen Frye Jr.", "allen frye"),
+    ("Waldo Cortes-Acosta", "waldo cortes acosta"),
+    ("Sean O'Malley", "sean omalley"),
+    ("  José   Aldo ", "jose aldo"),
+])
+def test_normalize_name(raw, key):
+    assert normalize_name(raw) == key
+
+
+def test_build_links_by_key_tiers_and_refuses_ambiguous_names(tmp_path):
+    store = DataStore(tmp_path / "store.db")
+    display = ["Jan Blachowicz", "Ian Machado Garry", "Bruno Silva", "Dong Hun Choi", "Khamzat Chimaev"]
+
+    index, joins = build(ROSTER, display, FIGHTERS_VALUES, IdentityIndex(store))
+    index.save()
+
+    assert {name: (j["realsports_name"], j["match"]) for name, j in joins.items()} == {
+        # The fight-page spelling resolved by key, then Real Sports matched it exactly
+        "Jan Blachowicz": ("Jan Blachowicz", "exact"),
+        "Ian Machado Garry": ("Ian Garry", "first_last"),
+        # Two roster fighters share the name: no identity link, the exact join still applies
+        "Bruno Silva": ("Bruno Silva", "exact"),
+        "Dong Hun Choi": ("DongHun Choi", "compact"),
+        "Khamzat Chimaev": ("Khamzat Chimaevv", "fuzzy"),
+    }
+    assert joins["Ian Machado Garry"]["ufcstats_url"] == "http://ufcstats.com/fighter-details/2"
+
+    # Persisted: a fresh index resolves everything from stored ids with nothing new to write
+    reloaded = IdentityIndex(store)
+    again, rejoined = build(ROSTER, display, FIGHTERS_VALUES, reloaded)
+    assert rejoined == joins
+    assert not again._new_aliases and not again._dirty
+
+
+def test_build_skips_saved_aliases_missing_from_the_feed(tmp_path):
+    store = DataStore(tmp_path / "store.db")
+    roster = ROSTER.iloc[:2]
+    display = ["Jan Blachowicz", "Ian Machado Garry"]
+    index, _ = build(roster, display, FIGHTERS_VALUES, IdentityIndex(store))
+    index.save()
+
+    # Ian Garry dropped off the leaderboard; get_values skipped entirely leaves no feed at all
+    feed = {"Jan Blachowicz": {"id": 10}}
+    _, joins = build(roster, display, feed, IdentityIndex(store))
+    assert list(joins) == ["Jan Blachowicz"]
+    assert build(roster, display, {}, IdentityIndex(store))[1] == {}
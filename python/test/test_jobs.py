@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from api import jobs as jobs_module
+from api.jobs import Job, JobQueue, JobStore
+from api.pipeline_runner import ResourceLocks
+from api.stages import STAGES, resources
+
+
+async def occupy(locks: ResourceLocks, stage_key: str, owner: str, timeline: list, seconds: float = 0.05):
+    async with locks.hold(resources(STAGES[stage_key]), owner):
+        timeline.append(("start", stage_key))
+        await asyncio.sleep(seconds)
+        timeline.append(("end", stage_key))
+
+
+def test_one_scraper_per_host_while_local_stages_overlap():
+    async def scenario(first: str, second: str) -> list:
+        locks, timeline = ResourceLocks(), []
+        await asyncio.gather(occupy(locks, first, "job 1", timeline), occupy(locks, second, "job 2", timeline))
+        return timeline
+
+    # Both scrape ufcstats: the second waits for the first to finish
+    timeline = asyncio.run(scenario("add_fights", "process_matches"))
+    assert [event for event, _ in timeline] == ["start", "end", "start", "end"]
+    # aggregate touches neither ufcstats nor add_fights' files: both run at once
+    timeline = asyncio.run(scenario("add_fights", "aggregate"))
+    assert [event for event, _ in timeline] == ["start", "start", "end", "end"]
+
+
+class FakeRunner:
+    """Stands in for PipelineRunner: records overlap instead of running stages."""
+    active = 0
+    peak = 0
+
+    def __init__(self, token, mode, trace, profile, status, logs, locks, manifest, label):
+        self.status, self.logs, self.run_id = status, logs, None
+
+    async def run(self, stages, full_refresh=False):
+        FakeRunner.active += 1
+        FakeRunner.peak = max(FakeRunner.peak, FakeRunner.active)
+        self.status["running"] = True
+        try:
+            for _ in range(20):
+                if self.status["cancelled"]:
+                    break
+                await asyncio.sleep(0.01)
+            if stages == ["fail"]:
+                self.status["error"] = "boom"
+        finally:
+            self.status["running"] = False
+            FakeRunner.active -= 1
+
+
+@pytest.fixture
+def fake_runner(monkeypatch):
+    monkeypatch.setattr(jobs_module, "PipelineRunner", FakeRunner)
+    FakeRunner.active = FakeRunner.peak = 0
+
+
+def test_worker_pool_runs_jobs_and_persists_outcomes(tmp_path, fake_runner):
+    store = JobStore(tmp_path / "runs.db")
+
+    async def scenario():
+        queue = JobQueue(workers=2, store=store)
+        queue.start()
+        submitted = [queue.submit(Job(stages)) for stages in (["aggregate"], ["fail"], ["aggregate"], ["aggregate"])]
+        assert queue.cancel(submitted[3].id) == "cancelled"
+        await asyncio.sleep(0.02)
+        assert queue.cancel(submitted[0].id) == "cancelling"
+        while queue.queued() or queue.running():
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return [job.id for job in submitted]
+
+    ids = asyncio.run(scenario())
+    assert [store.get(job_id).state for job_id in ids] == ["cancelled", "failed", "ok", "cancelled"]
+    assert store.get(ids[1]).error == "boom"
+    assert FakeRunner.peak == 2
+
+
+def test_unfinished_jobs_are_requeued_on_start(tmp_path, fake_runner):
+    store = JobStore(tmp_path / "runs.db")
+    interrupted, waiting = Job(["get_values"]), Job(["aggregate"])
+    interrupted.id, waiting.id = store.insert(interrupted), store.insert(waiting)
+    interrupted.state = "running"
+    store.update(interrupted)
+
+    async def restart():
+        queue = JobQueue(workers=1, store=store)
+        queue.start()
+        assert [job.id for job in queue.queued()] == [interrupted.id, waiting.id]
+        while queue.queued() or queue.running():
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+    asyncio.run(restart())
+    assert [store.get(job.id).state for job in (interrupted, waiting)] == ["ok", "ok"]
+    assert store.get(interrupted.id).stages == ["get_values"]
@@ -0,0 +1,35 @@
+import json
+
+from journal import Journal
+
+
+def test_replay_folds_updates_and_skips_torn_tail(tmp_path):
+    journal = Journal(tmp_path / "values.jsonl")
+    journal.append({"A": {"value": "1", "id": 1}, "B": {"value": "2", "id": 2}})
+    journal.append({"A": {"pass_distribution": {7: 1, 3: 0}}})
+    journal.close()
+    with open(journal.path, "ab") as f:
+        f.write(b'{"key": "B", "set": {"val')  # crash mid-append
+
+    resumed = Journal(journal.path)
+    assert resumed.replay() == {
+        "A": {"value": "1", "id": 1, "pass_distribution": {"7": 1, "3": 0}},
+        "B": {"value": "2", "id": 2},
+    }
+
+    # Appending after a crash repairs the torn line instead of gluing onto it
+    resumed.append({"B": {"age": 30}})
+    resumed.close()
+    assert Journal(journal.path).replay()["B"] == {"value": "2", "id": 2, "age": 30}
+
+
+def test_compact_writes_output_and_removes_journal(tmp_path):
+    journal = Journal(tmp_path / "values.jsonl")
+    journal.append({"A": {"value": "1"}})
+    output = tmp_path / "values.json"
+
+    journal.compact({"A": {"value": "1"}}, output)
+
+    assert json.loads(output.read_text()) == {"A": {"value": "1"}}
+    assert not journal.path.exists()
+    assert not (tmp_path / "values.json.tmp").exists()
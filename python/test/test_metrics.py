@@ -0,0 +1,71 @@
+import asyncio
+from urllib.parse import urlparse
+
+import metrics
+import request_stats
+from bench.metrics_watch import parse, summarize, total
+from http_client import create_session
+
+
+def test_render_parses_back_with_cumulative_buckets():
+    registry = metrics.Registry()
+    requests = metrics.Counter("t_requests_total", "Requests", ("stage", "host"), registry=registry)
+    latency = metrics.Histogram("t_latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0), registry=registry)
+    inflight = metrics.Gauge("t_in_flight", "In flight", registry=registry)
+
+    requests.inc(stage="get_values", host='odd"host\\')
+    requests.inc(2, stage="get_values", host='odd"host\\')
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, stage="get_values")
+    inflight.set_function(lambda: 7)
+
+    samples = parse(registry.render())
+
+    assert total(samples, "t_requests_total", host='odd"host\\') == 3
+    assert [total(samples, "t_latency_seconds_bucket", le=le) for le in ("0.1", "1", "+Inf")] == [1, 3, 4]
+    assert total(samples, "t_latency_seconds_sum") == 4.05
+    assert total(samples, "t_latency_seconds_count") == 4
+    assert total(samples, "t_in_flight") == 7
+    assert "# TYPE t_latency_seconds histogram" in registry.render()
+
+
+def test_subprocess_dump_merges_into_server_registry():
+    child, server = metrics.Registry(), metrics.Registry()
+    for registry in (child, server):
+        metrics.Counter("t_pages_total", "Pages", ("stage",), registry=registry)
+        metrics.Histogram("t_seconds", "Seconds", ("stage",), buckets=(1.0,), registry=registry)
+    child.metrics["t_pages_total"].inc(5, stage="process_matches")
+    child.metrics["t_seconds"].observe(2.0, stage="process_matches")
+    server.metrics["t_pages_total"].inc(1, stage="process_matches")
+
+    server.merge(child.dump())
+    server.merge(child.dump())
+
+    assert server.metrics["t_pages_total"].get(stage="process_matches") == 11
+    assert server.metrics["t_seconds"].get(stage="process_matches") == (2, 4.0)
+
+
+def test_requests_feed_stage_metrics(mock_base_url):
+    host = urlparse(mock_base_url).hostname
+    before = parse(metrics.REGISTRY.render())
+
+    async def fetch():
+        request_stats.use(request_stats.RequestStats("metrics_probe"))
+        async with create_session(limit_per_host=1) as session:
+            for _ in range(3):
+                async with session.get(f"{mock_base_url}/stats") as response:
+                    await response.read()
+            request_stats.parsed("probe", 3)
+    asyncio.run(fetch())
+
+    assert metrics.HTTP_REQUESTS.get(stage="metrics_probe", host=host, status=200) == 3
+    assert metrics.HTTP_BYTES.get(stage="metrics_probe", host=host) > 0
+    assert metrics.HTTP_LATENCY.get(stage="metrics_probe", host=host)[0] == 3
+    assert metrics.HTTP_INFLIGHT.get(stage="metrics_probe") == 0
+    # One connection, then kept alive for the other two requests
+    assert metrics.HTTP_CONNECTIONS.get(stage="metrics_probe", kind="new") == 1
+    assert metrics.HTTP_CONNECTIONS.get(stage="metrics_probe", kind="reused") == 2
+
+    rates = summarize(before, parse(metrics.REGISTRY.render()), seconds=1.0)
+    assert rates["pages_per_s"] == 3 and rates["requests_per_s"] == 3
+    assert rates["reuse_rate"] == 2 / 3
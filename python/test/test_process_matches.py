@@ -0,0 +1,56 @@
+import random
+
+from process_matches_fast import FIVE_ROUND_BONUS, LOSS_POINTS, FightFact, FightHistory, reduce_facts
+
+FIGHTERS = ["Jon Jones", "Stipe Miocic", "Ciryl Gane", "Tom Aspinall", "Sergei Pavlovich", "Curtis Blaydes"]
+METHODS = ["KO/TKO", "Submission", "Decision - Unanimous", "Decision - Split", "Overturned", None]
+
+
+def make_facts(n: int) -> list[FightFact]:
+    rng = random.Random(7)
+    facts = []
+    for index in range(n):
+        winner, loser = rng.sample(FIGHTERS, 2)
+        facts.append(FightFact(
+            index=index, fight_url=f"http://ufcstats.com/fight-details/{index}",
+            event_url=f"http://ufcstats.com/event-details/{index // 10}",
+            date=f"20{10 + index % 15:02d}-0{1 + index % 9}-15",
+            winner=None if index % 17 == 0 else winner, loser=loser,
+            method=rng.choice(METHODS), rounds=rng.choice([3, 5, None]),
+            is_draw=int(index % 23 == 0), striker=rng.choice([winner, loser]),
+            strike_diff=rng.randrange(60)))
+    return facts
+
+
+def frames(history: FightHistory) -> tuple[str, str]:
+    return history.totals_frame().to_csv(index=False), history.history_frame().to_csv(index=False)
+
+
+def test_reduction_ignores_completion_order_and_chunking():
+    facts = make_facts(200)
+    expected = frames(reduce_facts(facts))
+
+    shuffled = facts[:]
+    random.Random(1).shuffle(shuffled)
+    assert frames(reduce_facts(shuffled)) == expected
+    assert frames(reduce_facts(shuffled, workers=3)) == expected
+    assert frames(FightHistory.concat(reduce_facts(facts[i:i + 33]) for i in range(0, 200, 33))) == expected
+
+
+def test_reduction_scores_both_sides():
+    fact = FightFact(index=0, fight_url="u", event_url=None, date="2024-03-09", winner="A", loser="B",
+                     method="KO/TKO", rounds=5, is_draw=0, striker="B", strike_diff=12)
+    draw = fact._replace(index=1, fight_url="v", is_draw=1)
+
+    history = reduce_facts([draw, fact]).history_frame()
+
+    assert history.drop(columns="fight_url").to_dict("records") == [
+        {"fighter_name": "A", "date": "2024-03-09", "opponent": "B", "method": "KO/TKO",
+         "method_points": 100, "strike_bonus": 0, "round_bonus": FIVE_ROUND_BONUS,
+         "total_points": 100 + FIVE_ROUND_BONUS},
+        {"fighter_name": "B", "date": "2024-03-09", "opponent": "A", "method": "KO/TKO",
+         "method_points": LOSS_POINTS, "strike_bonus": 12, "round_bonus": FIVE_ROUND_BONUS,
+         "total_points": LOSS_POINTS + 12 + FIVE_ROUND_BONUS},
+    ]
+    assert reduce_facts([]).history_frame().empty
+    assert list(reduce_facts([]).totals_frame().columns)[0] == "name"
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from api.jobs import JobQueue, JobStore
+from api.scheduler import CronSchedule, Scheduler
+
+
+def test_cron_next_after():
+    start = datetime(2025, 1, 1, 10, 7, 30)  # a Wednesday
+    assert CronSchedule("*/15 * * * *").next_after(start) == datetime(2025, 1, 1, 10, 15)
+    assert CronSchedule("0 * * * *").next_after(datetime(2025, 1, 1, 10, 0)) == datetime(2025, 1, 1, 11, 0)
+    assert CronSchedule("30 4 * * 1").next_after(start) == datetime(2025, 1, 6, 4, 30)
+    assert CronSchedule("0 0 1 3 *").next_after(start) == datetime(2025, 3, 1, 0, 0)
+    # Both day fields restricted: the 15th or a Sunday, whichever comes first
+    assert CronSchedule("0 12 15 * 0").next_after(start) == datetime(2025, 1, 5, 12, 0)
+    with pytest.raises(ValueError):
+        CronSchedule("61 * * * *")
+
+
+def test_triggers_coalesce_into_pending_jobs(tmp_path):
+    queue = JobQueue(workers=1, store=JobStore(tmp_path / "runs.db"))
+    scheduler = Scheduler(queue, incremental="0 * * * *", full="30 4 * * 1", jitter=0)
+
+    first = scheduler.trigger("incremental")
+    assert scheduler.trigger("incremental") is first
+    # A full trigger upgrades the waiting incremental job instead of queueing another
+    assert scheduler.trigger("full") is first
+    assert first.full_refresh and queue.store.get(first.id).full_refresh
+    assert len(queue.queued()) == 1
+
+    # While it runs, a new incremental trigger is redundant; once done, triggers queue again
+    first.state = "running"
+    assert scheduler.trigger("incremental") is first
+    first.state = "ok"
+    assert scheduler.trigger("incremental") is not first
+    assert Scheduler(queue, full="off").schedules.keys() == {"incremental"}
+
+
+def test_schedules_only_start_when_enabled(tmp_path):
+    queue = JobQueue(workers=1, store=JobStore(tmp_path / "runs.db"))
+
+    async def started(enabled):
+        scheduler = Scheduler(queue, jitter=0, enabled=enabled)
+        scheduler.start()
+        await scheduler.stop()
+        return scheduler.to_dict()
+
+    # Off by default: nothing planned, though a schedule can still be fired by hand
+    assert Scheduler(queue).enabled is False
+    assert all(s["next_run"] is None and not s["enabled"] for s in asyncio.run(started(False)).values())
+    assert all(s["next_run"] for s in asyncio.run(started(True)).values())
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import GOLDEN_DIR
+from scoring import TIERS, ScoringEngine
+
+
+def daily_adjusted_value(group: pd.DataFrame, multiplier: float) -> float:
+    """The frontend's calculateDailyAdjustedValue for one fighter."""
+    best = {}
+    for date, points in zip(group["date"], group["total_points"]):
+        best[date[5:]] = max(best.get(date[5:], 0), points * multiplier)
+    return sum(best.values())
+
+
+def test_projections_match_the_per_fighter_calculation():
+    history = pd.read_csv(GOLDEN_DIR / "fight_history.csv").dropna(subset=["fighter_name"])
+    engine = ScoringEngine(GOLDEN_DIR / "fight_history.csv")
+    table = engine.project(["Common", "Leg 2", 3.5])
+    assert table.shape == (history["fighter_name"].nunique(), 3)
+
+    for name, group in history.groupby("fighter_name"):
+        expected = [daily_adjusted_value(group, m) for m in (TIERS["Common"], TIERS["Leg 2"], 3.5)]
+        assert table.loc[name].tolist() == pytest.approx(expected)
+
+    # Per-fighter scenarios: one column per scenario, each fighter with its own multiplier
+    scenarios = np.stack([engine.assigned({"Gabe Volkov": "Epic"}), engine.assigned({}, default=2.0)], axis=1)
+    per_fighter = engine.project(scenarios)
+    assert per_fighter.loc["Gabe Volkov"].tolist() == pytest.approx([table.loc["Gabe Volkov", "Common"] / 1.2 * 2.0] * 2)
+    assert per_fighter.loc["Bruno Walker", 0] == pytest.approx(table.loc["Bruno Walker", "Common"])
+
+
+def test_portfolio_keeps_the_best_claims_per_day():
+    rows = [
+        ("A", "2020-03-01", 100), ("A", "2021-03-01", 50),  # A's best on 03-01 is 100
+        ("B", "2019-03-01", 90), ("C", "2018-03-01", 80), ("D", "2017-03-01", 70),
+        ("D", "2016-07-04", 10),
+    ]
+    history = pd.DataFrame([{"fighter_name": name, "date": date, "opponent": "X", "method": "KO/TKO",
+                             "method_points": points, "strike_bonus": 0, "round_bonus": 0, "total_points": points}
+                            for name, date, points in rows])
+    engine = ScoringEngine(history)
+
+    result = engine.portfolio({"A": 1.0, "B": 1.0, "C": "Common", "D": 2.0})
+    # 03-01 claims: D 140, A 100, C 96 kept; B 90 lost. 07-04: D 20
+    assert result["value"] == pytest.approx(140 + 100 + 96 + 20)
+    assert result["lost"] == pytest.approx(90)
+    assert result["fighters"]["B"] == {"tier": 1.0, "multiplier": 1.0, "value": 0.0, "lost": 90.0}
+
+    with pytest.raises(KeyError, match="Unknown fighter: E"):
+        engine.portfolio({"E": "Common"})
+    with pytest.raises(KeyError, match="Unknown tier: Legendary"):
+        engine.project(["Legendary"])
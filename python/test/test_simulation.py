@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+import simulation
+from simulation import CalendarModel, simulate_fighters, simulate_portfolio
+
+
+def history(rows) -> pd.DataFrame:
+    return pd.DataFrame([{"fighter_name": name, "date": date, "opponent": "X", "method": "KO/TKO",
+                          "method_points": points, "strike_bonus": 0, "round_bonus": 0, "total_points": points}
+                         for name, date, points in rows])
+
+
+# Seasons end at 2025-01-01: season 0 is 2024-01-02..2025-01-01, and so on back
+ROWS = [
+    # A fights every season on 03-01, always for 100
+    *[("A", f"{year}-03-01", 100) for year in range(2018, 2025)],
+    # B retired: nothing in the last five seasons
+    ("B", "2015-06-01", 90), ("B", "2016-06-01", 90),
+    # C fought once in the five seasons since their 2019 debut
+    ("C", "2019-06-01", 80), ("C", "2022-05-01", 70),
+    # D debuted last season, twice
+    ("D", "2024-03-01", 90), ("D", "2024-08-01", 40),
+]
+
+
+def test_fighter_distributions_follow_the_resampled_calendar(monkeypatch):
+    model = CalendarModel(history(ROWS), reference_date="2025-01-01")
+    table = simulate_fighters(model, scenarios=4000, tier=2.0, seed=1, processes=1)
+
+    a, b, c, d = (table.loc[name] for name in "ABCD")
+    assert a["p_fights"] == 1 and a["mean"] == 200 and a[["p5", "p50", "p95"]].tolist() == [200, 200, 200]
+    assert b["p_fights"] == 0 and b["p95"] == 0
+    # C: the 2022 fight is in the window, the 2019 one is not
+    assert c["p_fights"] == pytest.approx(0.2, abs=0.03) and c["p50"] == 0 and c["p95"] == 140
+    # D: two fights from a pool of two, drawn with replacement; a repeat counts once
+    assert d["p_fights"] == 1 and (d["p5"], d["p95"]) == (80, 260)
+    assert d["mean"] == pytest.approx(2 * (0.25 * 90 + 0.25 * 40 + 0.5 * 130), rel=0.05)
+
+    # Chunks carry their own seeds, so splitting them over processes changes nothing
+    monkeypatch.setattr(simulation, "CHUNK", 500)
+    split = simulate_fighters(model, scenarios=1500, seed=3, processes=1)
+    assert simulate_fighters(model, scenarios=1500, seed=3, processes=2).equals(split)
+
+
+def test_portfolio_keeps_the_best_claims_per_day():
+    rows = ROWS + [(name, f"{year}-03-01", points) for name, points in (("E", 60), ("F", 50))
+                   for year in range(2020, 2025)]
+    model = CalendarModel(history(rows), reference_date="2025-01-01")
+    result = simulate_portfolio(model, {"A": 1.0, "E": "Common", "F": 1.0, "D": 1.0}, scenarios=2000, seed=0,
+                                processes=1)
+
+    fighters = result["fighters"]
+    assert fighters["A"] == {"tier": 1.0, "multiplier": 1.0, "mean": 100, "p_fights": 1.0, "claimed_days": 1,
+                             "claimed_day_hit_rate": 1.0}
+    assert fighters["E"]["mean"] == 72
+    # D fights on 03-01 half the time (90 beats F's 50, which is then lost) and on 08-01 (40) the rest
+    assert fighters["D"]["mean"] + fighters["F"]["mean"] == pytest.approx(result["mean"] - 172)
+    assert result["percentiles"]["p5"] >= 100 + 72 + 40 and result["percentiles"]["p95"] <= 100 + 72 + 130
+    assert fighters["F"]["mean"] < 50
+
+    with pytest.raises(KeyError, match="Unknown fighter: Z"):
+        simulate_portfolio(model, {"Z": "Common"}, scenarios=10, processes=1)
@@ -0,0 +1,208 @@
+"""
+Golden-output and budget tests for the pipeline stages.
+
+Each stage runs against the frozen corpus in test/corpus (served by the mock
+server) and its outputs are compared with test/golden. Rows are compared in a
+canonical order, so these tests check content, not completion order. To
+regenerate the golden files after an intended output change:
+
+    cd python
+    UPDATE_GOLDEN=1 python -m pytest test
+"""
+import asyncio
+import contextvars
+import io
+import json
+import os
+import shutil
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from bench.corpus import UFCSTATS_BASE
+from conftest import CORPUS_DIR, GOLDEN_DIR
+
+import add_new_fights
+import aggregate_values
+import data_store
+import get_fighter_values
+import process_matches_fast
+import remove_duplicates
+import request_stats
+
+UPDATE_GOLDEN = bool(os.environ.get("UPDATE_GOLDEN"))
+
+# (seconds, peak traced MB) per stage on the frozen corpus; generous enough for
+# slow CI machines, tight enough to catch an accidental O(n^2) or a leak
+BUDGETS = {
+    "add_fights": (10, 20),
+    "remove_duplicates": (5, 20),
+    "process_matches": (15, 50),
+    "aggregate": (5, 20),
+    "get_values": (20, 20),
+}
+
+SORT_KEYS = {
+    "all_fights.csv": ["fight_url"],
+    "new_final.csv": ["name"],
+    "fight_history.csv": ["fighter_name", "date", "opponent", "total_points"],
+    "final_values.csv": ["name"],
+}
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 1, 1)
+
+
+def corpus_frame(name: str, base_url: str) -> pd.DataFrame:
+    df = pd.read_csv(CORPUS_DIR / name)
+    for column in df.columns:
+        if column.endswith("_url"):
+            df[column] = df[column].str.replace(UFCSTATS_BASE, base_url, regex=False)
+    return df
+
+
+def canonical(df: pd.DataFrame, name: str) -> str:
+    return df.sort_values(SORT_KEYS[name], kind="mergesort").to_csv(index=False)
+
+
+def assert_golden_csv(path, name: str, base_url: str = None):
+    df = pd.read_csv(path)
+    if base_url:
+        for column in df.columns:
+            if column.endswith("_url"):
+                df[column] = df[column].str.replace(base_url, UFCSTATS_BASE, regex=False)
+    actual = canonical(df, name)
+    golden = GOLDEN_DIR / name
+    if UPDATE_GOLDEN:
+        GOLDEN_DIR.mkdir(exist_ok=True)
+        golden.write_text(actual)
+    assert actual == golden.read_text(), f"{name} differs from golden output"
+
+
+def run_measured(stage: str, fn):
+    """Run ``fn`` and assert the stage stays within its time and memory budget."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    max_seconds, max_mb = BUDGETS[stage]
+    assert elapsed <= max_seconds, f"{stage} took {elapsed:.2f}s (budget {max_seconds}s)"
+    assert peak / 1e6 <= max_mb, f"{stage} peaked at {peak / 1e6:.1f}MB (budget {max_mb}MB)"
+    return result
+
+
+@pytest.fixture
+def stage_dirs(tmp_path, monkeypatch):
+    """Point every stage's results/data paths at a scratch directory."""
+    results_dir = tmp_path / "results"
+    data_dir = tmp_path / "data"
+    results_dir.mkdir()
+    data_dir.mkdir()
+    shutil.copy(CORPUS_DIR / "fighters.csv", data_dir / "fighters.csv")
+    for module in (add_new_fights, remove_duplicates, process_matches_fast, aggregate_values):
+        monkeypatch.setattr(module, "RESULTS_DIR", results_dir)
+        if hasattr(module, "DATA_DIR"):
+            monkeypatch.setattr(module, "DATA_DIR", data_dir)
+    return results_dir, data_dir
+
+
+def test_add_fights_finds_unknown_fights(mock_base_url):
+    fights = corpus_frame("fights.csv", mock_base_url)
+    known, unknown = fights.iloc[::2], fights.iloc[1::2]
+
+    fighters = corpus_frame("fighters.csv", mock_base_url)
+    stats, progress = request_stats.RequestStats(), []
+
+    def scrape():
+        # Worker threads see the stage's context: its counters land in ``stats``
+        request_stats.use(stats)
+        return add_new_fights.find_new_fights(known, fighters, progress.append)
+
+    found = run_measured("add_fights", lambda: contextvars.copy_context().run(scrape))
+
+    assert set(found) == set(unknown["fight_url"])
+    assert stats.requests == len(fighters)
+    assert progress == sorted(progress) and len(progress) == len(fighters) and progress[-1] == 100
+
+
+def test_remove_duplicates_matches_golden(stage_dirs):
+    results_dir, data_dir = stage_dirs
+    fights = pd.read_csv(CORPUS_DIR / "fights.csv")
+    with_duplicates = pd.concat([fights, fights.iloc[:10]], ignore_index=True)
+
+    out = run_measured("remove_duplicates", lambda: asyncio.run(
+        remove_duplicates.run(artifacts={"fights": with_duplicates})))
+
+    assert len(out["fights"]) == len(fights)
+    assert_golden_csv(results_dir / "all_fights.csv", "all_fights.csv")
+    assert (data_dir / "fights.csv").read_text() == (results_dir / "all_fights.csv").read_text()
+
+
+def test_process_matches_and_aggregate_match_golden(stage_dirs, mock_base_url, tmp_path, monkeypatch):
+    results_dir, data_dir = stage_dirs
+    monkeypatch.setenv(aggregate_values.REFERENCE_DATE_ENV, "2015-03-01")
+    pd.DataFrame({"name": ["Bruno Walker"], "active": [False]}).to_csv(
+        data_dir / aggregate_values.OVERRIDES_FILE, index=False)
+    fights = corpus_frame("fights.csv", mock_base_url)
+
+    out = run_measured("process_matches", lambda: asyncio.run(
+        process_matches_fast.run(artifacts={"fights": fights})))
+    assert_golden_csv(results_dir / "new_final.csv", "new_final.csv")
+    assert_golden_csv(results_dir / "fight_history.csv", "fight_history.csv")
+    assert not (results_dir / "errors.txt").exists()
+
+    run_measured("aggregate", lambda: asyncio.run(aggregate_values.run(artifacts=out)))
+    assert_golden_csv(results_dir / "final_values.csv", "final_values.csv")
+
+    # Re-aggregating from the CSV on disk gives the same result as the handed-over frame
+    in_memory = (results_dir / "final_values.csv").read_text()
+    asyncio.run(aggregate_values.run())
+    assert canonical(pd.read_csv(results_dir / "final_values.csv"), "final_values.csv") == \
+        canonical(pd.read_csv(io.StringIO(in_memory)), "final_values.csv")
+
+    # The data store's exports reproduce the CSVs the stages wrote, byte for byte
+    data_store.DataStore().export(tmp_path / "export", ["fight_history", "new_final", "final_values"])
+    for name in ("fight_history.csv", "new_final.csv", "final_values.csv"):
+        assert (tmp_path / "export/results" / name).read_text() == (results_dir / name).read_text()
+
+    # A second run takes the settled fights from the store: nothing to fetch, same outputs
+    written = {name: (results_dir / name).read_text() for name in ("new_final.csv", "fight_history.csv")}
+    fetched = []
+
+    async def fetch(self, session, url, index):
+        fetched.append(url)
+
+    monkeypatch.setattr(process_matches_fast.AsyncFightProcessor, "process_fight", fetch)
+    asyncio.run(process_matches_fast.run(artifacts={"fights": fights}))
+    assert not fetched
+    assert {name: (results_dir / name).read_text() for name in written} == written
+    # A full refresh fetches every page again
+    asyncio.run(process_matches_fast.run(artifacts={"fights": fights, "full_refresh": True}))
+    assert len(fetched) == len(fights)
+
+
+def test_get_values_matches_golden(tmp_path, monkeypatch, mock_base_url):
+    monkeypatch.setattr(get_fighter_values, "API_BASE", mock_base_url)
+    monkeypatch.setattr(get_fighter_values, "JOURNAL_FILE", tmp_path / "fighters_values.journal.jsonl")
+    monkeypatch.setattr(get_fighter_values, "OUTPUT_FILE", tmp_path / "fighters_values.json")
+    monkeypatch.setattr(get_fighter_values, "datetime", FrozenDatetime)
+
+    run_measured("get_values", lambda: asyncio.run(get_fighter_values.run()))
+
+    actual = json.loads((tmp_path / "fighters_values.json").read_text())
+    golden = GOLDEN_DIR / "fighters_values.json"
+    if UPDATE_GOLDEN:
+        golden.write_text(json.dumps(actual, indent=4, sort_keys=True))
+    assert actual == json.loads(golden.read_text())
+    assert not (tmp_path / "fighters_values.journal.jsonl").exists()
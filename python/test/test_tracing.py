@@ -0,0 +1,80 @@
+import asyncio
+import json
+import time
+
+import pandas as pd
+
+import tracing
+from bench.corpus import UFCSTATS_BASE
+from conftest import CORPUS_DIR
+from http_client import create_session
+
+
+async def fetch_pages(urls: list[str]) -> list[int]:
+    async def fetch(session, url):
+        async with session.get(url) as response:
+            body = await response.read()
+            with tracing.span("parse", page="fight"):
+                return len(body)
+
+    async with create_session(limit_per_host=2) as session:
+        return await asyncio.gather(*(fetch(session, url) for url in urls))
+
+
+def test_requests_are_split_into_phase_spans(mock_base_url):
+    urls = pd.read_csv(CORPUS_DIR / "fights.csv")["fight_url"].str.replace(UFCSTATS_BASE, mock_base_url)[:4]
+    tracer = tracing.Tracer("process_matches")
+
+    async def traced():
+        tracing.use(tracer)
+        return await fetch_pages(list(urls))
+    sizes = asyncio.run(traced())
+
+    trace = json.loads(json.dumps(tracer.chrome_trace()))
+    requests = [e for e in trace["traceEvents"] if e["name"] == "request"]
+    assert sorted(e["args"]["bytes"] for e in requests) == sorted(sizes)
+    assert {e["args"]["status"] for e in requests} == {200}
+    # Four concurrent fetches, one track each, with every phase inside its request
+    assert len({e["tid"] for e in requests}) == 4
+    for request in requests:
+        phases = {e["name"]: e for e in trace["traceEvents"]
+                  if e["tid"] == request["tid"] and e is not request}
+        assert {"ttfb", "body", "parse"} <= set(phases)
+        for name in ("connect", "ttfb", "body"):
+            if name in phases:
+                assert request["ts"] <= phases[name]["ts"]
+                assert phases[name]["ts"] + phases[name]["dur"] <= request["ts"] + request["dur"] + 1
+    # Only two connections per host: the other two requests queued for one
+    assert sum(e["name"] == "connect" for e in trace["traceEvents"]) == 2
+    assert sum(e["name"] == "queue" for e in trace["traceEvents"]) == 2
+
+    summary = tracing.summarize(trace["traceEvents"])
+    assert summary["request"]["count"] == 4 and summary["parse"]["count"] == 4
+
+    merged = tracing.merge_traces([trace, tracing.Tracer("get_values").chrome_trace()])
+    assert [e["args"]["name"] for e in merged["traceEvents"] if e["ph"] == "M"] == ["process_matches", "get_values"]
+
+
+def test_untraced_requests_record_nothing(mock_base_url):
+    tracer = tracing.Tracer()
+    asyncio.run(fetch_pages([f"{mock_base_url}/stats"]))
+    assert tracing.current() is None and tracer.events == []
+
+
+def busy_loop(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampler_finds_the_hot_function(tmp_path):
+    sampler = tracing.Sampler(interval=0.001).start()
+    busy_loop(0.2)
+    sampler.stop()
+
+    assert sampler.samples > 20
+    name, share = sampler.top(1)[0]
+    assert name.startswith("busy_loop") and share > 0.5
+
+    sampler.write(tmp_path / "profile.folded")
+    assert tracing.Sampler.load(tmp_path / "profile.folded").stacks == sampler.stacks
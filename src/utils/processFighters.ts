@@ -1,10 +1,14 @@
 import { parse } from "csv-parse/sync";
-import { readFileSync } from "fs";
+import { existsSync, readFileSync } from "fs";
 import { Fighter, FighterData } from "../types/fighters";
 
+// Active status comes from the aggregate stage: a fight in the 24 months
+// before its reference date, with python/data/active_overrides.csv applied.
+// Files written before that column existed fall back to the fight dates.
 interface ValueCSV {
   name: string;
   Value: string;
+  active?: string;
 }
 
 interface FightHistoryCSV {
@@ -26,36 +30,15 @@ interface FighterValueData {
   age?: number;
 }
 
-interface ActiveOverride {
-  name: string;
-  active: boolean;
+// results/fighter_identities.json: ufcstats display name -> Real Sports entry
+interface FighterIdentity {
+  realsports_name: string;
+  realsports_id: number;
+  ufcstats_url: string | null;
+  match: string;
 }
 
-const activeOverrides: ActiveOverride[] = [
-  { name: "Mauricio Rua", active: false },
-  { name: "Amanda Nunes", active: false },
-  { name: "Robbie Lawler", active: false },
-  { name: "Ovince Saint Preux", active: false },
-  { name: "Matt Brown", active: false },
-  { name: "Stipe Miocic", active: false },
-  { name: "Andrei Arlovski", active: false },
-  // Retirements from past year (2024-2025)
-  { name: "Dominick Cruz", active: false },
-  { name: "Bill Algeo", active: false },
-  { name: "Julia Avila", active: false },
-  { name: "Joe Solecki", active: false },
-  { name: "Jalin Turner", active: false },
-  { name: "Molly McCann", active: false },
-  { name: "Antonina Shevchenko", active: false },
-  { name: "Diana Belbita", active: false },
-  { name: "Jose Aldo", active: false },
-  { name: "Vinc Pichel", active: false },
-  // Additional 2025 retirements
-  { name: "Anthony Smith", active: false },
-  { name: "Paul Craig", active: false },
-  { name: "Henry Cejudo", active: false },
-  { name: "Jon Jones", active: false },
-];
+const identitiesPath = "./python/results/fighter_identities.json";
 
 export function processFighterData(
   valueFilePath: string,
@@ -72,6 +55,12 @@ export function processFighterData(
   const ownedPassesData: Record<string, FighterValueData> =
     JSON.parse(ownedPassesContent);
 
+  // Names differ between ufcstats and Real Sports (accents, suffixes, middle
+  // names); the identity index maps each ufcstats name to its Real Sports key
+  const identities: Record<string, FighterIdentity> = existsSync(identitiesPath)
+    ? JSON.parse(readFileSync(identitiesPath, "utf-8"))
+    : {};
+
   const valueData = parse(valueContent, {
     columns: true,
     skip_empty_lines: true,
@@ -84,12 +73,14 @@ export function processFighterData(
 
   // Create fighters map
   const fightersMap = new Map<string, Fighter>();
+  const hasActive = valueData.length > 0 && "active" in valueData[0];
   const twoYearsAgo = new Date();
   twoYearsAgo.setFullYear(twoYearsAgo.getFullYear() - 2);
 
   // Process value data first
   valueData.forEach((row) => {
-    const fighterPassData = ownedPassesData[row.name] || {
+    const passesKey = identities[row.name]?.realsports_name ?? row.name;
+    const fighterPassData = ownedPassesData[passesKey] || {
       value: "0",
       id: 0,
       pass_distribution: { 7: 0, 6: 0, 5: 0, 4: 0 },
@@ -99,7 +90,7 @@ export function processFighterData(
       name: row.name,
       value: parseInt(row.Value),
       scores: [],
-      active: false,
+      active: row.active === "True",
       ownedPasses: parseInt(fighterPassData.value),
       id: fighterPassData.id,
       passDistribution: fighterPassData.pass_distribution,
@@ -107,18 +98,16 @@ export function processFighterData(
     });
   });
 
-  // Add fight history and check active status
+  // Add fight history, and derive active status when the CSV lacks it
   historyData.forEach((row) => {
     const fighter = fightersMap.get(row.fighter_name);
     if (fighter) {
-      const fightDate = new Date(row.date);
       fighter.scores.push({
         date: row.date,
         value: parseInt(row.total_points),
       });
 
-      // Update active status if fight is within last 2 years
-      if (fightDate > twoYearsAgo) {
+      if (!hasActive && new Date(row.date) > twoYearsAgo) {
         fighter.active = true;
       }
     }
@@ -131,13 +120,6 @@ export function processFighterData(
     );
   });
 
-  activeOverrides.forEach((override) => {
-    const fighter = fightersMap.get(override.name);
-    if (fighter) {
-      fighter.active = override.active;
-    }
-  });
-
   return {
     fighters: Array.from(fightersMap.values()),
   };